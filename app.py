@@ -4,10 +4,27 @@ import numpy as np
 import os
 import pickle
 import time
-from PIL import Image
+from functools import partial
 from pathlib import Path
-import tempfile
 import yaml
+from pipeline_config import parameters
+from serving.active_learning import ActiveLearningLog
+from serving.admission import AdmissionController, INTERACTIVE, Rejected
+from serving.hot_swap import HotSwapModel, warmup_predictor
+from serving.image_io import decode_image
+from serving.inference import load_predictor, predict_images, top_prediction
+from serving.model_store import fetch_model
+from serving.timm_predictor import MODEL_FILE as TIMM_MODEL_FILE, is_timm_model, weights_file
+from serving.uploads import inspect_upload, make_thumbnail
+from serving.batch import expand_uploads, decode_entries, classify_batch
+from serving.cascade import (
+    CascadeCounts, CascadePredictor, calibration_mismatch, load_cascade_calibration, load_fast_predictor
+)
+from serving.shadow import ShadowEvaluator
+from serving.tracing import span, start_tracing
+from serving.tta import TTAPolicy, predict_tta
+from serving.runtime import apply_serving_options, replica_cpus
+from serving.worker_pool import WorkerPool
 
 # --- Custom CSS for Modern Look ---
 st.markdown("""
@@ -28,15 +45,56 @@ body { background: #f6f8fa; }
 # --- Utility Functions ---
 @st.cache_resource
 def load_model():
-    """Load the trained AutoGluon model from the models directory or Hugging Face Hub."""
-    from autogluon.multimodal import MultiModalPredictor
+    """Load the trained model from the models directory or the configured model remote.
+
+    Returns a `HotSwapModel` handle that follows the registry's "current"
+    pointer (or the model cache's ref, for a fetched model), so a retrain
+    or a newly fetched version is picked up without restarting the app.
+    """
+    serving_options = parameters["serving_options"]
+    # Packed weights are memory-mapped; checksums are verified per `verify_weights`
+    predictor_loader = partial(load_predictor, verify_weights=serving_options["verify_weights"])
+    replica_index = int(os.environ.get("SERVING_REPLICA_INDEX", 0))
+    if serving_options["workers"] > 1:
+        # Each worker applies its own thread/affinity settings after the fork,
+        # splitting only this replica's CPUs so replicas do not overlap
+        cpus = replica_cpus(serving_options["replicas"], replica_index)
+
+        def model_loader(path):
+            return WorkerPool(predictor_loader, path, workers=serving_options["workers"],
+                              serving_options=serving_options, warmup=warmup_predictor, cpus=cpus).start()
+    else:
+        # Thread and CPU affinity settings must be applied before torch does any work
+        apply_serving_options(serving_options, replica_index)
+        model_loader = predictor_loader
     import yaml
     
-    # Try loading from local path first
     model_path = Path("models/autogluon_model")
+    fetch_options = parameters["model_fetch_options"]
+    remote_url = os.environ.get("MODEL_REMOTE_URL") or fetch_options["remote_url"]
+    if remote_url:
+        # Fetched into the shared cache volume; a warm cache needs no download at all
+        try:
+            model_path = Path(fetch_model(
+                remote_url,
+                fetch_options["name"],
+                ref=os.environ.get("MODEL_REF") or fetch_options["ref"],
+                cache_dir=fetch_options["cache_dir"],
+                workers=fetch_options["workers"],
+                chunk_size=fetch_options["chunk_size"],
+                max_cache_bytes=fetch_options["max_cache_bytes"],
+                timeout=fetch_options["timeout"],
+                retries=fetch_options["retries"]
+            ))
+        except Exception as e:
+            return None, f"Failed to fetch model from {remote_url}: {e}"
+
     if model_path.exists():
-        # Check for required model files
-        required_files = ['df_preprocessor.pkl', 'config.yaml', 'model.ckpt']
+        # Check for required model files (AutoGluon, or a fast-retrained timm model)
+        if is_timm_model(model_path):
+            required_files = [TIMM_MODEL_FILE, weights_file(model_path)]
+        else:
+            required_files = ['df_preprocessor.pkl', 'config.yaml', 'model.ckpt']
         missing_files = [f for f in required_files if not (model_path / f).exists()]
         
         if missing_files:
@@ -52,9 +110,18 @@ def load_model():
                 # Extract model architecture info
                 model_arch = config.get('model', {}).get('timm_image', {}).get('checkpoint_name', 'unknown')
                 print(f"Loading model with architecture: {model_arch}")
+            elif is_timm_model(model_path):
+                with open(model_path / TIMM_MODEL_FILE, 'r') as f:
+                    print(f"Loading model with architecture: {yaml.safe_load(f)['checkpoint_name']}")
             
             # Load the model without specifying architecture (let AutoGluon use saved config)
-            predictor = MultiModalPredictor.load(str(model_path))
+            registry_options = parameters["registry_options"]
+            model_handle = HotSwapModel(
+                str(model_path),
+                loader=model_loader,
+                poll_interval=registry_options["poll_interval"]
+            ).start()
+            predictor = model_handle.get()
             
             # Verify model loaded correctly
             if hasattr(predictor, 'class_labels'):
@@ -62,7 +129,7 @@ def load_model():
             else:
                 print("Model loaded but class labels not found")
                 
-            return predictor, None
+            return model_handle, None
             
         except Exception as e:
             error_msg = str(e)
@@ -75,18 +142,130 @@ def load_model():
             else:
                 return None, f"Error loading model: {error_msg}"
     
-    # If local model not found, try loading from Hugging Face Hub
+    return None, "Local model not found and no model remote configured (model_fetch_options or MODEL_REMOTE_URL)."
+
+@st.cache_resource
+def load_shadow_evaluator():
+    """Load the candidate model for shadow evaluation, if enabled in the pipeline config."""
+    shadow_options = parameters["shadow_options"]
+    if not shadow_options["enabled"]:
+        return None, None
+    candidate_path = Path(shadow_options["model_path"])
+    if not candidate_path.exists():
+        return None, f"Shadow model not found at {candidate_path}"
+    try:
+        candidate = load_predictor(str(candidate_path))
+        warmup_predictor(candidate)
+        shadow = ShadowEvaluator(
+            candidate,
+            sample_rate=shadow_options["sample_rate"],
+            max_workers=shadow_options["max_workers"],
+            max_pending=shadow_options["max_pending"],
+            log_path=shadow_options["log_path"]
+        )
+        print(f"Shadow evaluation enabled for {candidate_path} at {shadow_options['sample_rate']:.0%} of requests")
+        return shadow, None
+    except Exception as e:
+        return None, f"Error loading shadow model: {e}"
+
+@st.cache_resource
+def load_tta_policy():
+    """Shared TTA latency-budget policy across all sessions of this process."""
+    tta_options = parameters["tta_options"]
+    return TTAPolicy(
+        latency_budget=tta_options["latency_budget"],
+        num_views=2 + tta_options["num_crops"],
+        max_in_flight=tta_options["max_in_flight"]
+    )
+
+@st.cache_resource
+def load_admission_controller():
+    """Shared inference queue for all sessions of this process, plus the optional fallback model."""
+    admission_options = parameters["admission_options"]
+    if not admission_options["enabled"]:
+        return None, None, None
+    controller = AdmissionController(
+        max_queue=admission_options["max_queue"],
+        concurrency=parameters["serving_options"]["workers"],
+        degrade_depth=admission_options["degrade_depth"]
+    )
+    fallback_path = admission_options["fallback_model_path"]
+    if fallback_path is None:
+        return controller, None, None
+    if not Path(fallback_path).exists():
+        return controller, None, f"Fallback model not found at {fallback_path}"
+    try:
+        fallback = load_predictor(fallback_path)
+        warmup_predictor(fallback)
+        return controller, fallback, None
+    except Exception as e:
+        return controller, None, f"Error loading fallback model: {e}"
+
+@st.cache_resource
+def load_active_learning():
+    """Shared background log of uncertain predictions, if enabled."""
+    options = parameters["active_learning_options"]
+    if not options["enabled"]:
+        return None
+    return ActiveLearningLog(
+        options["log_dir"],
+        confidence_threshold=options["confidence_threshold"],
+        entropy_threshold=options["entropy_threshold"],
+        top_k=options["top_k"],
+        max_file_bytes=options["max_file_bytes"],
+        max_files=options["max_files"],
+        flush_interval=options["flush_interval"],
+        max_pending=options["max_pending"]
+    )
+
+@st.cache_resource
+def load_cascade():
+    """Calibrated cascade settings, the separate fast model if one is configured, and shared counters."""
+    cascade_options = parameters["cascade_options"]
+    if not cascade_options["enabled"]:
+        return None, None, None, None
+    calibration = load_cascade_calibration(cascade_options["calibration_path"])
+    if calibration is None or calibration["threshold"] is None:
+        return None, None, None, "Cascade not calibrated, serving the full model only"
+    if calibration["fast_model_path"] is None:
+        return calibration, None, CascadeCounts(), None
     try:
-        print("Local model not found, attempting to load from Hugging Face Hub...")
-        # You can specify your Hugging Face model repository here
-        # predictor = MultiModalPredictor.load("your-username/pet-breed-classifier")
-        return None, "Local model not found. Hugging Face Hub loading not configured."
+        fast = load_fast_predictor(None, calibration["fast_model_path"])
+        warmup_predictor(fast)
+        return calibration, fast, CascadeCounts(), None
     except Exception as e:
-        return None, f"Failed to load model from Hugging Face Hub: {e}"
+        return None, None, None, f"Error loading cascade fast model: {e}"
+
+def cascade_predictor(model, model_version, calibration, fast, counts):
+    """Wrap the current model in the calibrated cascade; returns (predictor, error)."""
+    if model is None or calibration is None:
+        return model, None
+    # Checked on every run, so a hot swap to a new version turns the cascade off
+    mismatch = calibration_mismatch(calibration, model_version)
+    if mismatch is not None:
+        return model, f"Cascade disabled: {mismatch}"
+    try:
+        if fast is None:
+            # Reduced-resolution stage built on the current (possibly hot-swapped) model's weights
+            fast = load_fast_predictor(model, fast_image_size=calibration["fast_image_size"])
+        return CascadePredictor(fast, model, calibration["threshold"], counts), None
+    except ValueError as e:
+        return model, f"Cascade disabled: {e}"
+
+@st.cache_resource
+def load_tracing():
+    """Start recording decode/preprocess/forward/postprocess spans for this process, if enabled."""
+    tracing_options = parameters["tracing_options"]
+    if not tracing_options["serving_enabled"]:
+        return None
+    return start_tracing(tracing_options["serving_trace"], tracing_options["flush_every"])
 
 @st.cache_data
-def load_label_map():
+def load_label_map(model_path=None):
+    """Label map published with the model (fetched bundles), else the one from the last training run."""
     label_map_path = Path("data/metadata/label_map.pkl")
+    if model_path is not None and (Path(model_path) / "label_map.pkl").exists():
+        label_map_path = Path(model_path) / "label_map.pkl"
     if not label_map_path.exists():
         return {}, "Label map not found."
     try:
@@ -96,46 +275,51 @@ def load_label_map():
     except Exception as e:
         return {}, f"Error loading label map: {e}"
 
-def preprocess_image(image):
-    """Preprocess uploaded image for prediction."""
-    if image.mode != 'RGB':
-        image = image.convert('RGB')
-    max_size = 512
-    if max(image.size) > max_size:
-        ratio = max_size / max(image.size)
-        new_size = tuple(int(dim * ratio) for dim in image.size)
-        image = image.resize(new_size, Image.Resampling.LANCZOS)
-    return image
+def preprocess_image(uploaded_file):
+    """Decode an uploaded image directly to the model's input size."""
+    decode_options = parameters["decode_options"]
+    return decode_image(uploaded_file, decode_options["target_size"], decode_options["max_pixels"])
 
-def predict_breed(model, image, label_map):
-    """Predict breed from image using the model."""
-    try:
-        with tempfile.NamedTemporaryFile(suffix=".jpg", delete=False) as tmp:
-            image.save(tmp.name)
-            image_path = tmp.name
-        temp_df = pd.DataFrame({'image': [image_path], 'label': [0]})
+def predict_breed(model, image, label_map, shadow=None, tta_options=None, admission=None, fallback=None,
+                  active_learning=None, image_bytes=None):
+    """Predict breed from image using the model.
+
+    When a `ShadowEvaluator` is given, the request may also be sampled for the
+    candidate model; that work happens in the background after we return.
+    Passing `tta_options` scores all augmented views in one batched pass.
+    With an `AdmissionController` the request waits in the shared queue as
+    interactive work; under load it runs degraded (no TTA, and the fallback
+    model if one is loaded) or is rejected with a busy message. Uncertain
+    predictions are queued for `active_learning` without waiting on disk,
+    with the original upload `image_bytes` when given.
+    Returns (prediction, inference time, confidence, degraded, error).
+    """
+    def run(degraded):
+        predictor = fallback if degraded and fallback is not None else model
         start_time = time.time()
-        predictions = model.predict(temp_df)
-        inference_time = time.time() - start_time
-        try:
-            probabilities = model.predict_proba(temp_df)
-            predicted_class = predictions[0]
-            # If label_map is used and prediction is int, map to class name
-            if label_map and isinstance(predicted_class, int):
-                predicted_class = label_map.get(predicted_class, predicted_class)
-            # Fetch confidence for predicted class
-            if predicted_class in probabilities.columns:
-                confidence = float(probabilities.loc[0, predicted_class])
+        with span('request', source='interactive', tta=bool(tta_options and not degraded), degraded=degraded):
+            if tta_options and not degraded:
+                probabilities = predict_tta(predictor, [image], tta_options["crop_scale"], tta_options["num_crops"])
             else:
-                confidence = float(probabilities.iloc[0].max())  # fallback
-        except Exception:
-            confidence = 0.85
-        os.unlink(image_path)
-        # For display, map index to class name if label_map is used
-        display_class = label_map.get(predictions[0], predictions[0]) if label_map else predictions[0]
-        return display_class, inference_time, confidence, None
+                probabilities = predict_images(predictor, [image])
+        return probabilities, time.time() - start_time, degraded
+
+    try:
+        if admission is None:
+            probabilities, inference_time, degraded = run(False)
+        else:
+            probabilities, inference_time, degraded = admission.call(
+                run, INTERACTIVE, parameters["admission_options"]["interactive_deadline"])
+        predicted_class, display_class, confidence = top_prediction(probabilities, label_map=label_map)
+        if shadow is not None and not tta_options and not degraded:
+            shadow.maybe_submit(image, predicted_class, inference_time)
+        if active_learning is not None:
+            active_learning.maybe_log(image, probabilities.iloc[0], inference_time, image_bytes=image_bytes)
+        return display_class, inference_time, confidence, degraded, None
+    except Rejected as e:
+        return None, None, None, False, str(e)
     except Exception as e:
-        return None, None, None, f"Prediction error: {e}"
+        return None, None, None, False, f"Prediction error: {e}"
 
 def get_supported_breeds(label_map):
     if label_map:
@@ -150,8 +334,19 @@ def get_supported_breeds(label_map):
 # --- Sidebar Navigation ---
 st.sidebar.image("https://cdn-icons-png.flaticon.com/512/616/616408.png", width=60)
 st.sidebar.title("Pet Breed Classifier")
-model, model_status = load_model()
-label_map, label_status = load_label_map()
+load_tracing()
+model_handle, model_status = load_model()
+# Take the predictor once per script run so a hot swap never splits a request
+model, model_version = model_handle.current() if model_handle is not None else (None, None)
+label_map, label_status = load_label_map(model_handle.model_path if model_handle is not None else None)
+shadow, shadow_status = load_shadow_evaluator()
+tta_policy = load_tta_policy()
+admission, fallback_model, admission_status = load_admission_controller()
+cascade_calibration, cascade_fast, cascade_counts, cascade_status = load_cascade()
+active_learning = load_active_learning()
+# The app predicts through the cascade when it is calibrated; `model` stays the full model
+predictor, cascade_error = cascade_predictor(model, model_version, cascade_calibration, cascade_fast, cascade_counts)
+cascade_status = cascade_status or cascade_error
 supported_breeds = get_supported_breeds(label_map)
 
 with st.sidebar:
@@ -164,6 +359,12 @@ with st.sidebar:
         st.markdown(f'<div class="status-success">✅ {len(label_map)} Breeds</div>', unsafe_allow_html=True)
     else:
         st.markdown(f'<div class="status-warning">⚠️ {label_status or "Label map missing"}</div>', unsafe_allow_html=True)
+    if shadow_status:
+        st.markdown(f'<div class="status-warning">⚠️ {shadow_status}</div>', unsafe_allow_html=True)
+    if admission_status:
+        st.markdown(f'<div class="status-warning">⚠️ {admission_status}</div>', unsafe_allow_html=True)
+    if cascade_status:
+        st.markdown(f'<div class="status-warning">⚠️ {cascade_status}</div>', unsafe_allow_html=True)
     st.markdown("---")
     st.header("Navigation")
     nav = st.radio("Go to:", ["Classify Image", "Model Info", "About"], index=0)
@@ -175,22 +376,73 @@ st.markdown('<h1 class="main-header">🐾 Pet Breed Classifier</h1>', unsafe_all
 st.markdown('<div class="sub-header">Upload a photo of your pet and discover its breed in seconds!</div>', unsafe_allow_html=True)
 
 if nav == "Classify Image":
-    tab1, tab2 = st.tabs(["🐶 Upload & Predict", "📋 Supported Breeds"])
+    tab1, tab_batch, tab2 = st.tabs(["🐶 Upload & Predict", "📦 Batch Upload", "📋 Supported Breeds"])
     with tab1:
         st.markdown('<div class="card">', unsafe_allow_html=True)
         st.header("Upload Image")
-        uploaded_file = st.file_uploader("Choose an image file", type=['png', 'jpg', 'jpeg'], help="Upload a pet image")
+        upload_options = parameters["upload_options"]
+        # The uploader key is bumped once an upload is decoded, which drops the raw
+        # bytes from the session; only the model-sized image is kept afterwards,
+        # plus the original bytes until the first prediction, which may log them
+        # for active learning.
+        uploader_key = st.session_state.setdefault("uploader_key", 0)
+        uploaded_file = st.file_uploader(
+            "Choose an image file", type=['png', 'jpg', 'jpeg'], key=f"uploader_{uploader_key}",
+            help=f"Upload a pet image (max {upload_options['max_bytes'] / 1024 ** 2:.0f} MB)"
+        )
         if uploaded_file is not None:
+            upload_info, upload_error = inspect_upload(
+                uploaded_file, upload_options["max_bytes"], parameters["decode_options"]["max_pixels"]
+            )
+            if upload_error:
+                st.markdown(f'<div class="status-error">❌ {upload_error}</div>', unsafe_allow_html=True)
+            else:
+                try:
+                    st.session_state["upload"] = {
+                        'name': uploaded_file.name,
+                        'info': upload_info,
+                        'image': preprocess_image(uploaded_file),
+                        'bytes': uploaded_file.getvalue() if active_learning is not None and model is not None else None
+                    }
+                    st.session_state["uploader_key"] += 1
+                    st.rerun()
+                except Exception as e:
+                    st.markdown(f'<div class="status-error">❌ Error: {e}</div>', unsafe_allow_html=True)
+        upload = st.session_state.get("upload")
+        if upload is not None:
             try:
-                image = Image.open(uploaded_file)
+                processed_image = upload['image']
+                upload_info = upload['info']
                 st.markdown('<div class="upload-box">', unsafe_allow_html=True)
-                st.image(image, caption="Preview", use_column_width=True)
+                st.image(make_thumbnail(processed_image, upload_options["preview_size"]), caption="Preview")
+                st.caption(f"{upload['name']} · {upload_info['width']}x{upload_info['height']} "
+                           f"{upload_info['format']} · {upload_info['bytes'] / 1024:.0f} KB")
                 st.markdown('</div>', unsafe_allow_html=True)
-                processed_image = preprocess_image(image)
+                if st.button("Remove image"):
+                    del st.session_state["upload"]
+                    st.rerun()
+                tta_requested = False
+                if parameters["tta_options"]["enabled"]:
+                    tta_requested = st.checkbox("Test-time augmentation (slower, more accurate)", value=False)
                 if st.button("🔍 Classify Breed", type="primary"):
                     with st.spinner("Analyzing image..."):
                         if model is not None:
-                            pred, inf_time, conf, err = predict_breed(model, processed_image, label_map)
+                            use_tta = tta_policy.begin(tta_requested)
+                            pred, inf_time, conf, degraded, err = predict_breed(
+                                predictor, processed_image, label_map, shadow,
+                                tta_options=parameters["tta_options"] if use_tta else None,
+                                admission=admission, fallback=fallback_model,
+                                active_learning=active_learning, image_bytes=upload.get('bytes')
+                            )
+                            # The log's queue holds its own reference if it took them
+                            upload['bytes'] = None
+                            # Latency of the fallback model says nothing about the full model's cost
+                            served_by_fallback = degraded and fallback_model is not None
+                            tta_policy.end(None if served_by_fallback else inf_time, use_tta and not degraded)
+                            if degraded:
+                                st.caption("Served in reduced-quality mode because the server is under heavy load.")
+                            elif tta_requested and not use_tta:
+                                st.caption("Test-time augmentation skipped to stay within the latency budget.")
                         else:
                             # Demo mode fallback
                             import random
@@ -209,9 +461,45 @@ if nav == "Classify Image":
                         st.markdown('</div>', unsafe_allow_html=True)
             except Exception as e:
                 st.markdown(f'<div class="status-error">❌ Error: {e}</div>', unsafe_allow_html=True)
-        else:
+        elif uploaded_file is None:
             st.info("Please upload an image to begin.")
         st.markdown('</div>', unsafe_allow_html=True)
+    with tab_batch:
+        st.markdown('<div class="card">', unsafe_allow_html=True)
+        st.header("Batch Upload")
+        batch_options = parameters["batch_options"]
+        batch_files = st.file_uploader(
+            "Choose image files or a zip archive", type=['png', 'jpg', 'jpeg', 'zip'],
+            accept_multiple_files=True, help=f"Up to {batch_options['max_files']} images per batch"
+        )
+        if batch_files and st.button("🔍 Classify All", type="primary"):
+            if model is None:
+                st.markdown('<div class="status-warning">⚠️ Batch classification needs a trained model.</div>', unsafe_allow_html=True)
+            else:
+                decode_options = parameters["decode_options"]
+                with st.spinner("Decoding images..."):
+                    entries = expand_uploads(batch_files, batch_options["max_files"], parameters["upload_options"]["max_bytes"])
+                    # Originals are kept only for this run, for the active-learning log
+                    decoded = decode_entries(entries, decode_options["target_size"], decode_options["max_pixels"],
+                                             batch_options["decode_workers"], keep_bytes=active_learning is not None)
+                progress_bar = st.progress(0.0, text="Classifying...")
+                start_time = time.time()
+                st.session_state["batch_results"] = classify_batch(
+                    predictor, decoded, label_map, batch_options["batch_size"], batch_options["top_k"],
+                    progress=progress_bar.progress, admission=admission,
+                    deadline=parameters["admission_options"]["bulk_deadline"],
+                    active_learning=active_learning
+                )
+                st.session_state["batch_time"] = time.time() - start_time
+        batch_results = st.session_state.get("batch_results")
+        if batch_results is not None:
+            classified = batch_results['error'].isna().sum()
+            st.write(f"Classified {classified} of {len(batch_results)} images in {st.session_state['batch_time']:.2f}s "
+                     f"({st.session_state['batch_time'] / max(classified, 1):.3f}s per image)")
+            st.dataframe(batch_results, use_container_width=True)
+            st.download_button("⬇️ Download CSV", batch_results.to_csv(index=False),
+                               file_name="breed_predictions.csv", mime="text/csv")
+        st.markdown('</div>', unsafe_allow_html=True)
     with tab2:
         st.markdown('<div class="card">', unsafe_allow_html=True)
         st.header("Supported Breeds")
@@ -226,6 +514,52 @@ elif nav == "Model Info":
     st.metric("Test Accuracy", "92,54%")
     st.metric("Categories", len(supported_breeds))
     st.metric("Avg Inference", "1.0746s")
+    if shadow is not None:
+        st.markdown("---")
+        st.header("Shadow Evaluation")
+        shadow_summary = shadow.summary()
+        col1, col2, col3 = st.columns(3)
+        agreement = shadow_summary['agreement_rate']
+        col1.metric("Agreement", f"{agreement:.1%}" if agreement is not None else "n/a")
+        col2.metric("Compared", shadow_summary['completed'])
+        col3.metric("Dropped", shadow_summary['dropped'])
+        if 'mean_latency_delta' in shadow_summary:
+            st.write(f"Primary p50/p95: {shadow_summary['primary_p50_latency']:.3f}s / {shadow_summary['primary_p95_latency']:.3f}s")
+            st.write(f"Candidate p50/p95: {shadow_summary['candidate_p50_latency']:.3f}s / {shadow_summary['candidate_p95_latency']:.3f}s")
+            st.write(f"Mean latency delta (candidate - primary): {shadow_summary['mean_latency_delta']:+.3f}s")
+    if admission is not None:
+        st.markdown("---")
+        st.header("Admission Control")
+        admission_stats = admission.stats()
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Queue depth", admission_stats['depth'])
+        col2.metric("Max depth", admission_stats['max_depth'])
+        col3.metric("Queue wait p95", f"{admission_stats['wait_p95']:.3f}s")
+        st.dataframe(pd.DataFrame(admission_stats['by_priority']).T)
+    if isinstance(predictor, CascadePredictor):
+        st.markdown("---")
+        st.header("Early-Exit Cascade")
+        cascade_stats = cascade_counts.stats()
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Threshold", f"{cascade_calibration['threshold']:.2f}")
+        col2.metric("Images", cascade_stats['images'])
+        col3.metric("Escalated", f"{cascade_stats['escalation_rate']:.1%}")
+        validation = cascade_calibration['validation']
+        st.write(f"Validation: accuracy {validation['cascade']['accuracy']:.4f} vs {validation['full_accuracy']:.4f} "
+                 f"for the full model, {validation['cascade']['savings']:.1%} compute saved")
+    if active_learning is not None:
+        st.markdown("---")
+        st.header("Active Learning")
+        active_stats = active_learning.stats()
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Predictions seen", active_stats['seen'])
+        col2.metric("Logged for labelling", active_stats['written'])
+        col3.metric("Dropped", active_stats['dropped'])
+        st.caption("Export a deduplicated labelling batch with `make al-export`.")
+    if isinstance(model, WorkerPool):
+        st.markdown("---")
+        st.header("Inference Workers")
+        st.dataframe(pd.DataFrame(model.memory_report()).T.round(1))
     st.markdown("---")
     st.header("Recent Predictions (Demo)")
     sample_predictions = [
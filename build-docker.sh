@@ -8,16 +8,17 @@ set -e  # Exit on any error
 echo "Pet Breed Classifier - Docker Build Script"
 echo "=========================================="
 
-# Check if model exists
-MODEL_PATH="models/autogluon_model"
+# Check if the exported serving model exists
+MODEL_PATH="models/serving_model"
 if [ ! -d "$MODEL_PATH" ]; then
-    echo "ERROR: Model directory not found at $MODEL_PATH"
+    echo "ERROR: Exported model not found at $MODEL_PATH"
     echo "Please train the model first using: python run_pipeline.py"
+    echo "or export an existing one using: make export-model"
     exit 1
 fi
 
 # Check required model files
-REQUIRED_FILES=("model.ckpt" "config.yaml" "df_preprocessor.pkl")
+REQUIRED_FILES=("timm_model.json" "weights.safetensors")
 MISSING_FILES=()
 
 for file in "${REQUIRED_FILES[@]}"; do
@@ -51,8 +52,8 @@ if [ $? -eq 0 ]; then
     echo "To run the container:"
     echo "  docker run -p 8501:8501 pet-breed-classifier"
     echo ""
-    echo "To test the model loading:"
-    echo "  docker run --rm pet-breed-classifier python test_model_loading.py"
+    echo "To check startup time and image size:"
+    echo "  make serving-report"
     echo ""
     echo "The app will be available at: http://localhost:8501"
 else
@@ -23,5 +23,184 @@ parameters = {
         "learning_rate": 0.0004,  # Fixed to match saved model
         "max_epochs": 10,  # Fixed to match saved model
         "patience": 10
+    },
+    "registry_options": {
+        "keep_versions": 3,  # Old versions kept so serving can finish in-flight requests
+        "poll_interval": 5  # Seconds between checks of the "current" model pointer
+    },
+    "shadow_options": {
+        "enabled": False,
+        "model_path": "models/candidate_model",  # e.g. a quantized or different-backbone predictor
+        "sample_rate": 0.1,  # Fraction of requests mirrored to the candidate
+        "max_workers": 1,
+        "max_pending": 4,  # Shadow jobs beyond this are dropped, not queued
+        "log_path": "outputs/shadow_log.jsonl"
+    },
+    "tta_options": {
+        "enabled": True,  # Offer the per-request TTA toggle in the app
+        "crop_scale": 0.875,
+        "num_crops": 3,  # Views per image = original + flip + crops
+        "latency_budget": 2.0,  # Seconds; TTA is skipped when the estimate exceeds this
+        "max_in_flight": 2,  # TTA is skipped while more requests than this are running
+        "evaluate": False  # Also score the test set with TTA in run_pipeline
+    },
+    "serving_options": {
+        "replicas": 1,  # Model replicas (app processes) per host, see run.py
+        "workers": 1,  # >1 serves each replica from a pool of forked workers sharing one copy of the weights
+        "intra_op_threads": None,  # None = CPUs owned by each replica
+        "inter_op_threads": 1,
+        "pin_cpus": False,  # Pin each replica to its own slice of the host CPUs
+        "verify_weights": "lazy",  # Packed weight checksums: "lazy" (background thread), True (before serving), False
+        "benchmark": {
+            "duration": 30,  # Seconds measured per setting
+            "startup_timeout": 300,  # Seconds a replica may take to load and warm up before the setting fails
+            "batch_size": 1,
+            "settings": [
+                {"replicas": 1, "intra_op_threads": None, "pin_cpus": False},
+                {"replicas": 2, "intra_op_threads": None, "pin_cpus": True},
+                {"replicas": 4, "intra_op_threads": None, "pin_cpus": True}
+            ]
+        }
+    },
+    "decode_options": {
+        "target_size": 224,  # Shorter side after decoding; matches the model input size
+        "max_pixels": 40_000_000,  # Larger images are rejected before decoding
+        "batch_size": 32  # Images per forward pass in evaluation
+    },
+    "upload_options": {
+        "max_bytes": 10 * 1024 ** 2,  # Keep in line with server.maxUploadSize in .streamlit/config.toml
+        "preview_size": 320  # Longest side of the preview thumbnail
+    },
+    "batch_options": {
+        "max_files": 200,  # Images per batch upload, zip members included
+        "batch_size": 32,  # Images per forward pass
+        "top_k": 3,
+        "decode_workers": 4
+    },
+    "distill_options": {
+        "enabled": False,  # Run the distillation stage after training
+        "student_checkpoints": ["mobilenetv3_small_100", "efficientnet_lite0"],
+        "temperature": 4.0,
+        "alpha": 0.7,  # Weight of the soft-label loss vs. cross-entropy on true labels
+        "max_epochs": 10,
+        "batch_size": 32,
+        "learning_rate": 0.001,
+        "num_workers": 4
+    },
+    "fast_retrain_options": {
+        "enabled": False,  # Retrain only a linear head on cached backbone features instead of a full fit
+        "backbone": "mobilenetv3_large_100",
+        "max_epochs": 300,  # Full-batch steps over the cached features
+        "learning_rate": 0.01,
+        "weight_decay": 0.0001,
+        "force_publish": False  # Publish even if validation accuracy is below the current version's
+    },
+    "hpo_options": {
+        "enabled": False,  # Replace the single training run with a parallel successive-halving search
+        "workers": 2,  # Concurrent trial processes
+        "threads_per_trial": 4,  # Torch/dataloader threads per trial; workers * threads should fit num_cpus
+        "num_trials": 8,  # Configurations sampled from the search space
+        "seed": 0,  # Same seed + search space -> same configurations, so cached trials are reused
+        "min_epochs": 1,  # Budget of the first rung
+        "max_epochs": 8,  # Budget of the last rung
+        "eta": 2,  # Keep the top 1/eta trials and multiply the budget by eta per rung
+        "time_limit_per_trial": 900,
+        "max_latency": None,  # Optional p50 latency budget (seconds) when picking the winner
+        "search_space": {
+            "model.timm_image.checkpoint_name": ["mobilenetv3_large_100", "mobilenetv3_small_100", "efficientnet_b0"],
+            "optimization.learning_rate": [0.0001, 0.0004, 0.001],
+            "env.per_gpu_batch_size": [8, 16]
+        }
+    },
+    "profile_options": {
+        "enabled": False,  # Profile the training input pipeline before fitting
+        "num_workers": [0, 2, 4, 8],  # Data-loader worker counts to try (settings above the CPU count are skipped)
+        "batch_sizes": [8, 16, 32],
+        "epochs": 2,  # The first epoch includes worker start-up and is excluded from averages
+        "steps_per_epoch": 20
+    },
+    "report_options": {
+        "plots": True,  # Render the confusion matrix PNG; metrics.json is always written
+        "annotate_max_classes": 40,  # Per-cell counts are drawn only up to this many classes
+        "dpi": 120
+    },
+    "load_test_options": {
+        "replicas": [1, 2],  # Replica counts to size; each runs the full set of load levels
+        "users": [1, 4, 16],  # Closed-loop levels: concurrent clients waiting for their answer
+        "rates": [1, 2, 4, 8, 16, 32],  # Open-loop levels: Poisson arrivals per second
+        "duration": 30,  # Seconds per level
+        "think_time": 0.0,  # Pause between a closed-loop client's requests
+        "timeout": 5.0,  # Requests slower than this count as errors
+        "startup_timeout": 300,  # Seconds the replicas may take to load and warm up before the run fails
+        "slo_p95": 1.0,  # p95 latency (seconds) above which a rate counts as saturated
+        "payloads": 32  # Distinct images cycled through by the clients
+    },
+    "admission_options": {
+        "enabled": True,  # Route app inference through one bounded, prioritised queue per process
+        "max_queue": 16,  # Waiting requests beyond this are shed (bulk first)
+        "degrade_depth": 4,  # Queue depth at which requests skip TTA / use the fallback model
+        "interactive_deadline": 5.0,  # Seconds a UI request may wait in the queue
+        "bulk_deadline": 60.0,  # Seconds a batch-upload chunk may wait in the queue
+        "fallback_model_path": None  # e.g. "models/students/mobilenetv3_small_100"
+    },
+    "export_options": {
+        "enabled": True,  # Export the trained model for the slim serving image (Dockerfile)
+        "export_path": "models/serving_model",
+        "parity_samples": 16,  # Test images used to check the export against the AutoGluon model
+        "parity_tolerance": 1e-2,  # Max probability difference; beyond it the serving format is not written
+        "pack_weights": True  # Also write memory-mapped serving weights into every trained model version
+    },
+    "data_quality_options": {
+        "min_valid_side": 10,  # Images with a side this small or smaller are skipped as invalid
+        "min_side": 64,  # Flagged as "tiny" below this
+        "max_aspect": 3.0,  # Flagged as "extreme_aspect" above this long/short side ratio
+        "drop_flags": [],  # Leave flagged images out of all splits, e.g. ["tiny", "grayscale"]
+        "per_class_cap": None,  # Max training images per class; None = no cap
+        "balance": False  # Cap every class at the smallest class size (training split only)
+    },
+    "active_learning_options": {
+        "enabled": True,  # Log uncertain app predictions for labelling
+        "log_dir": "outputs/active_learning",
+        "confidence_threshold": 0.6,  # Logged below this top-1 probability...
+        "entropy_threshold": 0.5,  # ...or above this normalised entropy (0 = certain, 1 = uniform)
+        "top_k": 3,
+        "max_file_bytes": 50 * 1024 ** 2,  # Rotate the log file at this size
+        "max_files": 10,  # Rotated log files kept
+        "flush_interval": 2.0,  # Seconds the background writer batches records
+        "max_pending": 256,  # Records waiting to be written; beyond this they are dropped
+        "export_dir": "data/labeling",
+        "batch_size": 200,  # Images per exported labelling batch
+        "max_hash_distance": 6  # Perceptual-hash bits within which images count as duplicates
+    },
+    "calibration_options": {
+        "enabled": True,  # Fit temperature scaling on the validation split after training
+        "method": "temperature"  # "temperature" (one scalar) or "per_class" (one temperature per class)
+    },
+    "cascade_options": {
+        "enabled": False,  # Calibrate in run_pipeline and serve through the fast -> full cascade in the app
+        "fast_model_path": None,  # e.g. "models/students/mobilenetv3_small_100"; None = full model at fast_image_size
+        "fast_image_size": 160,  # Input size of the reduced-resolution fast stage
+        "max_accuracy_drop": 0.005,  # Validation accuracy the cascade may give up vs. the full model
+        "calibration_path": "data/metadata/cascade.json"  # Calibrated threshold, read by the app
+    },
+    "tracing_options": {
+        "enabled": False,  # Record a span per pipeline step (scan, split, train, validate, evaluate, plot, ...)
+        "pipeline_trace": "outputs/traces/pipeline.jsonl",  # Replaced on every run_pipeline
+        "summary_path": "outputs/trace_summary.txt",  # Wall-time tree; a .folded file for flame graphs goes next to it
+        "serving_enabled": False,  # Record decode / preprocess / forward / postprocess spans in the app
+        "serving_trace": "outputs/traces/serving.jsonl",  # Appended to by every app process
+        "flush_every": 256  # Spans buffered before each write
+    },
+    "model_fetch_options": {
+        "remote_url": None,  # e.g. "https://models.example.com/pet-breeds", "file:///mnt/models" or a directory; MODEL_REMOTE_URL overrides
+        "name": "pet-breed-classifier",  # Bundles live under <remote_url>/<name>/<version>/
+        "ref": "latest",  # Ref (<remote_url>/<name>/refs/<ref>) or version to serve; MODEL_REF overrides
+        "cache_dir": ".cache/models",  # Content-addressed local cache, shared by replicas on one volume
+        "max_cache_bytes": 5 * 1024 ** 3,  # Least recently used versions are evicted beyond this
+        "workers": 8,  # Parallel chunk downloads
+        "chunk_size": 8 * 1024 ** 2,  # Bytes per ranged request; also the resume granularity
+        "timeout": 30,  # Seconds per request
+        "retries": 3,  # Per chunk, with exponential backoff
+        "publish_dir": "models/remote"  # Local stand-in for the remote used by `make publish-model`
     }
 }
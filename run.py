@@ -5,6 +5,7 @@ Entry point for Hugging Face Spaces
 import subprocess
 import sys
 import os
+from pipeline_config import parameters
 
 if __name__ == "__main__":
     # Set environment variables for Streamlit
@@ -12,10 +13,19 @@ if __name__ == "__main__":
     os.environ.setdefault("STREAMLIT_SERVER_ADDRESS", "0.0.0.0")
     os.environ.setdefault("STREAMLIT_SERVER_HEADLESS", "true")
     
-    # Run the Streamlit app
-    subprocess.run([
-        sys.executable, "-m", "streamlit", "run", "app.py",
-        "--server.port=8501",
-        "--server.address=0.0.0.0",
-        "--server.headless=true"
-    ]) 
\ No newline at end of file
+    # Run one Streamlit app per configured replica on consecutive ports.
+    # Each replica applies its own thread/CPU settings from SERVING_REPLICA_INDEX.
+    replicas = parameters["serving_options"]["replicas"]
+    processes = []
+    for replica_index in range(replicas):
+        port = 8501 + replica_index
+        env = dict(os.environ, SERVING_REPLICA_INDEX=str(replica_index))
+        processes.append(subprocess.Popen([
+            sys.executable, "-m", "streamlit", "run", "app.py",
+            f"--server.port={port}",
+            "--server.address=0.0.0.0",
+            "--server.headless=true"
+        ], env=env))
+    
+    for process in processes:
+        process.wait()
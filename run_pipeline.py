@@ -1,5 +1,11 @@
 from scripts.preprocess import preprocess_data
 from scripts.train_model import train_model
+from scripts.cascade import calibrate_cascade
+from scripts.distill_model import distill_model, compare_models
+from scripts.fast_retrain import fast_retrain
+from scripts.export_model import export_model
+from scripts.hpo import run_hpo
+from scripts.profile_training import profile_training
 from scripts.validate_model import (
     validate_model_loading,
     evaluate_model,
@@ -8,11 +14,33 @@ from scripts.validate_model import (
     analyze_model_size,
     final_model_assessment
 )
+from scripts.metrics import write_metrics_json
+from scripts.slice_report import write_slice_report
+from scripts.trace_summary import write_trace_summary
+from serving.tracing import span, start_tracing, stop_tracing
 from pipeline_config import parameters
 import os
 
 
 def run_pipeline():
+    tracing_options = parameters["tracing_options"]
+    if not tracing_options["enabled"]:
+        return run_steps()
+
+    # One trace per run, like the other files in outputs/
+    trace_path = tracing_options["pipeline_trace"]
+    if os.path.exists(trace_path):
+        os.remove(trace_path)
+    start_tracing(trace_path, tracing_options["flush_every"])
+    try:
+        with span('pipeline'):
+            return run_steps()
+    finally:
+        stop_tracing()
+        write_trace_summary(trace_path, tracing_options["summary_path"])
+
+
+def run_steps():
     print("\n Starting Full Training & Evaluation Pipeline...\n")
 
     # Step 0: Check for local training data
@@ -42,39 +70,107 @@ def run_pipeline():
 
     # Step 1: Preprocess data
     print(" Step 1: Preprocessing data...")
-    train_df, val_df, test_df = preprocess_data(parameters)
+    with span('preprocess'):
+        train_df, val_df, test_df = preprocess_data(parameters)
+
+    # Step 1b: Profile training throughput (optional)
+    if parameters["profile_options"]["enabled"]:
+        print(" Step 1b: Profiling training throughput...")
+        with span('profile'):
+            profile_training(train_df, parameters)
 
     # Step 2: Train model
-    print(" Step 2: Training model...")
-    train_model(train_df, val_df, parameters)
+    if parameters["fast_retrain_options"]["enabled"]:
+        print(" Step 2: Fast retrain on cached backbone features...")
+        with span('train', mode='fast_retrain'):
+            fast_retrain(train_df, val_df, parameters)
+    elif parameters["hpo_options"]["enabled"]:
+        print(" Step 2: Hyperparameter search...")
+        with span('train', mode='hpo'):
+            run_hpo(train_df, val_df, parameters)
+    else:
+        print(" Step 2: Training model...")
+        with span('train', mode='autogluon'):
+            train_model(train_df, val_df, parameters)
+
+    # Step 2b: Distil into smaller student backbones (optional)
+    student_paths = {}
+    if parameters["distill_options"]["enabled"]:
+        print(" Step 2b: Distilling student models...")
+        with span('distill'):
+            student_paths = distill_model(train_df, val_df, parameters)
 
     # Step 3: Validate trained model
     print(" Step 3: Validating trained model...")
-    if not validate_model_loading():
+    with span('validate'):
+        model_valid = validate_model_loading()
+    if not model_valid:
         print("   ERROR: Model validation failed!")
         print("   The trained model cannot be loaded correctly.")
         return
     print("   SUCCESS: Model validation passed!")
 
+    # Step 3b: Export the model for the slim serving image
+    export_options = parameters["export_options"]
+    if export_options["enabled"]:
+        print(" Step 3b: Exporting serving model...")
+        with span('export'):
+            export_model(export_path=export_options["export_path"],
+                         sample_paths=test_df['image'].head(export_options["parity_samples"]).tolist(),
+                         tolerance=export_options["parity_tolerance"])
+
+    # Step 3c: Calibrate the fast -> full cascade threshold (optional)
+    if parameters["cascade_options"]["enabled"]:
+        print(" Step 3c: Calibrating early-exit cascade on the validation split...")
+        with span('cascade'):
+            calibrate_cascade(val_df, parameters, test_df=test_df)
+
     # Step 4: Evaluate model
     print(" Step 4: Evaluating model on test data...")
-    performance_metrics = evaluate_model(test_df)
+    with span('evaluate', images=len(test_df)):
+        performance_metrics = evaluate_model(
+            test_df,
+            tta_options=parameters["tta_options"],
+            decode_options=parameters["decode_options"]
+        )
 
-    # Step 5: Generate confusion matrix
-    print(" Step 5: Generating confusion matrix...")
-    generate_confusion_matrix(performance_metrics)
+    # Step 5: Generate confusion matrix (optional)
+    report_options = parameters["report_options"]
+    if report_options["plots"]:
+        print(" Step 5: Generating confusion matrix...")
+        with span('plot'):
+            generate_confusion_matrix(performance_metrics,
+                                      annotate_max_classes=report_options["annotate_max_classes"],
+                                      dpi=report_options["dpi"])
 
-    # Step 6: Generate classification report
+    # Step 6: Generate classification report and metrics JSON
     print(" Step 6: Generating classification report...")
-    generate_classification_report(performance_metrics)
+    with span('report'):
+        generate_classification_report(performance_metrics)
+        write_metrics_json(performance_metrics)
+
+    # Step 6b: Per-breed, per-resolution and per-format breakdown
+    print(" Step 6b: Generating slice breakdown...")
+    with span('slices'):
+        write_slice_report(performance_metrics)
 
     # Step 7: Analyze model size
     print(" Step 7: Analyzing model size...")
-    analyze_model_size()
+    with span('model_size'):
+        analyze_model_size()
 
     # Step 8: Final assessment summary
     print(" Step 8: Final model assessment...")
-    final_model_assessment(performance_metrics)
+    with span('assessment'):
+        final_model_assessment(performance_metrics)
+
+    # Step 9: Compare teacher and students (optional)
+    if student_paths:
+        print(" Step 9: Comparing teacher and student models...")
+        teacher_name = parameters["model_options"]["hyperparameters"]["model.timm_image.checkpoint_name"]
+        with span('compare'):
+            compare_models(test_df, {f"{teacher_name} (teacher)": os.path.join(os.path.dirname(__file__), 'models', 'autogluon_model'),
+                                     **student_paths}, parameters)
 
     print("\n Pipeline completed successfully! All outputs saved to 'outputs/' folder.\n")
 
@@ -0,0 +1,167 @@
+import argparse
+import base64
+import json
+import os
+import pickle
+import shutil
+import time
+
+import numpy as np
+import pandas as pd
+
+from pipeline_config import parameters
+from serving.active_learning import log_files
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+EXPORTED_FILE = 'exported.csv'
+
+
+def load_log(log_dir):
+    """All logged predictions, oldest first, as a DataFrame (images stay base64-encoded)."""
+    records = []
+    for path in log_files(log_dir):
+        with open(path) as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue  # a line cut short by a crash
+    return pd.DataFrame(records)
+
+
+def hamming_distances(hashes, target):
+    """Bit distance between each 64-bit hash in `hashes` (uint64 array) and `target`."""
+    return np.unpackbits((hashes ^ target).view(np.uint8).reshape(len(hashes), 8), axis=1).sum(axis=1)
+
+
+def deduplicate(records, max_distance=6, exclude_phashes=()):
+    """Keep the most uncertain record of each group of near-identical images.
+
+    Records are taken in priority order (smallest top-2 margin first); one
+    is kept only if its perceptual hash differs from every kept hash, and
+    from every hash in `exclude_phashes`, by more than `max_distance` bits.
+    Exact duplicates (same image hash) go first.
+    """
+    records = records.sort_values(['margin', 'confidence']).drop_duplicates('image_hash')
+    hashes = np.array([int(value, 16) for value in records['phash']], dtype=np.uint64)
+    kept = np.zeros(len(records), dtype=bool)
+    kept_hashes = np.array([int(value, 16) for value in exclude_phashes], dtype=np.uint64)
+    for i, image_hash in enumerate(hashes):
+        if len(kept_hashes) == 0 or hamming_distances(kept_hashes, image_hash).min() > max_distance:
+            kept[i] = True
+            kept_hashes = np.append(kept_hashes, image_hash)
+    return records[kept]
+
+
+def load_exported(export_root):
+    """Image and perceptual hashes of every record exported in earlier batches."""
+    exported_path = os.path.join(export_root, EXPORTED_FILE)
+    if not os.path.exists(exported_path):
+        return pd.DataFrame(columns=['image_hash', 'phash', 'batch'])
+    return pd.read_csv(exported_path, dtype=str)
+
+
+def logged_image(record):
+    """(file extension, bytes) of a logged image: the original upload if it was logged, else the model-sized JPEG."""
+    original = record.get('image_original')
+    if isinstance(original, str):
+        return ('png' if record['image_format'] == 'PNG' else 'jpg'), base64.b64decode(original)
+    return 'jpg', base64.b64decode(record['image_jpeg'])
+
+
+def export_labeling_batch(log_dir=None, export_root=None, batch_size=None, max_distance=None,
+                          label_map_path="data/metadata/label_map.pkl"):
+    """
+    Deduplicates the active-learning log by perceptual hash and exports the
+    `batch_size` most uncertain images for labelling: the images plus a
+    manifest.csv with the model's top-k guesses and an empty `label` column.
+    Images exported in earlier batches (listed in <export_root>/exported.csv),
+    and near-duplicates of them, are skipped. Returns the batch directory.
+    """
+    options = parameters["active_learning_options"]
+    log_dir = log_dir or options["log_dir"]
+    export_root = export_root or options["export_dir"]
+    batch_size = batch_size or options["batch_size"]
+    max_distance = options["max_hash_distance"] if max_distance is None else max_distance
+
+    records = load_log(log_dir)
+    if records.empty:
+        print(f"No logged predictions in {log_dir}")
+        return None
+    exported = load_exported(export_root)
+    records = records[~records['image_hash'].isin(exported['image_hash'])]
+    unique = deduplicate(records, max_distance, exclude_phashes=exported['phash'])
+    batch = unique.head(batch_size)
+    print(f"{len(records)} logged predictions not exported before, {len(unique)} after deduplication, "
+          f"exporting {len(batch)}")
+    if batch.empty:
+        return None
+
+    label_map = {}
+    if os.path.exists(label_map_path):
+        with open(label_map_path, "rb") as f:
+            label_map = pickle.load(f)
+
+    batch_dir = os.path.join(export_root, f"batch-{time.strftime('%Y%m%d-%H%M%S')}")
+    os.makedirs(os.path.join(batch_dir, 'images'))
+    rows = []
+    for _, record in batch.iterrows():
+        extension, image_bytes = logged_image(record)
+        file_name = f"{record['image_hash'][:16]}.{extension}"
+        with open(os.path.join(batch_dir, 'images', file_name), 'wb') as f:
+            f.write(image_bytes)
+        guesses = [(label_map.get(label, label), score) for label, score in record['top_k']]
+        rows.append({
+            'file': file_name,
+            'label': '',
+            'predicted': guesses[0][0],
+            'top_k': ", ".join(f"{name} ({score:.1%})" for name, score in guesses),
+            'confidence': round(record['confidence'], 4),
+            'margin': round(record['margin'], 4),
+            'entropy': round(record['entropy'], 4),
+            'latency': round(record['latency'], 4),
+            'logged_at': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(record['timestamp'])),
+            'phash': record['phash']
+        })
+    pd.DataFrame(rows).to_csv(os.path.join(batch_dir, 'manifest.csv'), index=False)
+    # Recorded only once the batch is complete, so a failed export is retried in full
+    exported_path = os.path.join(export_root, EXPORTED_FILE)
+    batch[['image_hash', 'phash']].assign(batch=os.path.basename(batch_dir)).to_csv(
+        exported_path, mode='a', header=not os.path.exists(exported_path), index=False)
+    print(f"Labelling batch saved to: {batch_dir} (fill in the 'label' column of manifest.csv)")
+    return batch_dir
+
+
+def merge_labeled_batch(batch_dir, raw_data_path=None):
+    """Copy the labelled images of a batch into data/pet_breeds/<label>/ for the next run_pipeline."""
+    raw_data_path = raw_data_path or os.path.join(BASE_DIR, 'data', 'pet_breeds')
+    manifest = pd.read_csv(os.path.join(batch_dir, 'manifest.csv'), dtype={'label': str}, keep_default_na=False)
+    labeled = manifest[manifest['label'].str.strip() != '']
+    merged = 0
+    for _, row in labeled.iterrows():
+        class_dir = os.path.join(raw_data_path, row['label'].strip())
+        target = os.path.join(class_dir, f"active_{row['file']}")
+        if os.path.exists(target):
+            continue
+        if not os.path.isdir(class_dir):
+            print(f"[WARNING] New class '{row['label']}' - creating {class_dir}")
+            os.makedirs(class_dir)
+        shutil.copy2(os.path.join(batch_dir, 'images', row['file']), target)
+        merged += 1
+    print(f"Merged {merged} of {len(manifest)} images into {raw_data_path} "
+          f"({len(manifest) - len(labeled)} still unlabelled)")
+    return merged
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export or merge active-learning labelling batches")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    export_parser = subparsers.add_parser('export')
+    export_parser.add_argument('--batch-size', type=int)
+    merge_parser = subparsers.add_parser('merge')
+    merge_parser.add_argument('batch_dir')
+    args = parser.parse_args()
+    if args.command == 'export':
+        export_labeling_batch(batch_size=args.batch_size)
+    else:
+        merge_labeled_batch(args.batch_dir)
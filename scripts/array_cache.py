@@ -0,0 +1,82 @@
+import hashlib
+import os
+
+import numpy as np
+
+
+def file_digest(path, chunk_size=1 << 20):
+    """SHA-1 of a file's contents, so renamed or moved images still hit the cache."""
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ArrayCache:
+    """On-disk map from image content hash to a fixed-length float vector.
+
+    One `.npz` file per namespace (e.g. teacher version or backbone name).
+    Lookups are vectorised over whole datasets and updates are incremental:
+    only hashes that are missing need to be computed and appended.
+    """
+
+    def __init__(self, cache_dir, namespace):
+        self.path = os.path.join(cache_dir, f"{namespace}.npz")
+        self._index = {}
+        self._rows = None
+        if os.path.exists(self.path):
+            with np.load(self.path, allow_pickle=False) as data:
+                self._rows = data['rows']
+                self._index = {key: i for i, key in enumerate(data['keys'])}
+
+    def __len__(self):
+        return len(self._index)
+
+    def lookup(self, keys):
+        """Return (rows, missing_mask); rows for missing keys are zero."""
+        positions = np.array([self._index.get(key, -1) for key in keys], dtype=np.int64)
+        missing = positions < 0
+        if self._rows is None:
+            return None, missing
+        rows = self._rows[np.where(missing, 0, positions)]
+        rows[missing] = 0
+        return rows, missing
+
+    def update(self, keys, rows):
+        new = [(key, row) for key, row in zip(keys, rows) if key not in self._index]
+        if not new:
+            return
+        new_rows = np.stack([row for _, row in new]).astype(np.float32)
+        start = 0 if self._rows is None else len(self._rows)
+        self._rows = new_rows if self._rows is None else np.concatenate([self._rows, new_rows])
+        for offset, (key, _) in enumerate(new):
+            self._index[key] = start + offset
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        keys = np.array(sorted(self._index, key=self._index.get))
+        tmp_path = f"{self.path}.tmp.npz"
+        np.savez(tmp_path, keys=keys, rows=self._rows)
+        os.replace(tmp_path, self.path)
+
+
+def cached_rows(cache, image_paths, compute_fn, batch_size=256):
+    """Return one cached row per image, computing (in batches) and saving only missing ones.
+
+    `compute_fn(paths)` must return a 2-D array with one row per path.
+    """
+    image_paths = list(image_paths)
+    keys = [file_digest(image_path) for image_path in image_paths]
+    rows, missing = cache.lookup(keys)
+    missing_indices = np.flatnonzero(missing)
+    if len(missing_indices):
+        print(f"   Cache: {len(keys) - len(missing_indices)} hits, computing {len(missing_indices)} new rows")
+        for batch_start in range(0, len(missing_indices), batch_size):
+            batch = missing_indices[batch_start:batch_start + batch_size]
+            cache.update([keys[i] for i in batch], compute_fn([image_paths[i] for i in batch]))
+        cache.save()
+        rows, missing = cache.lookup(keys)
+    else:
+        print(f"   Cache: all {len(keys)} rows found")
+    return rows
@@ -0,0 +1,150 @@
+import os
+import queue
+import time
+import multiprocessing
+
+import numpy as np
+import pandas as pd
+from PIL import Image
+
+from pipeline_config import parameters
+from serving.image_io import decode_image
+from serving.inference import load_predictor, predict_images
+from serving.runtime import available_cpus, apply_serving_options
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_sample_images(count=16, image_size=224):
+    """Sample test-split images if available, otherwise generate noise images."""
+    test_csv = os.path.join(BASE_DIR, 'data', 'splits', 'test_data.csv')
+    if os.path.exists(test_csv):
+        test_df = pd.read_csv(test_csv)
+        sample_paths = test_df['image'].sample(min(count, len(test_df)), random_state=0)
+        return [decode_image(image_path, image_size) for image_path in sample_paths]
+    rng = np.random.default_rng(0)
+    return [Image.fromarray(rng.integers(0, 255, (image_size, image_size, 3), dtype=np.uint8))
+            for _ in range(count)]
+
+
+def measure_latency(predictor, images, runs=50):
+    """Single-image request latency through the serving prediction path, in seconds."""
+    predict_images(predictor, images[:1])  # warm-up
+    latencies = []
+    for run in range(runs):
+        start_time = time.time()
+        predict_images(predictor, [images[run % len(images)]])
+        latencies.append(time.time() - start_time)
+    return {
+        'mean': float(np.mean(latencies)),
+        'p50': float(np.percentile(latencies, 50)),
+        'p95': float(np.percentile(latencies, 95))
+    }
+
+
+def _replica_worker(replica_index, serving_options, model_path, images, batch_size, duration, barrier, results):
+    apply_serving_options(serving_options, replica_index)
+    predictor = load_predictor(model_path)
+    predict_images(predictor, images[:batch_size])  # warm-up
+
+    barrier.wait()
+    completed = 0
+    start_time = time.time()
+    while time.time() - start_time < duration:
+        batch = [images[(completed + i) % len(images)] for i in range(batch_size)]
+        predict_images(predictor, batch)
+        completed += batch_size
+    results.put((replica_index, completed, time.time() - start_time))
+
+
+def _wait_for_replicas(results, workers, timeout):
+    """One result per replica; RuntimeError if a replica dies or `timeout` seconds pass first."""
+    deadline = time.time() + timeout
+    replica_results = []
+    while len(replica_results) < len(workers):
+        try:
+            replica_results.append(results.get(timeout=1.0))
+            continue
+        except queue.Empty:
+            pass
+        finished = {replica_index for replica_index, _, _ in replica_results}
+        for replica_index, worker in enumerate(workers):
+            if replica_index not in finished and worker.exitcode not in (None, 0):
+                raise RuntimeError(f"replica {replica_index} exited with code {worker.exitcode}")
+        if time.time() > deadline:
+            raise RuntimeError(f"{len(workers) - len(replica_results)} replica(s) gave no result within {timeout}s")
+    return replica_results
+
+
+def benchmark_setting(setting, model_path, images, batch_size, duration, startup_timeout=300):
+    """Run `replicas` pinned worker processes concurrently and return aggregate images/sec.
+
+    Raises RuntimeError if a replica crashes or does not finish within
+    `startup_timeout` + `duration` seconds.
+    """
+    serving_options = dict(parameters["serving_options"], **setting)
+    replicas = serving_options["replicas"]
+
+    # Spawn so each replica initialises torch with its own thread settings
+    ctx = multiprocessing.get_context('spawn')
+    barrier = ctx.Barrier(replicas)
+    results = ctx.Queue()
+    workers = [
+        ctx.Process(target=_replica_worker,
+                    args=(i, serving_options, model_path, images, batch_size, duration, barrier, results))
+        for i in range(replicas)
+    ]
+    for worker in workers:
+        worker.start()
+    try:
+        replica_results = _wait_for_replicas(results, workers, startup_timeout + duration)
+    except RuntimeError:
+        # The survivors may be waiting at the barrier for the dead replica forever
+        for worker in workers:
+            worker.terminate()
+        raise
+    finally:
+        for worker in workers:
+            worker.join()
+
+    total_images = sum(completed for _, completed, _ in replica_results)
+    wall_time = max(elapsed for _, _, elapsed in replica_results)
+    return total_images / wall_time
+
+
+def benchmark_serving(model_path=None, save_path='outputs/serving_throughput.txt'):
+    """Measure inference throughput for each configured thread/replica setting."""
+    if model_path is None:
+        model_path = os.path.join(BASE_DIR, 'models', 'autogluon_model')
+    benchmark_options = parameters["serving_options"]["benchmark"]
+    images = load_sample_images()
+
+    print(f"Benchmarking serving settings on {len(available_cpus())} CPUs...")
+    rows, failures = [], []
+    for setting in benchmark_options["settings"]:
+        try:
+            throughput = benchmark_setting(setting, model_path, images, benchmark_options["batch_size"],
+                                           benchmark_options["duration"], benchmark_options["startup_timeout"])
+        except RuntimeError as e:
+            failures.append((setting, str(e)))
+            print(f"[WARNING] {setting} failed: {e}")
+            continue
+        rows.append((setting, throughput))
+        print(f"   {setting}: {throughput:.1f} images/sec")
+
+    os.makedirs(os.path.dirname(save_path), exist_ok=True)
+    with open(save_path, 'w') as f:
+        f.write("SERVING THROUGHPUT BENCHMARK\n")
+        f.write("=" * 30 + "\n")
+        f.write(f"CPUs available: {len(available_cpus())}\n")
+        f.write(f"Batch size: {benchmark_options['batch_size']}, duration: {benchmark_options['duration']}s\n\n")
+        for setting, throughput in sorted(rows, key=lambda row: -row[1]):
+            f.write(f"{throughput:8.1f} images/sec  {setting}\n")
+        for setting, error in failures:
+            f.write(f"  FAILED ({error})  {setting}\n")
+
+    return rows
+
+
+if __name__ == "__main__":
+    benchmark_serving()
@@ -0,0 +1,72 @@
+import numpy as np
+import torch
+
+from scripts.metrics import expected_calibration_error
+from serving.calibration import apply_temperature, save_calibration
+from serving.inference import load_predictor, predict_files
+
+
+def fit_temperature(probabilities, label_idx, per_class=False, max_iter=100):
+    """Temperature(s) minimising the negative log-likelihood of the true labels.
+
+    Fits log-temperatures with L-BFGS, so temperatures stay positive. With
+    `per_class` each class column gets its own temperature, starting from
+    the fitted scalar one.
+    """
+    log_probs = torch.from_numpy(np.log(np.clip(np.asarray(probabilities, dtype=np.float64), 1e-12, None)))
+    # Centred like in `apply_temperature`, so per-class temperatures see the same inputs
+    log_probs = log_probs - log_probs.mean(dim=1, keepdim=True)
+    targets = torch.from_numpy(np.asarray(label_idx))
+
+    def fit(initial):
+        log_temperature = torch.tensor(initial, dtype=torch.float64, requires_grad=True)
+        optimizer = torch.optim.LBFGS([log_temperature], lr=0.1, max_iter=max_iter, line_search_fn='strong_wolfe')
+
+        def closure():
+            optimizer.zero_grad()
+            loss = torch.nn.functional.cross_entropy(log_probs / log_temperature.exp(), targets)
+            loss.backward()
+            return loss
+
+        optimizer.step(closure)
+        return log_temperature.detach().exp().numpy()
+
+    temperature = fit(0.0)
+    if per_class:
+        return fit(np.full(log_probs.shape[1], np.log(temperature)))
+    return float(temperature)
+
+
+def calibrate_model(val_df, parameters, model_path):
+    """
+    Fits temperature scaling on the validation split and saves it as
+    calibration.json with the model, where `load_predictor` picks it up.
+    `model_path` is a new version that is not published yet: a published
+    version is already being served and must not change underneath it.
+    Returns the calibration dict, including validation ECE before and after.
+    """
+    options = parameters["calibration_options"]
+    decode_options = parameters["decode_options"]
+
+    predictor = load_predictor(model_path, calibrate=False)
+    probabilities = predict_files(predictor, val_df['image'], decode_options['batch_size'],
+                                  decode_options['target_size'], decode_options['max_pixels'])
+    # Validation images of classes the model does not know cannot inform the fit
+    label_idx = probabilities.columns.get_indexer(val_df['label'])
+    known = label_idx >= 0
+    class_labels = probabilities.columns.to_numpy()
+    probabilities, labels = probabilities.to_numpy()[known], val_df['label'].to_numpy()[known]
+
+    temperature = fit_temperature(probabilities, label_idx[known], options["method"] == "per_class")
+    calibration = {
+        'method': options["method"],
+        'temperature': np.round(temperature, 6).tolist(),
+        'validation_images': int(known.sum()),
+        'ece_before': expected_calibration_error(probabilities, labels, class_labels),
+        'ece_after': expected_calibration_error(apply_temperature(probabilities, temperature), labels, class_labels)
+    }
+    save_calibration(calibration, model_path)
+    print(f"   Temperature ({options['method']}): {np.round(temperature, 3)}")
+    print(f"   Validation ECE: {calibration['ece_before']:.4f} -> {calibration['ece_after']:.4f}")
+    print(f"Calibration saved with the model: {model_path}")
+    return calibration
@@ -0,0 +1,138 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from pipeline_config import parameters
+from scripts.benchmark_serving import load_sample_images, measure_latency
+from serving.cascade import load_fast_predictor
+from serving.inference import load_predictor, predict_files
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def sweep_thresholds(fast_confidence, fast_correct, full_correct, fast_cost, full_cost, thresholds):
+    """Accuracy, escalation rate and mean cost per image of the cascade at each threshold.
+
+    Cost is the fast stage for every image plus the full model for the
+    escalated ones; savings are relative to always running the full model.
+    """
+    escalate = fast_confidence[None, :] < np.asarray(thresholds)[:, None]
+    correct = np.where(escalate, full_correct[None, :], fast_correct[None, :])
+    escalation_rate = escalate.mean(axis=1)
+    mean_cost = fast_cost + escalation_rate * full_cost
+    return pd.DataFrame({
+        'threshold': thresholds,
+        'escalation_rate': escalation_rate,
+        'accuracy': correct.mean(axis=1),
+        'mean_cost': mean_cost,
+        'savings': 1 - mean_cost / full_cost
+    })
+
+
+def choose_threshold(sweep, full_accuracy, max_accuracy_drop):
+    """Threshold with the largest savings whose accuracy stays within `max_accuracy_drop` of the full model."""
+    eligible = sweep[(sweep['accuracy'] >= full_accuracy - max_accuracy_drop) & (sweep['savings'] > 0)]
+    if eligible.empty:
+        return None
+    # Among equal savings prefer the higher (more cautious) threshold
+    return eligible.sort_values(['savings', 'accuracy', 'threshold'], ascending=False).iloc[0]
+
+
+def cascade_predictions(predictor, fast, image_df, decode_options):
+    """(fast confidence, fast correct, full correct) for the images in `image_df`."""
+    args = (decode_options['batch_size'], decode_options['target_size'], decode_options['max_pixels'])
+    full_probabilities = predict_files(predictor, image_df['image'], *args)
+    class_labels = full_probabilities.columns
+    fast_probabilities = predict_files(fast, image_df['image'], *args)[class_labels]
+    labels = image_df['label'].to_numpy()
+    return (fast_probabilities.to_numpy().max(axis=1),
+            class_labels[fast_probabilities.to_numpy().argmax(axis=1)].to_numpy() == labels,
+            class_labels[full_probabilities.to_numpy().argmax(axis=1)].to_numpy() == labels)
+
+
+def calibrate_cascade(val_df, parameters, test_df=None, model_path=None, save_path='outputs/cascade_report.txt'):
+    """
+    Calibrates the cascade confidence threshold on the validation split and
+    writes it to `cascade_options.calibration_path` for the app. The report
+    shows the accuracy / compute trade-off across thresholds and, if
+    `test_df` is given, the chosen threshold's effect on the test split.
+    """
+    if model_path is None:
+        model_path = os.path.join(BASE_DIR, 'models', 'autogluon_model')
+    options = parameters["cascade_options"]
+    decode_options = parameters["decode_options"]
+
+    predictor = load_predictor(model_path)
+    fast = load_fast_predictor(predictor, options["fast_model_path"], options["fast_image_size"])
+
+    sample_images = load_sample_images(image_size=decode_options["target_size"])
+    fast_cost = measure_latency(fast, sample_images)['mean']
+    full_cost = measure_latency(predictor, sample_images)['mean']
+    print(f"   Mean latency: fast stage {fast_cost * 1000:.1f} ms, full model {full_cost * 1000:.1f} ms")
+
+    fast_confidence, fast_correct, full_correct = cascade_predictions(predictor, fast, val_df, decode_options)
+    thresholds = np.round(np.arange(0.0, 1.0001, 0.01), 2)
+    sweep = sweep_thresholds(fast_confidence, fast_correct, full_correct, fast_cost, full_cost, thresholds)
+    full_accuracy = float(full_correct.mean())
+    chosen = choose_threshold(sweep, full_accuracy, options["max_accuracy_drop"])
+
+    calibration = {
+        'threshold': None if chosen is None else float(chosen['threshold']),
+        'fast_model_path': options["fast_model_path"],
+        'fast_image_size': options["fast_image_size"],
+        'model_version': os.path.basename(os.path.realpath(model_path)),
+        'fast_cost': fast_cost,
+        'full_cost': full_cost,
+        'validation': {'full_accuracy': full_accuracy,
+                       'cascade': None if chosen is None else chosen.drop('threshold').to_dict()}
+    }
+    if chosen is None:
+        print(f"[WARNING] No threshold saves compute within {options['max_accuracy_drop']:.1%} accuracy; "
+              f"cascade disabled")
+    else:
+        print(f"   Threshold {chosen['threshold']:.2f}: escalates {chosen['escalation_rate']:.1%}, "
+              f"accuracy {chosen['accuracy']:.4f} vs {full_accuracy:.4f}, saves {chosen['savings']:.1%} compute")
+
+    if test_df is not None and chosen is not None:
+        test_confidence, test_fast_correct, test_full_correct = cascade_predictions(
+            predictor, fast, test_df, decode_options)
+        test = sweep_thresholds(test_confidence, test_fast_correct, test_full_correct,
+                                fast_cost, full_cost, [chosen['threshold']]).iloc[0]
+        calibration['test'] = {'full_accuracy': float(test_full_correct.mean()),
+                               'cascade': test.drop('threshold').to_dict()}
+
+    calibration_path = options["calibration_path"]
+    os.makedirs(os.path.dirname(calibration_path), exist_ok=True)
+    with open(calibration_path, 'w') as f:
+        json.dump(calibration, f, indent=2)
+    print(f"Cascade calibration saved to: {calibration_path}")
+
+    os.makedirs(os.path.dirname(save_path), exist_ok=True)
+    with open(save_path, 'w') as f:
+        f.write("CASCADE CALIBRATION REPORT\n")
+        f.write("=" * 30 + "\n")
+        fast_name = options["fast_model_path"] or f"full model at {options['fast_image_size']}px"
+        f.write(f"Fast stage: {fast_name} ({fast_cost * 1000:.1f} ms/image)\n")
+        f.write(f"Full model: {model_path} ({full_cost * 1000:.1f} ms/image)\n")
+        f.write(f"Max accuracy drop: {options['max_accuracy_drop']:.2%}\n\n")
+        for split in ('validation', 'test'):
+            if split in calibration and calibration[split]['cascade'] is not None:
+                result = calibration[split]
+                f.write(f"{split.title()}: full accuracy {result['full_accuracy']:.4f}, cascade accuracy "
+                        f"{result['cascade']['accuracy']:.4f}, escalated {result['cascade']['escalation_rate']:.1%}, "
+                        f"compute saved {result['cascade']['savings']:.1%}\n")
+        f.write(f"Chosen threshold: {calibration['threshold']}\n\n")
+        f.write(f"{'Threshold':>9} {'Escalated':>10} {'Accuracy':>9} {'Cost ms':>8} {'Savings':>8}\n")
+        for _, row in sweep.iloc[::5].iterrows():
+            f.write(f"{row['threshold']:>9.2f} {row['escalation_rate']:>10.1%} {row['accuracy']:>9.4f} "
+                    f"{row['mean_cost'] * 1000:>8.1f} {row['savings']:>8.1%}\n")
+
+    return calibration
+
+
+if __name__ == "__main__":
+    splits_dir = os.path.join(BASE_DIR, 'data', 'splits')
+    calibrate_cascade(pd.read_csv(os.path.join(splits_dir, 'val_data.csv')), parameters,
+                      test_df=pd.read_csv(os.path.join(splits_dir, 'test_data.csv')))
@@ -0,0 +1,149 @@
+import os
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+from PIL import Image
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+GRAYSCALE_MODES = {'1', 'L', 'LA', 'I', 'I;16', 'F'}
+
+
+def read_header(image_path):
+    """(width, height, mode, format) from the file header; PIL does not decode pixels until asked."""
+    with Image.open(image_path) as image:
+        return image.size[0], image.size[1], image.mode, image.format
+
+
+def outlier_flags(width, height, mode, min_side=64, max_aspect=3.0):
+    """Reasons an image is unusual for training: tiny, grayscale or an extreme aspect ratio."""
+    flags = []
+    if min(width, height) < min_side:
+        flags.append('tiny')
+    if mode in GRAYSCALE_MODES:
+        flags.append('grayscale')
+    if max(width, height) / max(min(width, height), 1) > max_aspect:
+        flags.append('extreme_aspect')
+    return flags
+
+
+class ClassStats:
+    """Running per-class statistics, updated one image at a time."""
+
+    def __init__(self):
+        self.count = 0
+        self.megapixels = RunningMoments()
+        self.file_kb = RunningMoments()
+        self.min_side = np.inf
+        self.flags = defaultdict(int)
+        self.formats = defaultdict(int)
+
+    def add(self, width, height, image_format, file_size, flags):
+        self.count += 1
+        self.megapixels.add(width * height / 1e6)
+        self.file_kb.add(file_size / 1024)
+        self.min_side = min(self.min_side, width, height)
+        self.formats[image_format or 'unknown'] += 1
+        for flag in flags:
+            self.flags[flag] += 1
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'mean_megapixels': self.megapixels.mean,
+            'std_megapixels': self.megapixels.std,
+            'mean_file_kb': self.file_kb.mean,
+            'min_side': self.min_side,
+            'tiny': self.flags['tiny'],
+            'grayscale': self.flags['grayscale'],
+            'extreme_aspect': self.flags['extreme_aspect'],
+            'formats': ', '.join(f"{name}:{count}" for name, count in sorted(self.formats.items()))
+        }
+
+
+class RunningMoments:
+    """Mean and standard deviation without keeping the values (Welford)."""
+
+    def __init__(self):
+        self.n = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+
+    def add(self, value):
+        self.n += 1
+        delta = value - self.mean
+        self.mean += delta / self.n
+        self._m2 += delta * (value - self.mean)
+
+    @property
+    def std(self):
+        return (self._m2 / (self.n - 1)) ** 0.5 if self.n > 1 else 0.0
+
+
+def iter_images(raw_data_path):
+    """(image path, class) for every image file, one directory at a time."""
+    for dirpath, _, filenames in os.walk(raw_data_path):
+        category = os.path.basename(dirpath)
+        for filename in sorted(filenames):
+            if filename.lower().endswith(IMAGE_EXTENSIONS):
+                yield os.path.join(dirpath, filename), category
+
+
+def scan_dataset(raw_data_path, options):
+    """
+    Single streaming pass over the raw images reading headers only.
+
+    Returns (images, class_stats): one row per readable image with its size,
+    mode and outlier flags, and one row of running statistics per class.
+    Unreadable files and images with a side of `min_valid_side` pixels or
+    less are skipped, as before.
+    """
+    records = []
+    stats = defaultdict(ClassStats)
+    skipped = 0
+    for image_path, category in iter_images(raw_data_path):
+        try:
+            width, height, mode, image_format = read_header(image_path)
+        except Exception as e:
+            print(f"Skipping invalid image {image_path}: {e}")
+            skipped += 1
+            continue
+        if min(width, height) <= options["min_valid_side"]:
+            print(f"Image too small: {image_path} - {(width, height)}")
+            skipped += 1
+            continue
+        flags = outlier_flags(width, height, mode, options["min_side"], options["max_aspect"])
+        stats[category].add(width, height, image_format, os.path.getsize(image_path), flags)
+        records.append((image_path, category, width, height, mode, ';'.join(flags)))
+
+    images = pd.DataFrame(records, columns=['image', 'label', 'width', 'height', 'mode', 'flags'])
+    class_stats = pd.DataFrame({category: class_stat.summary() for category, class_stat in stats.items()}).T
+    class_stats.index.name = 'label'
+    print(f"   Scanned {len(images) + skipped} files: {len(images)} valid, {skipped} skipped, "
+          f"{(images['flags'] != '').sum()} flagged as outliers")
+    return images, class_stats.sort_index()
+
+
+def cap_per_class(train_df, per_class_cap=None, balance=False, random_state=42):
+    """Training manifest with at most `per_class_cap` images per class.
+
+    With `balance` every class is cut to the size of the smallest one (or
+    the cap, if lower). Images are sampled at random, so the manifest stays
+    representative of each class. Returns `train_df` unchanged if neither is set.
+    """
+    cap = per_class_cap
+    if balance:
+        smallest = int(train_df['label'].value_counts().min())
+        cap = smallest if cap is None else min(cap, smallest)
+    if cap is None:
+        return train_df
+    # Position of each image within its class after a shuffle; keep the first `cap`
+    rank = train_df.sample(frac=1, random_state=random_state).groupby('label').cumcount()
+    return train_df[rank.reindex(train_df.index) < cap]
+
+
+def write_quality_report(images, class_stats, save_dir='outputs'):
+    """Per-class statistics and the list of flagged images, as CSV files."""
+    os.makedirs(save_dir, exist_ok=True)
+    class_stats.to_csv(os.path.join(save_dir, 'data_quality.csv'))
+    images[images['flags'] != ''].to_csv(os.path.join(save_dir, 'data_quality_outliers.csv'), index=False)
@@ -0,0 +1,176 @@
+import copy
+import os
+import random
+import time
+
+import numpy as np
+import torch
+import torch.nn.functional as F
+from PIL import ImageOps
+
+from scripts.array_cache import ArrayCache, cached_rows
+from scripts.benchmark_serving import load_sample_images, measure_latency
+from scripts.validate_model import evaluate_model
+from serving.image_io import decode_image
+from serving.inference import load_predictor, predict_files
+from serving.timm_predictor import TimmPredictor
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class DistillationDataset(torch.utils.data.Dataset):
+    """Training images with their cached teacher probabilities and hard labels."""
+
+    def __init__(self, student, image_paths, soft_labels, hard_labels, target_size, augment=False):
+        self.student = student
+        self.image_paths = list(image_paths)
+        self.soft_labels = soft_labels.astype(np.float32)
+        self.hard_labels = hard_labels
+        self.target_size = target_size
+        self.augment = augment
+
+    def __len__(self):
+        return len(self.image_paths)
+
+    def __getitem__(self, index):
+        image = decode_image(self.image_paths[index], self.target_size)
+        if self.augment and random.random() < 0.5:
+            image = ImageOps.mirror(image)
+        return (torch.from_numpy(self.student.preprocess(image)),
+                torch.from_numpy(self.soft_labels[index]),
+                int(self.hard_labels[index]))
+
+
+def teacher_soft_labels(teacher, teacher_path, image_paths, decode_options):
+    """Teacher class probabilities per image, computed once and cached by content hash.
+
+    The cache namespace includes the teacher version, so retraining the
+    teacher invalidates it while re-running distillation does not.
+    """
+    teacher_dir = os.path.realpath(teacher_path)
+    checkpoint = os.path.join(teacher_dir, 'model.ckpt')
+    teacher_id = f"{os.path.basename(teacher_dir)}_{int(os.path.getmtime(checkpoint)) if os.path.exists(checkpoint) else 0}"
+    cache = ArrayCache(os.path.join(BASE_DIR, 'data', 'cache', 'soft_labels'), teacher_id)
+
+    def compute(paths):
+        return predict_files(teacher, paths, decode_options['batch_size'],
+                             decode_options['target_size'], decode_options['max_pixels']).to_numpy()
+
+    return cached_rows(cache, image_paths, compute)
+
+
+def distillation_loss(logits, soft_labels, hard_labels, temperature, alpha):
+    """Hinton-style KD loss on top of cross-entropy with the true labels.
+
+    The teacher only exposes probabilities, so they are sharpened/softened
+    as p ** (1 / T) and renormalised, which equals softmax(logits / T).
+    """
+    teacher = soft_labels.clamp_min(1e-12) ** (1.0 / temperature)
+    teacher = teacher / teacher.sum(dim=1, keepdim=True)
+    kd = F.kl_div(F.log_softmax(logits / temperature, dim=1), teacher, reduction='batchmean')
+    ce = F.cross_entropy(logits, hard_labels)
+    return alpha * kd * temperature ** 2 + (1 - alpha) * ce
+
+
+def train_student(checkpoint_name, teacher, train_df, val_df, soft_labels, parameters):
+    distill_options = parameters["distill_options"]
+    decode_options = parameters["decode_options"]
+    class_labels = list(teacher.class_labels)
+    label_index = {label: i for i, label in enumerate(class_labels)}
+
+    student = TimmPredictor.create(checkpoint_name, class_labels, pretrained=True,
+                                   image_size=decode_options['target_size'])
+    train_loader = torch.utils.data.DataLoader(
+        DistillationDataset(student, train_df['image'], soft_labels,
+                            train_df['label'].map(label_index).to_numpy(),
+                            decode_options['target_size'], augment=True),
+        batch_size=distill_options['batch_size'], shuffle=True,
+        num_workers=distill_options['num_workers']
+    )
+
+    model = student.model
+    optimizer = torch.optim.AdamW(model.parameters(), lr=distill_options['learning_rate'], weight_decay=1e-4)
+    scheduler = torch.optim.lr_scheduler.CosineAnnealingLR(optimizer, T_max=distill_options['max_epochs'] * len(train_loader))
+    best_accuracy, best_state = -1.0, None
+
+    for epoch in range(distill_options['max_epochs']):
+        model.train()
+        start_time = time.time()
+        total_loss = 0.0
+        for images, batch_soft, batch_hard in train_loader:
+            loss = distillation_loss(model(images), batch_soft, batch_hard,
+                                     distill_options['temperature'], distill_options['alpha'])
+            optimizer.zero_grad()
+            loss.backward()
+            optimizer.step()
+            scheduler.step()
+            total_loss += loss.item() * len(images)
+
+        model.eval()
+        val_probabilities = predict_files(student, val_df['image'], decode_options['batch_size'],
+                                          decode_options['target_size'], decode_options['max_pixels'])
+        val_predictions = val_probabilities.columns[np.argmax(val_probabilities.to_numpy(), axis=1)].to_numpy()
+        val_accuracy = float(np.mean(val_predictions == val_df['label'].to_numpy()))
+        print(f"   Epoch {epoch + 1}/{distill_options['max_epochs']}: "
+              f"loss {total_loss / len(train_loader.dataset):.4f}, val accuracy {val_accuracy:.4f} "
+              f"({time.time() - start_time:.0f}s)")
+        if val_accuracy > best_accuracy:
+            best_accuracy, best_state = val_accuracy, copy.deepcopy(model.state_dict())
+
+    model.load_state_dict(best_state)
+    model.eval()
+    return student
+
+
+def distill_model(train_df, val_df, parameters, teacher_path=None):
+    """
+    Distils the trained teacher predictor into each configured student backbone.
+    Returns a dict mapping student checkpoint name to its saved model path.
+    """
+    if teacher_path is None:
+        teacher_path = os.path.join(BASE_DIR, 'models', 'autogluon_model')
+    distill_options = parameters["distill_options"]
+
+    teacher = load_predictor(teacher_path)
+    print(f"Computing teacher soft labels for {len(train_df)} training images...")
+    soft_labels = teacher_soft_labels(teacher, teacher_path, train_df['image'], parameters["decode_options"])
+
+    student_paths = {}
+    for checkpoint_name in distill_options['student_checkpoints']:
+        print(f"Distilling into student: {checkpoint_name}")
+        student = train_student(checkpoint_name, teacher, train_df, val_df, soft_labels, parameters)
+        student_path = os.path.join(BASE_DIR, 'models', 'students', checkpoint_name)
+        student.save(student_path)
+        print(f"Student saved to: {student_path}")
+        student_paths[checkpoint_name] = student_path
+
+    return student_paths
+
+
+def compare_models(test_df, model_paths, parameters, save_path='outputs/distillation_report.txt'):
+    """Evaluate each model and write an accuracy/latency table for choosing what to deploy."""
+    sample_images = load_sample_images(image_size=parameters["decode_options"]["target_size"])
+    rows = []
+    for name, model_path in model_paths.items():
+        print(f"Evaluating {name}...")
+        metrics = evaluate_model(test_df, model_path=model_path, decode_options=parameters["decode_options"])
+        latency = measure_latency(load_predictor(model_path), sample_images)
+        rows.append({
+            'model': name,
+            'accuracy': metrics['accuracy'],
+            'f1_score': metrics['f1_score'],
+            'batch_time': metrics['avg_inference_time'],
+            'p50_latency': latency['p50'],
+            'p95_latency': latency['p95']
+        })
+
+    os.makedirs(os.path.dirname(save_path), exist_ok=True)
+    with open(save_path, 'w') as f:
+        f.write("DISTILLATION REPORT\n")
+        f.write("=" * 25 + "\n\n")
+        f.write(f"{'Model':<28} {'Accuracy':>9} {'F1':>7} {'Batch s/img':>12} {'p50 s':>8} {'p95 s':>8}\n")
+        for row in rows:
+            f.write(f"{row['model']:<28} {row['accuracy']:>9.4f} {row['f1_score']:>7.4f} "
+                    f"{row['batch_time']:>12.4f} {row['p50_latency']:>8.4f} {row['p95_latency']:>8.4f}\n")
+
+    return rows
@@ -0,0 +1,123 @@
+import os
+import shutil
+
+import numpy as np
+import torch
+import yaml
+
+from serving.calibration import CALIBRATION_FILE
+from serving.image_io import decode_image
+from serving.inference import load_predictor, predict_images
+from serving.timm_predictor import (
+    IMAGENET_MEAN, IMAGENET_STD, MODEL_FILE, TimmPredictor, is_timm_model, weights_file
+)
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def split_autogluon_state_dict(state_dict):
+    """Split an AutoGluon timm_image checkpoint into (backbone, head) state dicts.
+
+    AutoGluon wraps the timm model as `model` with its classifier moved to a
+    separate `head`; the Lightning module may add one more `model.` prefix.
+    """
+    if all(key.startswith('model.') for key in state_dict):
+        state_dict = {key[len('model.'):]: value for key, value in state_dict.items()}
+    backbone = {key[len('model.'):]: value for key, value in state_dict.items() if key.startswith('model.')}
+    head = {key[len('head.'):]: value for key, value in state_dict.items() if key.startswith('head.')}
+    if not backbone or not head:
+        raise ValueError("Checkpoint does not look like an AutoGluon timm_image model")
+    return backbone, head
+
+
+def convert_autogluon_model(model_path, teacher=None):
+    """Build a TimmPredictor with the weights of an AutoGluon timm_image predictor.
+
+    `teacher` is the loaded AutoGluon predictor if the caller already has it
+    (needed for the class labels); otherwise it is loaded from `model_path`.
+    """
+    import timm
+    with open(os.path.join(model_path, 'config.yaml')) as f:
+        timm_config = yaml.safe_load(f)['model']['timm_image']
+    checkpoint_name = timm_config['checkpoint_name']
+    image_size = timm_config.get('image_size') or 224
+    checkpoint = torch.load(os.path.join(model_path, 'model.ckpt'), map_location='cpu', weights_only=False)
+    backbone, head = split_autogluon_state_dict(checkpoint.get('state_dict', checkpoint))
+
+    if teacher is None:
+        teacher = load_predictor(model_path, calibrate=False)  # needs AutoGluon, i.e. the training environment
+    class_labels = list(teacher.class_labels)
+    model = timm.create_model(checkpoint_name, pretrained=False, num_classes=len(class_labels))
+    classifier = model.get_classifier()
+    classifier_prefix = next(name for name, module in model.named_modules() if module is classifier) + '.'
+    # The backbone was saved without its classifier, so only classifier keys may be missing
+    missing, unexpected = model.load_state_dict(backbone, strict=False)
+    if unexpected or any(not key.startswith(classifier_prefix) for key in missing):
+        raise ValueError(f"Backbone weights do not match {checkpoint_name}: "
+                         f"missing {missing[:5]}, unexpected {unexpected[:5]}")
+    classifier.load_state_dict(head)
+
+    if timm_config.get('image_norm', 'imagenet') == 'imagenet':
+        mean, std = IMAGENET_MEAN, IMAGENET_STD
+    else:
+        mean, std = model.pretrained_cfg['mean'], model.pretrained_cfg['std']
+    return TimmPredictor(model, class_labels, checkpoint_name, image_size, mean, std)
+
+
+def check_parity(teacher, exported, sample_paths, tolerance=1e-2):
+    """Compare the probabilities of the AutoGluon and exported predictors on `sample_paths`."""
+    images = [decode_image(image_path, exported.image_size) for image_path in sample_paths]
+    expected = predict_images(teacher, images)[exported.class_labels].to_numpy()
+    actual = exported.predict_proba_images(images).to_numpy()
+    max_diff = float(np.abs(expected - actual).max())
+    agreement = float(np.mean(expected.argmax(axis=1) == actual.argmax(axis=1)))
+    print(f"   Parity on {len(images)} images: max prob diff {max_diff:.2e}, top-1 agreement {agreement:.1%}")
+    if max_diff > tolerance:
+        print(f"[WARNING] Exported model differs from the AutoGluon model by more than {tolerance}")
+    return max_diff
+
+
+def copy_calibration(model_path, export_path):
+    """Carry the model's probability calibration over to the exported copy."""
+    calibration_path = os.path.join(model_path, CALIBRATION_FILE)
+    if os.path.exists(calibration_path):
+        shutil.copy2(calibration_path, export_path)
+
+
+def export_model(model_path=None, export_path=None, sample_paths=None, tolerance=1e-2):
+    """
+    Exports an AutoGluon timm_image predictor to the plain TimmPredictor format
+    (timm_model.json + packed weights), which serving can load with only torch
+    and timm installed. If `sample_paths` are given, both formats must give
+    the same probabilities on them (within `tolerance`) before anything is
+    written; otherwise a ValueError is raised and no export is left behind.
+    """
+    if model_path is None:
+        model_path = os.path.join(BASE_DIR, 'models', 'autogluon_model')
+    if export_path is None:
+        export_path = os.path.join(BASE_DIR, 'models', 'serving_model')
+    model_path = os.path.realpath(model_path)
+
+    if os.path.exists(export_path):
+        shutil.rmtree(export_path)
+    if is_timm_model(model_path):
+        # Already in the serving format (packed at training time, fast retrain, distilled students)
+        os.makedirs(export_path)
+        for file_name in (MODEL_FILE, weights_file(model_path)):
+            shutil.copy2(os.path.join(model_path, file_name), export_path)
+        copy_calibration(model_path, export_path)
+        print(f"Model is already in the serving format, copied to: {export_path}")
+        return export_path
+
+    teacher = load_predictor(model_path, calibrate=False)
+    exported = convert_autogluon_model(model_path, teacher)
+    if sample_paths is not None and len(sample_paths):
+        max_diff = check_parity(teacher, exported, sample_paths, tolerance)
+        if max_diff > tolerance:
+            raise ValueError(f"Export parity check failed (max prob diff {max_diff:.2e} > {tolerance}); "
+                             f"nothing written to {export_path}")
+    exported.save(export_path)
+    copy_calibration(model_path, export_path)
+    print(f"Exported {exported.checkpoint_name} ({len(exported.class_labels)} classes) to: {export_path}")
+
+    return export_path
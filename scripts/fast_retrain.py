@@ -0,0 +1,132 @@
+import os
+import time
+
+import numpy as np
+import torch
+
+from scripts.array_cache import ArrayCache, cached_rows
+from scripts.calibrate_model import calibrate_model
+from serving.image_io import decode_image
+from serving.inference import load_predictor, predict_files
+from serving.registry import new_version_dir, publish_version, prune_versions, resolve_current
+from serving.timm_predictor import TimmPredictor
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def extract_features(backbone_name, image_paths, decode_options):
+    """Pooled frozen-backbone features per image, cached by content hash, backbone and input size.
+
+    Only images that are new since the last run are passed through the
+    backbone, so adding a breed or a few images costs seconds. Features
+    depend on the input size, so changing `target_size` starts a new cache.
+    """
+    import timm
+    extractor = TimmPredictor(timm.create_model(backbone_name, pretrained=True, num_classes=0),
+                              class_labels=[], checkpoint_name=backbone_name,
+                              image_size=decode_options['target_size'])
+    cache = ArrayCache(os.path.join(BASE_DIR, 'data', 'cache', 'features'),
+                       f"{backbone_name}_{decode_options['target_size']}")
+
+    def compute(paths):
+        images = [decode_image(image_path, decode_options['target_size'], decode_options['max_pixels'])
+                  for image_path in paths]
+        return extractor.predict_logits(images)
+
+    return cached_rows(cache, image_paths, compute, batch_size=decode_options['batch_size'])
+
+
+def train_head(train_features, train_labels, val_features, val_labels, num_classes, options):
+    """Fit a linear classification head on cached features with full-batch AdamW."""
+    torch.manual_seed(0)
+    x_train = torch.from_numpy(train_features)
+    y_train = torch.from_numpy(train_labels)
+    x_val = torch.from_numpy(val_features)
+    head = torch.nn.Linear(x_train.shape[1], num_classes)
+    optimizer = torch.optim.AdamW(head.parameters(), lr=options['learning_rate'], weight_decay=options['weight_decay'])
+
+    best_accuracy, best_state = -1.0, None
+    for epoch in range(options['max_epochs']):
+        head.train()
+        loss = torch.nn.functional.cross_entropy(head(x_train), y_train)
+        optimizer.zero_grad()
+        loss.backward()
+        optimizer.step()
+
+        head.eval()
+        with torch.no_grad():
+            val_accuracy = float((head(x_val).argmax(dim=1).numpy() == val_labels).mean())
+        if val_accuracy > best_accuracy:
+            best_accuracy = val_accuracy
+            best_state = {k: v.clone() for k, v in head.state_dict().items()}
+
+    head.load_state_dict(best_state)
+    return head, best_accuracy
+
+
+def current_val_accuracy(val_df, decode_options):
+    """Validation accuracy of the version being served, or None if there is none that loads."""
+    current = resolve_current()
+    if current is None:
+        return None
+    try:
+        predictor = load_predictor(current)
+    except Exception as e:
+        print(f"[WARNING] Could not load the current model version to compare against: {e}")
+        return None
+    probabilities = predict_files(predictor, val_df['image'], decode_options['batch_size'],
+                                  decode_options['target_size'], decode_options['max_pixels'])
+    predicted = probabilities.columns[np.argmax(probabilities.to_numpy(), axis=1)]
+    return float(np.mean(np.asarray(predicted) == val_df['label'].to_numpy()))
+
+
+def fast_retrain(train_df, val_df, parameters):
+    """
+    Retrains only the classification head on cached frozen-backbone features
+    and publishes the result as a new model version. A head that scores below
+    the current version on the validation split is not published unless
+    `fast_retrain_options.force_publish` is set; None is returned then.
+    """
+    import timm
+    options = parameters["fast_retrain_options"]
+    decode_options = parameters["decode_options"]
+    backbone_name = options['backbone']
+    class_labels = sorted(train_df['label'].unique())
+    label_index = {label: i for i, label in enumerate(class_labels)}
+
+    start_time = time.time()
+    print(f"Extracting {backbone_name} features (cached)...")
+    train_features = extract_features(backbone_name, train_df['image'], decode_options)
+    val_features = extract_features(backbone_name, val_df['image'], decode_options)
+    print(f"   Features ready in {time.time() - start_time:.1f}s")
+
+    head, val_accuracy = train_head(
+        train_features, train_df['label'].map(label_index).to_numpy(),
+        val_features, val_df['label'].map(label_index).to_numpy(),
+        len(class_labels), options
+    )
+    print(f"   Head trained: val accuracy {val_accuracy:.4f} (total {time.time() - start_time:.1f}s)")
+
+    # A linear probe on an ImageNet backbone can easily be worse than the fine-tuned model it would replace
+    current_accuracy = current_val_accuracy(val_df, decode_options)
+    if current_accuracy is not None:
+        print(f"   Current version: val accuracy {current_accuracy:.4f}")
+        if val_accuracy < current_accuracy and not options['force_publish']:
+            print(f"[WARNING] Fast retrain is worse than the current version ({val_accuracy:.4f} < "
+                  f"{current_accuracy:.4f}); not publishing it (set fast_retrain_options.force_publish to override)")
+            return None
+
+    # Pretrained backbone + the new head, saved in the TimmPredictor format
+    model = timm.create_model(backbone_name, pretrained=True, num_classes=len(class_labels))
+    model.get_classifier().load_state_dict(head.state_dict())
+    predictor = TimmPredictor(model, [int(label) for label in class_labels], backbone_name,
+                              image_size=decode_options['target_size'])
+
+    model_output_path = new_version_dir()
+    predictor.save(model_output_path)
+    if parameters["calibration_options"]["enabled"]:
+        calibrate_model(val_df, parameters, model_output_path)
+    publish_version(model_output_path)
+    prune_versions(keep=parameters["registry_options"]["keep_versions"])
+    print(f"Fast retrain completed. Model saved to: {model_output_path}")
+    return predictor
@@ -0,0 +1,225 @@
+import hashlib
+import itertools
+import json
+import multiprocessing
+import os
+import random
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from serving.registry import new_version_dir, publish_version, prune_versions
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HPO_DIR = os.path.join(BASE_DIR, 'models', 'hpo')
+TRIALS_LOG = os.path.join(BASE_DIR, 'outputs', 'hpo', 'trials.jsonl')
+
+
+def sample_configs(search_space, num_trials, seed):
+    """Draw `num_trials` distinct configurations from a discrete search space.
+
+    Sampling is deterministic for a given seed and search space, so a rerun
+    proposes the same configurations and can reuse their cached results.
+    """
+    names = sorted(search_space)
+    grid = [dict(zip(names, values)) for values in itertools.product(*(search_space[n] for n in names))]
+    random.Random(seed).shuffle(grid)
+    return grid[:num_trials]
+
+
+def data_fingerprint(train_df, val_df):
+    digest = hashlib.sha1()
+    for df in (train_df, val_df):
+        digest.update(pd.util.hash_pandas_object(df[['image', 'label']], index=False).values.tobytes())
+    return digest.hexdigest()[:12]
+
+
+def trial_key(hyperparameters, epochs, fingerprint):
+    payload = json.dumps({'hyperparameters': hyperparameters, 'epochs': epochs, 'data': fingerprint}, sort_keys=True)
+    return hashlib.sha1(payload.encode()).hexdigest()[:12]
+
+
+def load_trial_results(log_path=TRIALS_LOG):
+    """Finished trials from previous runs, keyed by trial key. Failed trials are not reused, so they run again."""
+    results = {}
+    if os.path.exists(log_path):
+        with open(log_path) as f:
+            for line in f:
+                record = json.loads(line)
+                if not record.get('failed') and os.path.isdir(record['model_path']):
+                    results[record['key']] = record
+    return results
+
+
+def _run_trial(key, hyperparameters, epochs, resume_from, train_df, val_df, options):
+    """Train (or continue training) one configuration up to `epochs` in its own process."""
+    from autogluon.multimodal import MultiModalPredictor
+    from scripts.benchmark_serving import load_sample_images, measure_latency
+
+    trial_path = os.path.join(HPO_DIR, key)
+    fit_hyperparameters = dict(hyperparameters, **{
+        'env.num_workers': options['threads_per_trial'],
+        'optimization.max_epochs': epochs - (resume_from['epochs'] if resume_from else 0)
+    })
+
+    if os.path.exists(os.path.join(trial_path, 'last.ckpt')):
+        # This trial was interrupted (e.g. preempted): pick up from its last checkpoint
+        predictor = MultiModalPredictor.load(trial_path, resume=True)
+        predictor.fit(train_df, tuning_data=val_df, hyperparameters=fit_hyperparameters,
+                      time_limit=options['time_limit_per_trial'])
+    elif resume_from:
+        if os.path.exists(trial_path):
+            shutil.rmtree(trial_path)
+        # Continue from the lower rung's weights instead of starting over
+        predictor = MultiModalPredictor.load(resume_from['model_path'])
+        predictor.fit(train_df, tuning_data=val_df, hyperparameters=fit_hyperparameters,
+                      time_limit=options['time_limit_per_trial'], save_path=trial_path)
+    else:
+        if os.path.exists(trial_path):
+            shutil.rmtree(trial_path)
+        predictor = MultiModalPredictor(label='label', path=trial_path, eval_metric='accuracy',
+                                        problem_type='multiclass', verbosity=0)
+        predictor.fit(train_df, tuning_data=val_df, hyperparameters=fit_hyperparameters,
+                      time_limit=options['time_limit_per_trial'])
+
+    accuracy = predictor.evaluate(val_df, metrics=['accuracy'])['accuracy']
+    latency = measure_latency(predictor, load_sample_images(count=8), runs=20)
+    return {
+        'key': key,
+        'hyperparameters': hyperparameters,
+        'epochs': epochs,
+        'val_accuracy': float(accuracy),
+        'p50_latency': latency['p50'],
+        'model_path': trial_path
+    }
+
+
+def _init_worker(threads):
+    from serving.runtime import configure_threads
+    configure_threads(threads, 1)
+
+
+def run_rung(configs, epochs, previous, cached, train_df, val_df, fingerprint, options):
+    """Run every configuration up to `epochs`, reusing cached trials; returns results in config order.
+
+    A trial that raises (out of memory, a bad configuration, ...) is logged as
+    failed and its result is None; the other trials of the rung carry on.
+    """
+    results = [None] * len(configs)
+    pending = {}
+    ctx = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=options['workers'], mp_context=ctx,
+                             initializer=_init_worker, initargs=(options['threads_per_trial'],)) as executor:
+        for i, hyperparameters in enumerate(configs):
+            key = trial_key(hyperparameters, epochs, fingerprint)
+            if key in cached:
+                results[i] = cached[key]
+                print(f"   [cached] {hyperparameters} @ {epochs} epochs: {cached[key]['val_accuracy']:.4f}")
+                continue
+            pending[executor.submit(_run_trial, key, hyperparameters, epochs, previous.get(i),
+                                    train_df, val_df, options)] = i
+
+        os.makedirs(os.path.dirname(TRIALS_LOG), exist_ok=True)
+        for future, i in pending.items():
+            key = trial_key(configs[i], epochs, fingerprint)
+            try:
+                result = future.result()
+            except Exception as e:
+                record = {'key': key, 'hyperparameters': configs[i], 'epochs': epochs, 'failed': True,
+                          'error': f"{type(e).__name__}: {e}", 'model_path': os.path.join(HPO_DIR, key)}
+                with open(TRIALS_LOG, 'a') as f:
+                    f.write(json.dumps(record) + "\n")
+                print(f"   [failed] {configs[i]} @ {epochs} epochs: {record['error']}")
+                continue
+            results[i] = result
+            cached[result['key']] = result
+            # Persist immediately so an interrupted search keeps finished trials
+            with open(TRIALS_LOG, 'a') as f:
+                f.write(json.dumps(result) + "\n")
+            print(f"   {result['hyperparameters']} @ {epochs} epochs: {result['val_accuracy']:.4f} "
+                  f"(p50 {result['p50_latency']:.3f}s)")
+    return results
+
+
+def pareto_front(leaderboard):
+    """Mark rows not dominated on (higher accuracy, lower latency)."""
+    flags = []
+    for _, row in leaderboard.iterrows():
+        dominated = (
+            (leaderboard['val_accuracy'] >= row['val_accuracy']) &
+            (leaderboard['p50_latency'] <= row['p50_latency']) &
+            ((leaderboard['val_accuracy'] > row['val_accuracy']) | (leaderboard['p50_latency'] < row['p50_latency']))
+        ).any()
+        flags.append(not dominated)
+    return flags
+
+
+def run_hpo(train_df, val_df, parameters, save_path='outputs/hpo_leaderboard.csv'):
+    """
+    Successive-halving search over `hpo_options.search_space` with trials run in
+    parallel worker processes. Weak configurations are stopped at each rung;
+    the best Pareto-optimal survivor is published as the new model version.
+    """
+    options = parameters["hpo_options"]
+    base_hyperparameters = parameters["model_options"]["hyperparameters"]
+    configs = [dict(base_hyperparameters, **sampled)
+               for sampled in sample_configs(options['search_space'], options['num_trials'], options['seed'])]
+    fingerprint = data_fingerprint(train_df, val_df)
+    cached = load_trial_results()
+
+    previous = {}
+    epochs = options['min_epochs']
+    survivors = list(range(len(configs)))
+    while True:
+        print(f"HPO rung: {len(survivors)} trial(s) at {epochs} epoch(s) on {options['workers']} worker(s)")
+        rung_results = run_rung([configs[i] for i in survivors], epochs,
+                                {j: previous[i] for j, i in enumerate(survivors) if i in previous},
+                                cached, train_df, val_df, fingerprint, options)
+        # Failed trials keep their last successful rung (if any) but are not promoted
+        for i, result in zip(survivors, rung_results):
+            if result is not None:
+                previous[i] = result
+        survivors = [i for i, result in zip(survivors, rung_results) if result is not None]
+
+        next_epochs = epochs * options['eta']
+        if len(survivors) <= 1 or next_epochs > options['max_epochs']:
+            break
+        ranked = sorted(survivors, key=lambda i: -previous[i]['val_accuracy'])
+        survivors = ranked[:max(1, len(survivors) // options['eta'])]
+        epochs = next_epochs
+
+    if not previous:
+        raise RuntimeError(f"Every HPO trial failed; see {TRIALS_LOG}")
+    # One row per configuration, at the deepest rung it reached
+    leaderboard = pd.DataFrame([
+        dict(result['hyperparameters'], key=result['key'], epochs=result['epochs'],
+             val_accuracy=result['val_accuracy'], p50_latency=result['p50_latency'],
+             model_path=result['model_path'])
+        for result in previous.values()
+    ])
+    leaderboard['pareto'] = pareto_front(leaderboard)
+    leaderboard = leaderboard.sort_values(['epochs', 'val_accuracy'], ascending=False)
+    os.makedirs(os.path.dirname(save_path), exist_ok=True)
+    leaderboard.to_csv(save_path, index=False)
+    print(f"HPO leaderboard saved to: {save_path}")
+
+    # Prefer the longest-trained Pareto trial that meets the latency budget
+    candidates = leaderboard[leaderboard['pareto']]
+    if options['max_latency'] is not None:
+        within_budget = candidates[candidates['p50_latency'] <= options['max_latency']]
+        candidates = within_budget if not within_budget.empty else candidates
+    best = candidates.iloc[0]
+    print(f"Best trial {best['key']}: val accuracy {best['val_accuracy']:.4f} after {best['epochs']} epoch(s), "
+          f"p50 {best['p50_latency']:.3f}s")
+
+    # train_model imports this module, hence the local imports
+    from autogluon.multimodal import MultiModalPredictor
+    from scripts.train_model import prepare_version
+
+    model_output_path = new_version_dir()
+    shutil.copytree(best['model_path'], model_output_path, dirs_exist_ok=True)
+    prepare_version(MultiModalPredictor.load(model_output_path), train_df, val_df, model_output_path, parameters)
+    publish_version(model_output_path)
+    prune_versions(keep=parameters["registry_options"]["keep_versions"])
+    return best.to_dict()
@@ -0,0 +1,278 @@
+import io
+import json
+import multiprocessing
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+from PIL import Image
+
+from pipeline_config import parameters
+from serving.hot_swap import warmup_predictor
+from serving.image_io import decode_image
+from serving.inference import load_predictor, predict_images, top_prediction
+from serving.runtime import apply_serving_options
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_payloads(count, seed=0):
+    """Raw image bytes as the app receives them: test-split files if available, else synthetic JPEGs."""
+    test_csv = os.path.join(BASE_DIR, 'data', 'splits', 'test_data.csv')
+    if os.path.exists(test_csv):
+        test_df = pd.read_csv(test_csv)
+        payloads = []
+        for image_path in test_df['image'].sample(min(count, len(test_df)), random_state=seed):
+            with open(image_path, 'rb') as f:
+                payloads.append(f.read())
+        return payloads
+    rng = np.random.default_rng(seed)
+    payloads = []
+    for i in range(count):
+        width, height = [(640, 480), (1600, 1200), (4032, 3024)][i % 3]
+        buffer = io.BytesIO()
+        Image.fromarray(rng.integers(0, 255, (height // 8, width // 8, 3), dtype=np.uint8)) \
+            .resize((width, height)).save(buffer, format='JPEG', quality=85)
+        payloads.append(buffer.getvalue())
+    return payloads
+
+
+def _server_main(replica_index, model_path, serving_options, decode_options, requests, results):
+    """Headless replica: the app's decode -> predict -> top-1 path, fed from a shared queue."""
+    apply_serving_options(serving_options, replica_index)
+    predictor = load_predictor(model_path)
+    warmup_predictor(predictor, decode_options['target_size'])
+    results.put(('ready', replica_index, None))
+    while True:
+        item = requests.get()
+        if item is None:
+            break
+        request_id, payload = item
+        try:
+            image = decode_image(io.BytesIO(payload), decode_options['target_size'], decode_options['max_pixels'])
+            top_prediction(predict_images(predictor, [image]))
+            results.put(('done', request_id, None))
+        except Exception as e:
+            results.put(('done', request_id, f"{type(e).__name__}: {e}"))
+
+
+class LocalServer:
+    """`replicas` headless server processes sharing one request queue, like replicas behind a balancer."""
+
+    def __init__(self, model_path, replicas, serving_options, decode_options):
+        ctx = multiprocessing.get_context('spawn')
+        self.requests = ctx.Queue()
+        self.results = ctx.Queue()
+        self.processes = [
+            ctx.Process(target=_server_main, daemon=True,
+                        args=(i, model_path, dict(serving_options, replicas=replicas), decode_options,
+                              self.requests, self.results))
+            for i in range(replicas)
+        ]
+        self._completions = {}
+        self._waiters = {}
+        self._lock = threading.Lock()
+        self._collector = threading.Thread(target=self._collect, daemon=True)
+
+    def start(self, timeout=300):
+        """Start the replicas; RuntimeError if one dies or they are not all ready within `timeout` seconds."""
+        for process in self.processes:
+            process.start()
+        deadline = time.time() + timeout
+        ready = 0
+        while ready < len(self.processes):
+            try:
+                self.results.get(timeout=1.0)  # ready signal from each replica
+                ready += 1
+                continue
+            except queue.Empty:
+                pass
+            crashed = [(i, process.exitcode) for i, process in enumerate(self.processes)
+                       if process.exitcode not in (None, 0)]
+            if crashed or time.time() > deadline:
+                for process in self.processes:
+                    process.terminate()
+                    process.join()
+                if crashed:
+                    raise RuntimeError(f"replica {crashed[0][0]} exited with code {crashed[0][1]} during startup")
+                raise RuntimeError(f"{len(self.processes) - ready} replica(s) not ready within {timeout}s")
+        self._collector.start()
+        return self
+
+    def _collect(self):
+        while True:
+            kind, request_id, error = self.results.get()
+            if kind == 'stop':
+                break
+            with self._lock:
+                self._completions[request_id] = (time.time(), error)
+                waiter = self._waiters.pop(request_id, None)
+            if waiter is not None:
+                waiter.set()
+
+    def submit(self, request_id, payload, waiter=None):
+        if waiter is not None:
+            with self._lock:
+                self._waiters[request_id] = waiter
+        self.requests.put((request_id, payload))
+
+    def completions(self):
+        with self._lock:
+            return dict(self._completions)
+
+    def drain(self):
+        """Drop requests still queued from an overloaded level so they do not leak into the next one."""
+        dropped = 0
+        while True:
+            try:
+                self.requests.get_nowait()
+                dropped += 1
+            except queue.Empty:
+                return dropped
+
+    def stop(self):
+        self.drain()
+        for _ in self.processes:
+            self.requests.put(None)
+        for process in self.processes:
+            process.join(timeout=10)
+        self.results.put(('stop', None, None))
+        self._collector.join()
+
+
+def summarize(level, sent, server, duration, timeout):
+    """Latency distribution, throughput and error rate for one load level.
+
+    Latency is measured from each request's scheduled send time, so queueing
+    delay under overload is included rather than hidden.
+    """
+    completions = server.completions()
+    latencies, errors = [], 0
+    for request_id, sent_time in sent.items():
+        completion = completions.get(request_id)
+        if completion is None or completion[1] is not None or completion[0] - sent_time > timeout:
+            errors += 1
+        else:
+            latencies.append(completion[0] - sent_time)
+    latencies = np.array(latencies) if latencies else np.array([np.nan])
+    return dict(level, **{
+        'requests': len(sent),
+        'throughput': (len(sent) - errors) / duration,
+        'error_rate': errors / max(len(sent), 1),
+        'p50': float(np.nanpercentile(latencies, 50)),
+        'p95': float(np.nanpercentile(latencies, 95)),
+        'p99': float(np.nanpercentile(latencies, 99)),
+        'max': float(np.nanmax(latencies))
+    })
+
+
+def run_open_loop(server, payloads, rate, duration, timeout, level_index, seed=0):
+    """Poisson arrivals at `rate` requests/sec, sent on schedule whether or not earlier ones finished."""
+    rng = np.random.default_rng(seed + level_index)
+    arrivals = np.cumsum(rng.exponential(1.0 / rate, size=int(rate * duration * 2) + 10))
+    arrivals = arrivals[arrivals < duration]
+    sent = {}
+    start_time = time.time()
+    for i, offset in enumerate(arrivals):
+        delay = start_time + offset - time.time()
+        if delay > 0:
+            time.sleep(delay)
+        request_id = (level_index, i)
+        sent[request_id] = start_time + offset
+        server.submit(request_id, payloads[i % len(payloads)])
+    time.sleep(max(0.0, start_time + duration + timeout - time.time()))
+    return summarize({'mode': 'open', 'rate': rate}, sent, server, duration, timeout)
+
+
+def run_closed_loop(server, payloads, users, duration, timeout, think_time, level_index):
+    """`users` concurrent clients that each wait for their answer (or the timeout) before sending again."""
+    sent = {}
+    sent_lock = threading.Lock()
+    end_time = time.time() + duration
+
+    def client(user):
+        i = 0
+        while time.time() < end_time:
+            request_id = (level_index, user, i)
+            waiter = threading.Event()
+            with sent_lock:
+                sent[request_id] = time.time()
+            server.submit(request_id, payloads[(user + i * users) % len(payloads)], waiter)
+            waiter.wait(timeout)
+            i += 1
+            if think_time:
+                time.sleep(think_time)
+
+    clients = [threading.Thread(target=client, args=(user,)) for user in range(users)]
+    for thread in clients:
+        thread.start()
+    for thread in clients:
+        thread.join()
+    return summarize({'mode': 'closed', 'users': users}, sent, server, duration, timeout)
+
+
+def find_saturation(levels, slo_p95, max_error_rate=0.01):
+    """First open-loop rate whose p95 exceeds the SLO, errors appear, or throughput falls behind the offered load."""
+    for level in levels:
+        if level['mode'] != 'open':
+            continue
+        if level['p95'] > slo_p95 or level['error_rate'] > max_error_rate or level['throughput'] < 0.9 * level['rate']:
+            return level['rate']
+    return None
+
+
+def load_test(model_path=None, save_path='outputs/load_test.json'):
+    """
+    Drives local headless replicas with open-loop arrival rates and closed-loop
+    users for each replica count in `load_test_options` and reports latency,
+    throughput, errors and the saturation point per replica count.
+    """
+    if model_path is None:
+        model_path = os.path.join(BASE_DIR, 'models', 'autogluon_model')
+    options = parameters["load_test_options"]
+    payloads = load_payloads(options['payloads'])
+
+    report = {'model_path': model_path, 'options': options, 'runs': []}
+    for replicas in options['replicas']:
+        print(f"Load testing {replicas} replica(s)...")
+        try:
+            server = LocalServer(model_path, replicas, parameters["serving_options"],
+                                 parameters["decode_options"]).start(options['startup_timeout'])
+        except RuntimeError as e:
+            print(f"[WARNING] {replicas} replica(s) failed to start: {e}")
+            report['runs'].append({'replicas': replicas, 'error': str(e)})
+            continue
+        levels = []
+        try:
+            for users in options['users']:
+                level = run_closed_loop(server, payloads, users, options['duration'], options['timeout'],
+                                        options['think_time'], len(levels))
+                levels.append(level)
+                server.drain()
+                print(f"   {users:>3} users: {level['throughput']:6.1f} req/s, p50 {level['p50']:.3f}s, "
+                      f"p95 {level['p95']:.3f}s, errors {level['error_rate']:.1%}")
+            for rate in options['rates']:
+                level = run_open_loop(server, payloads, rate, options['duration'], options['timeout'], len(levels))
+                levels.append(level)
+                server.drain()
+                print(f"   {rate:>5.1f} req/s offered: {level['throughput']:6.1f} req/s, p50 {level['p50']:.3f}s, "
+                      f"p95 {level['p95']:.3f}s, p99 {level['p99']:.3f}s, errors {level['error_rate']:.1%}")
+        finally:
+            server.stop()
+
+        saturation = find_saturation(levels, options['slo_p95'])
+        print(f"   Saturation point: {f'{saturation} req/s' if saturation else 'not reached'}")
+        report['runs'].append({'replicas': replicas, 'saturation_rate': saturation, 'levels': levels})
+
+    os.makedirs(os.path.dirname(save_path), exist_ok=True)
+    with open(save_path, 'w') as f:
+        json.dump(report, f, indent=2, default=str)
+    print(f"Load test report saved to: {save_path}")
+    return report
+
+
+if __name__ == "__main__":
+    load_test()
@@ -0,0 +1,120 @@
+import json
+import os
+
+import numpy as np
+
+
+def encode_labels(true_labels, predicted_labels, class_labels):
+    """Map true/predicted labels to integer indices into one sorted class array.
+
+    The class array is the union of the model's classes and any label seen
+    in the data, so every value has an index. Lookup is a single
+    `searchsorted` per array instead of a Python loop.
+    """
+    true_labels = np.asarray(true_labels)
+    predicted_labels = np.asarray(predicted_labels)
+    classes = np.union1d(np.union1d(np.asarray(class_labels), true_labels), predicted_labels)
+    return np.searchsorted(classes, true_labels), np.searchsorted(classes, predicted_labels), classes
+
+
+def confusion_counts(true_idx, pred_idx, num_classes):
+    """Confusion matrix (rows = true, columns = predicted) from integer arrays in one bincount."""
+    flat = np.bincount(true_idx * num_classes + pred_idx, minlength=num_classes * num_classes)
+    return flat.reshape(num_classes, num_classes)
+
+
+def metrics_from_confusion(cm):
+    """Accuracy plus per-class and averaged precision/recall/F1, all derived from `cm`.
+
+    Matches sklearn's definitions with zero_division=0: macro averages cover
+    classes that occur in either the true or the predicted labels.
+    """
+    true_positives = np.diag(cm).astype(np.float64)
+    support = cm.sum(axis=1)
+    predicted = cm.sum(axis=0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        precision = np.where(predicted > 0, true_positives / predicted, 0.0)
+        recall = np.where(support > 0, true_positives / support, 0.0)
+        f1 = np.where(precision + recall > 0, 2 * precision * recall / (precision + recall), 0.0)
+
+    present = (support + predicted) > 0
+    weights = support / max(support.sum(), 1)
+    return {
+        'accuracy': float(true_positives.sum() / max(cm.sum(), 1)),
+        'precision': float((precision * weights).sum()),
+        'recall': float((recall * weights).sum()),
+        'f1_score': float((f1 * weights).sum()),
+        'macro_precision': float(precision[present].mean()),
+        'macro_recall': float(recall[present].mean()),
+        'macro_f1': float(f1[present].mean()),
+        'per_class': {
+            'precision': precision,
+            'recall': recall,
+            'f1_score': f1,
+            'support': support
+        }
+    }
+
+
+def expected_calibration_error(probabilities, true_labels, class_labels, bins=15):
+    """Top-label ECE: bin predictions by confidence (equal width) and average |accuracy - confidence|.
+
+    `probabilities` is an (n, classes) array whose columns are `class_labels`.
+    """
+    probabilities = np.asarray(probabilities, dtype=np.float64)
+    confidence = probabilities.max(axis=1)
+    correct = np.asarray(class_labels)[probabilities.argmax(axis=1)] == np.asarray(true_labels)
+    bin_idx = np.minimum((confidence * bins).astype(int), bins - 1)
+    counts = np.bincount(bin_idx, minlength=bins)
+    gaps = np.abs(np.bincount(bin_idx, weights=correct, minlength=bins)
+                  - np.bincount(bin_idx, weights=confidence, minlength=bins))
+    return float(gaps.sum() / max(counts.sum(), 1))
+
+
+def label_names(classes, label_map):
+    """Display names for `classes`, looked up once per class rather than per prediction."""
+    return np.array([label_map.get(int(label), str(label)) for label in classes])
+
+
+def format_classification_report(metrics, names, digits=3):
+    """Text table in the layout of sklearn's classification_report."""
+    per_class = metrics['per_class']
+    present = (per_class['support'] + metrics['confusion_matrix'].sum(axis=0)) > 0
+    width = max(len('weighted avg'), max((len(name) for name in names[present]), default=0))
+    total = int(per_class['support'].sum())
+
+    lines = [f"{'':>{width}} {'precision':>9} {'recall':>9} {'f1-score':>9} {'support':>9}", ""]
+    for i in np.flatnonzero(present):
+        lines.append(f"{names[i]:>{width}} {per_class['precision'][i]:>9.{digits}f} "
+                     f"{per_class['recall'][i]:>9.{digits}f} {per_class['f1_score'][i]:>9.{digits}f} "
+                     f"{int(per_class['support'][i]):>9}")
+    lines.append("")
+    lines.append(f"{'accuracy':>{width}} {'':>9} {'':>9} {metrics['accuracy']:>9.{digits}f} {total:>9}")
+    lines.append(f"{'macro avg':>{width}} {metrics['macro_precision']:>9.{digits}f} "
+                 f"{metrics['macro_recall']:>9.{digits}f} {metrics['macro_f1']:>9.{digits}f} {total:>9}")
+    lines.append(f"{'weighted avg':>{width}} {metrics['precision']:>9.{digits}f} "
+                 f"{metrics['recall']:>9.{digits}f} {metrics['f1_score']:>9.{digits}f} {total:>9}")
+    return "\n".join(lines) + "\n"
+
+
+def write_metrics_json(performance_metrics, save_path='outputs/metrics.json'):
+    """Compact machine-readable summary: global metrics, per-class metrics and the confusion matrix."""
+    per_class = performance_metrics['per_class']
+    summary = {
+        key: performance_metrics[key]
+        for key in ('accuracy', 'precision', 'recall', 'f1_score', 'macro_precision', 'macro_recall',
+                    'macro_f1', 'ece', 'inference_time', 'avg_inference_time')
+    }
+    if 'ece_uncalibrated' in performance_metrics:
+        summary['ece_uncalibrated'] = performance_metrics['ece_uncalibrated']
+    summary['classes'] = [label.item() if hasattr(label, 'item') else label
+                          for label in performance_metrics['classes']]
+    summary['per_class'] = {key: np.round(values, 4).tolist() for key, values in per_class.items()}
+    summary['confusion_matrix'] = performance_metrics['confusion_matrix'].tolist()
+    if 'tta' in performance_metrics:
+        summary['tta'] = performance_metrics['tta']
+
+    os.makedirs(os.path.dirname(save_path), exist_ok=True)
+    with open(save_path, 'w') as f:
+        json.dump(summary, f, separators=(',', ':'))
+    return save_path
@@ -0,0 +1,91 @@
+import argparse
+import json
+import os
+import shutil
+import time
+
+from pipeline_config import parameters
+from serving.model_store import (
+    MANIFEST_FILE, REFS_DIR, build_manifest, cache_lock, cache_usage, evict_cache, fetch_model
+)
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def publish_model(model_path=None, remote_dir=None, name=None, version=None, ref='latest',
+                  label_map_path="data/metadata/label_map.pkl"):
+    """
+    Publishes a model directory as a versioned bundle in a directory remote
+    (a local directory, a mounted share, or the document root of an HTTP
+    server): <remote_dir>/<name>/<version>/ with the model files, the label
+    map and a manifest.json of sizes and sha256 checksums. The ref file is
+    written last, so fetching replicas never see a half-published version.
+    """
+    options = parameters["model_fetch_options"]
+    if model_path is None:
+        export_path = os.path.join(BASE_DIR, parameters["export_options"]["export_path"])
+        # The exported model is what the slim serving image can load
+        model_path = export_path if os.path.exists(export_path) else os.path.join(BASE_DIR, 'models', 'autogluon_model')
+    model_path = os.path.realpath(model_path)
+    remote_dir = remote_dir or options["publish_dir"]
+    name = name or options["name"]
+    version = version or time.strftime('v%Y%m%d-%H%M%S')
+
+    version_dir = os.path.join(remote_dir, name, version)
+    if os.path.exists(version_dir):
+        raise FileExistsError(f"Version already published: {version_dir}")
+    tmp_dir = version_dir + '.tmp'
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    shutil.copytree(model_path, tmp_dir)
+    if os.path.exists(label_map_path):
+        shutil.copy2(label_map_path, os.path.join(tmp_dir, 'label_map.pkl'))
+    manifest = build_manifest(tmp_dir, name, version)
+    with open(os.path.join(tmp_dir, MANIFEST_FILE), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_dir, version_dir)
+
+    refs_dir = os.path.join(remote_dir, name, REFS_DIR)
+    os.makedirs(refs_dir, exist_ok=True)
+    with open(os.path.join(refs_dir, ref + '.tmp'), 'w') as f:
+        f.write(version + '\n')
+    os.replace(os.path.join(refs_dir, ref + '.tmp'), os.path.join(refs_dir, ref))
+
+    size = sum(entry['size'] for entry in manifest['files'])
+    print(f"Published {name}:{version} ({len(manifest['files'])} files, {size / 1024 ** 2:.1f} MB) "
+          f"to {version_dir}; {ref} -> {version}")
+    return version_dir
+
+
+def fetch(remote_url=None, ref=None):
+    """Warm the local model cache, e.g. before starting replicas."""
+    options = parameters["model_fetch_options"]
+    remote_url = remote_url or os.environ.get("MODEL_REMOTE_URL") or options["remote_url"] or options["publish_dir"]
+    path = fetch_model(remote_url, options["name"], ref or options["ref"], options["cache_dir"], options["workers"],
+                       options["chunk_size"], options["max_cache_bytes"], options["timeout"], options["retries"])
+    print(f"{options['name']}:{ref or options['ref']} cached at {os.path.realpath(path)}")
+    return path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Publish model bundles to a remote and manage the local model cache")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    publish_parser = subparsers.add_parser('publish')
+    publish_parser.add_argument('--model-path')
+    publish_parser.add_argument('--remote-dir')
+    publish_parser.add_argument('--version')
+    fetch_parser = subparsers.add_parser('fetch')
+    fetch_parser.add_argument('--remote-url')
+    fetch_parser.add_argument('--ref')
+    evict_parser = subparsers.add_parser('evict')
+    evict_parser.add_argument('--max-bytes', type=int)
+    args = parser.parse_args()
+    if args.command == 'publish':
+        publish_model(args.model_path, args.remote_dir, version=args.version)
+    elif args.command == 'fetch':
+        fetch(args.remote_url, args.ref)
+    else:
+        cache_dir = parameters["model_fetch_options"]["cache_dir"]
+        max_bytes = parameters["model_fetch_options"]["max_cache_bytes"] if args.max_bytes is None else args.max_bytes
+        with cache_lock(cache_dir):
+            freed = evict_cache(cache_dir, max_bytes)
+        print(f"Freed {freed / 1024 ** 2:.1f} MB; cache now {cache_usage(cache_dir) / 1024 ** 2:.1f} MB")
@@ -2,9 +2,11 @@ import os
 import pandas as pd
 import pickle
 from sklearn.model_selection import train_test_split
-from PIL import Image
 import matplotlib.pyplot as plt
 
+from scripts.data_quality import cap_per_class, scan_dataset, write_quality_report
+from serving.tracing import span
+
 
 def preprocess_data(parameters):
     """
@@ -36,40 +38,25 @@ def preprocess_data(parameters):
     else:
         print(f"   ERROR: Data directory not found: {data_dir}")
 
-    image_files = []
-
-    print("Scanning raw data directory...")
-
-    for dirpath, _, filenames in os.walk(raw_data_path):
-        category = os.path.basename(dirpath)
-        valid_images = 0
-
-        for filename in filenames:
-            if filename.lower().endswith(('.png', '.jpg', '.jpeg')):
-                image_path = os.path.join(dirpath, filename)
+    quality_options = parameters["data_quality_options"]
 
-                # Validate image can be opened
-                try:
-                    with Image.open(image_path) as img:
-                        # Check if image is valid and has reasonable dimensions
-                        if img.size[0] > 10 and img.size[1] > 10:  # Reduced minimum size check from 50 to 10
-                            image_files.append({
-                                "image": image_path,
-                                "label": category
-                            })
-                            valid_images += 1
-                        else:
-                            print(f"Image too small: {image_path} - {img.size}")
-                except Exception as e:
-                    print(f"Skipping invalid image {image_path}: {e}")
-                    continue
-
-        print(f"{category}: {valid_images} valid images")
+    print("Scanning raw data directory (headers only)...")
+    with span('scan') as scan_span:
+        images, class_stats = scan_dataset(raw_data_path, quality_options)
+        scan_span.set(images=len(images))
+    if images.empty:
+        raise ValueError("No valid images found in the raw data directory!")
+    for category, count in class_stats['count'].items():
+        print(f"{category}: {count} valid images")
+    write_quality_report(images, class_stats, outputs_dir)
 
-    df = pd.DataFrame(image_files)
+    # Optionally leave out outliers, e.g. ["tiny", "grayscale"]
+    dropped = images['flags'].str.split(';').map(lambda flags: bool(set(flags) & set(quality_options["drop_flags"])))
+    if dropped.any():
+        print(f"   Dropping {dropped.sum()} flagged images ({', '.join(quality_options['drop_flags'])})")
+    image_files = images.loc[~dropped, ['image', 'label']]
 
-    if df.empty:
-        raise ValueError("No valid images found in the raw data directory!")
+    df = image_files.reset_index(drop=True)
 
     print(f"\n Dataset Summary:")
     print(f"   Total images: {len(df)}")
@@ -94,15 +81,16 @@ def preprocess_data(parameters):
     os.makedirs(splits_dir, exist_ok=True)
     os.makedirs(metadata_dir, exist_ok=True)
     
-    plt.figure(figsize=(12, 6))
-    class_counts.sort_index().plot(kind='bar')
-    plt.title("Class Distribution")
-    plt.xlabel("Class Name")
-    plt.ylabel("Number of Images")
-    plt.xticks(rotation=45, ha='right')
-    plt.tight_layout()
-    plt.savefig(os.path.join(outputs_dir, "class_distribution.png"))
-    plt.close()
+    with span('plot'):
+        plt.figure(figsize=(12, 6))
+        class_counts.sort_index().plot(kind='bar')
+        plt.title("Class Distribution")
+        plt.xlabel("Class Name")
+        plt.ylabel("Number of Images")
+        plt.xticks(rotation=45, ha='right')
+        plt.tight_layout()
+        plt.savefig(os.path.join(outputs_dir, "class_distribution.png"))
+        plt.close()
 
     # Save summary to file
     with open(os.path.join(outputs_dir, "preprocessing_summary.txt"), "w") as f:
@@ -115,6 +103,9 @@ def preprocess_data(parameters):
         f.write(f"Max samples/class: {class_counts.max()}\n")
         f.write(f"Mean samples/class: {class_counts.mean():.1f}\n")
         f.write(f"Std samples/class: {class_counts.std():.1f}\n")
+        f.write(f"Outliers flagged: {(images['flags'] != '').sum()} (see data_quality_outliers.csv)\n")
+        for flag in ('tiny', 'grayscale', 'extreme_aspect'):
+            f.write(f"  {flag}: {int(class_stats[flag].sum())}\n")
 
     # Check for class imbalance
     imbalance_ratio = class_counts.max() / class_counts.min()
@@ -137,29 +128,40 @@ def preprocess_data(parameters):
     # Encode labels
     df['label'] = pd.factorize(df['label'])[0]
 
-    # First split to separate out the test set
-    train_val_df, test_df = train_test_split(
-        df,
-        test_size=parameters["model_options"]["test_size"],
-        random_state=parameters["model_options"]["random_state"],
-        stratify=df["label"]
-    )
-
-    # Second split to create training and validation sets
-    train_df, val_df = train_test_split(
-        train_val_df,
-        test_size=parameters["model_options"]["test_size"],
-        random_state=parameters["model_options"]["random_state"],
-        stratify=train_val_df["label"]
-    )
+    with span('split'):
+        # First split to separate out the test set
+        train_val_df, test_df = train_test_split(
+            df,
+            test_size=parameters["model_options"]["test_size"],
+            random_state=parameters["model_options"]["random_state"],
+            stratify=df["label"]
+        )
+
+        # Second split to create training and validation sets
+        train_df, val_df = train_test_split(
+            train_val_df,
+            test_size=parameters["model_options"]["test_size"],
+            random_state=parameters["model_options"]["random_state"],
+            stratify=train_val_df["label"]
+        )
+
+        # Cap over-represented classes in the training split only; val/test keep the real distribution
+        full_train_size = len(train_df)
+        train_df = cap_per_class(train_df, quality_options["per_class_cap"], quality_options["balance"],
+                                 parameters["model_options"]["random_state"])
 
     print(f"\n Final Split Summary:")
-    print(f"   Training set: {len(train_df)} images")
+    print(f"   Training set: {len(train_df)} images"
+          + (f" (capped from {full_train_size})" if len(train_df) < full_train_size else ""))
     print(f"   Validation set: {len(val_df)} images")
     print(f"   Test set: {len(test_df)} images")
 
     # Save splits to disk
     train_df.to_csv(os.path.join(splits_dir, "train_data.csv"), index=False)
+    if len(train_df) < full_train_size:
+        with open(os.path.join(outputs_dir, "preprocessing_summary.txt"), "a") as f:
+            f.write(f"Training manifest capped: {len(train_df)} of {full_train_size} images "
+                    f"(per_class_cap={quality_options['per_class_cap']}, balance={quality_options['balance']})\n")
     val_df.to_csv(os.path.join(splits_dir, "val_data.csv"), index=False)
     test_df.to_csv(os.path.join(splits_dir, "test_data.csv"), index=False)
 
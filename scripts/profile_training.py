@@ -0,0 +1,233 @@
+import glob
+import json
+import os
+import random
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import torch
+import torch.nn.functional as F
+from PIL import ImageOps
+
+from pipeline_config import parameters
+from serving.image_io import decode_image
+from serving.runtime import available_cpus
+from serving.timm_predictor import TimmPredictor
+from serving.worker_pool import process_memory
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CLOCK_TICKS = os.sysconf('SC_CLK_TCK')
+
+
+class TrainingImageDataset(torch.utils.data.Dataset):
+    """Decode + augment + normalise, the per-sample work a training data loader does."""
+
+    def __init__(self, predictor, image_paths, labels, target_size):
+        self.predictor = predictor
+        self.image_paths = list(image_paths)
+        self.labels = list(labels)
+        self.target_size = target_size
+
+    def __len__(self):
+        return len(self.image_paths)
+
+    def __getitem__(self, index):
+        image = decode_image(self.image_paths[index], self.target_size)
+        if random.random() < 0.5:
+            image = ImageOps.mirror(image)
+        return torch.from_numpy(self.predictor.preprocess(image)), int(self.labels[index])
+
+
+def child_pids():
+    """PIDs of this process's children (the data-loader workers), from /proc."""
+    pids = []
+    for children_file in glob.glob(f"/proc/{os.getpid()}/task/*/children"):
+        with open(children_file) as f:
+            pids.extend(int(pid) for pid in f.read().split())
+    return pids
+
+
+def cpu_seconds(pid):
+    """User + system CPU time consumed by a process so far."""
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(')', 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / CLOCK_TICKS
+
+
+class MemorySampler(threading.Thread):
+    """Track peak PSS of this process plus its workers while a setting runs."""
+
+    def __init__(self, interval=0.5):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.peak_mb = 0.0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            total = 0.0
+            for pid in [os.getpid()] + child_pids():
+                try:
+                    total += process_memory(pid)['pss_mb']
+                except OSError:
+                    pass  # worker exited between listing and reading
+            self.peak_mb = max(self.peak_mb, total)
+            self._stop_event.wait(self.interval)
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+def profile_setting(model, dataset, num_workers, batch_size, epochs, steps_per_epoch, learning_rate):
+    """Run a few short epochs and split each one into data-loading wait and compute time."""
+    loader = torch.utils.data.DataLoader(
+        dataset, batch_size=batch_size, shuffle=True, drop_last=True,
+        num_workers=num_workers, persistent_workers=num_workers > 0
+    )
+    optimizer = torch.optim.AdamW(model.parameters(), lr=learning_rate)
+    sampler = MemorySampler()
+    sampler.start()
+    model.train()
+
+    epoch_stats = []
+    for epoch in range(epochs):
+        data_wait = compute = 0.0
+        samples = 0
+        main_cpu_start = cpu_seconds(os.getpid())
+        epoch_start = time.time()
+        batches = iter(loader)
+        worker_cpu_start = {pid: cpu_seconds(pid) for pid in child_pids()}
+        for step in range(min(steps_per_epoch, len(loader))):
+            wait_start = time.time()
+            images, labels = next(batches)
+            compute_start = time.time()
+            loss = F.cross_entropy(model(images), labels)
+            optimizer.zero_grad()
+            loss.backward()
+            optimizer.step()
+            data_wait += compute_start - wait_start
+            compute += time.time() - compute_start
+            samples += len(images)
+        wall_time = time.time() - epoch_start
+
+        worker_utilization = [
+            round((cpu_seconds(pid) - start) / wall_time, 3)
+            for pid, start in worker_cpu_start.items() if os.path.exists(f"/proc/{pid}")
+        ]
+        epoch_stats.append({
+            'epoch': epoch + 1,
+            'wall_time': wall_time,
+            'samples_per_sec': samples / wall_time,
+            'data_wait': data_wait,
+            'compute': compute,
+            'data_wait_fraction': data_wait / (data_wait + compute),
+            'main_cpu_utilization': (cpu_seconds(os.getpid()) - main_cpu_start) / wall_time,
+            'worker_cpu_utilization': worker_utilization
+        })
+        del batches
+
+    sampler.stop()
+    del loader  # shuts down persistent workers
+    # The first epoch includes worker start-up, so report the steady state
+    steady = epoch_stats[1:] or epoch_stats
+    return {
+        'num_workers': num_workers,
+        'batch_size': batch_size,
+        'samples_per_sec': float(np.mean([e['samples_per_sec'] for e in steady])),
+        'data_wait_fraction': float(np.mean([e['data_wait_fraction'] for e in steady])),
+        'peak_memory_mb': sampler.peak_mb,
+        'epochs': epoch_stats
+    }
+
+
+def recommend(results, cpu_count):
+    """Pick the fastest setting and explain whether training is input- or compute-bound."""
+    best = max(results, key=lambda r: r['samples_per_sec'])
+    notes = []
+    if best['data_wait_fraction'] > 0.3:
+        if best['num_workers'] < cpu_count - 1:
+            notes.append("Still waiting on data for over 30% of each step: try more data-loader workers.")
+        else:
+            notes.append("Input-bound with all CPUs busy: shrink decode cost (smaller source images, caching).")
+    else:
+        notes.append("Compute-bound: extra workers will not help; batch size mostly trades memory for speed.")
+    return {
+        'env.num_workers': best['num_workers'],
+        'env.per_gpu_batch_size': best['batch_size'],
+        'samples_per_sec': best['samples_per_sec'],
+        'notes': notes
+    }
+
+
+def plot_profile(results, save_path):
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    labels = [f"w{r['num_workers']}/b{r['batch_size']}" for r in results]
+    waits = [r['data_wait_fraction'] for r in results]
+    fig, (ax_throughput, ax_split) = plt.subplots(2, 1, figsize=(max(6, len(results) * 0.8), 7), sharex=True)
+    ax_throughput.bar(labels, [r['samples_per_sec'] for r in results], color='steelblue')
+    ax_throughput.set_ylabel('Samples / sec')
+    ax_throughput.set_title('Training throughput by data-loader workers (w) and batch size (b)')
+    ax_split.bar(labels, waits, color='indianred', label='Data-loading wait')
+    ax_split.bar(labels, [1 - w for w in waits], bottom=waits, color='seagreen', label='Compute')
+    ax_split.set_ylabel('Fraction of step time')
+    ax_split.legend(loc='upper right')
+    plt.setp(ax_split.get_xticklabels(), rotation=45, ha='right')
+    fig.tight_layout()
+    fig.savefig(save_path, dpi=120)
+    plt.close(fig)
+
+
+def profile_training(train_df, parameters, save_dir='outputs'):
+    """
+    Profiles the training input pipeline and model step for each configured
+    (num_workers, batch_size) pair and writes training_profile.json/.png with
+    a recommended AutoGluon `env.num_workers` / `env.per_gpu_batch_size`.
+    """
+    options = parameters["profile_options"]
+    checkpoint_name = parameters["model_options"]["hyperparameters"]["model.timm_image.checkpoint_name"]
+    target_size = parameters["decode_options"]["target_size"]
+    class_labels = sorted(train_df['label'].unique())
+    label_index = {label: i for i, label in enumerate(class_labels)}
+    cpu_count = len(available_cpus())
+
+    # Step time does not depend on the weights, so skip the pretrained download
+    predictor = TimmPredictor.create(checkpoint_name, class_labels, pretrained=False, image_size=target_size)
+    dataset = TrainingImageDataset(predictor, train_df['image'], train_df['label'].map(label_index), target_size)
+    initial_state = {k: v.clone() for k, v in predictor.model.state_dict().items()}
+
+    print(f"Profiling {checkpoint_name} training on {cpu_count} CPUs...")
+    results = []
+    for batch_size in options['batch_sizes']:
+        for num_workers in options['num_workers']:
+            if num_workers > cpu_count:
+                continue
+            predictor.model.load_state_dict(initial_state)
+            result = profile_setting(predictor.model, dataset, num_workers, batch_size, options['epochs'],
+                                     options['steps_per_epoch'], parameters["model_options"]["learning_rate"])
+            results.append(result)
+            print(f"   workers={num_workers:<2} batch={batch_size:<3} {result['samples_per_sec']:7.1f} samples/sec, "
+                  f"data wait {result['data_wait_fraction']:.0%}, peak {result['peak_memory_mb']:.0f} MB")
+
+    recommendation = recommend(results, cpu_count)
+    print(f"Recommended: env.num_workers={recommendation['env.num_workers']}, "
+          f"env.per_gpu_batch_size={recommendation['env.per_gpu_batch_size']}")
+    for note in recommendation['notes']:
+        print(f"   {note}")
+
+    os.makedirs(save_dir, exist_ok=True)
+    with open(os.path.join(save_dir, 'training_profile.json'), 'w') as f:
+        json.dump({'checkpoint_name': checkpoint_name, 'cpus': cpu_count,
+                   'settings': results, 'recommendation': recommendation}, f, indent=2)
+    plot_profile(results, os.path.join(save_dir, 'training_profile.png'))
+    print(f"Training profile saved to: {os.path.join(save_dir, 'training_profile.json')}")
+    return recommendation
+
+
+if __name__ == "__main__":
+    profile_training(pd.read_csv(os.path.join(BASE_DIR, 'data', 'splits', 'train_data.csv')), parameters)
@@ -0,0 +1,110 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TRAINING_ONLY_MODULES = ('autogluon', 'sklearn', 'matplotlib', 'seaborn', 'scripts')
+
+# Runs in a fresh interpreter so imports and model load are measured cold
+STARTUP_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import numpy, pandas, streamlit, yaml
+from serving.hot_swap import warmup_predictor
+from serving.inference import load_predictor
+imported = time.perf_counter()
+predictor = load_predictor(sys.argv[1])
+loaded = time.perf_counter()
+warmup_predictor(predictor)
+ready = time.perf_counter()
+print(json.dumps({
+    'import': imported - start,
+    'load': loaded - imported,
+    'first_prediction': ready - loaded,
+    'total': ready - start,
+    'training_modules': sorted({name.split('.')[0] for name in sys.modules} & set(sys.argv[2].split(',')))
+}))
+"""
+
+
+def measure_startup(model_path, runs=3):
+    """Median cold-start phases (import, model load, first prediction) over `runs` fresh processes."""
+    samples = []
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, '-c', STARTUP_PROBE, model_path, ','.join(TRAINING_ONLY_MODULES)],
+            capture_output=True, text=True, cwd=BASE_DIR, env=dict(os.environ, PYTHONPATH=BASE_DIR)
+        )
+        if result.returncode != 0:
+            raise RuntimeError(f"Startup probe failed for {model_path}: {result.stderr.strip().splitlines()[-1]}")
+        samples.append(json.loads(result.stdout.strip().splitlines()[-1]))
+    report = {phase: statistics.median(sample[phase] for sample in samples)
+              for phase in ('import', 'load', 'first_prediction', 'total')}
+    report['training_modules'] = samples[0]['training_modules']
+    return report
+
+
+def directory_size_mb(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        total += sum(os.path.getsize(os.path.join(root, name)) for name in files)
+    return total / (1024 ** 2)
+
+
+def docker_image_size_mb(tag):
+    """Size of a local Docker image, or None if Docker or the image is unavailable."""
+    try:
+        result = subprocess.run(['docker', 'image', 'inspect', '-f', '{{.Size}}', tag],
+                                capture_output=True, text=True)
+    except FileNotFoundError:
+        return None
+    if result.returncode != 0:
+        return None
+    return int(result.stdout.strip()) / (1024 ** 2)
+
+
+def serving_report(model_paths=None, image_tags=('pet-breed-classifier:latest', 'pet-breed-classifier:training-data'),
+                   save_path='outputs/serving_report.txt'):
+    """Startup time and size of the serving model formats and Docker images."""
+    if model_paths is None:
+        model_paths = {
+            'exported': os.path.join(BASE_DIR, 'models', 'serving_model'),
+            'autogluon': os.path.join(BASE_DIR, 'models', 'autogluon_model')
+        }
+
+    rows = []
+    for name, model_path in model_paths.items():
+        if not os.path.exists(model_path):
+            print(f"   {name}: not found at {model_path}, skipped")
+            continue
+        try:
+            startup = measure_startup(model_path)
+        except RuntimeError as e:
+            print(f"   {name}: {e}")
+            continue
+        rows.append(dict(startup, model=name, size_mb=directory_size_mb(os.path.realpath(model_path))))
+        print(f"   {name}: ready in {startup['total']:.2f}s (import {startup['import']:.2f}s, "
+              f"load {startup['load']:.2f}s, first prediction {startup['first_prediction']:.2f}s)")
+        if startup['training_modules']:
+            print(f"[WARNING] Serving path imported training-only modules: {startup['training_modules']}")
+    images = {tag: docker_image_size_mb(tag) for tag in image_tags}
+
+    os.makedirs(os.path.dirname(save_path), exist_ok=True)
+    with open(save_path, 'w') as f:
+        f.write("SERVING STARTUP & SIZE REPORT\n")
+        f.write("=" * 30 + "\n\n")
+        f.write(f"{'Model':<12} {'Size MB':>9} {'Import s':>9} {'Load s':>8} {'First s':>8} {'Total s':>8}  Training modules\n")
+        for row in rows:
+            f.write(f"{row['model']:<12} {row['size_mb']:>9.1f} {row['import']:>9.2f} {row['load']:>8.2f} "
+                    f"{row['first_prediction']:>8.2f} {row['total']:>8.2f}  {', '.join(row['training_modules']) or 'none'}\n")
+        f.write("\nDocker images\n")
+        for tag, size_mb in images.items():
+            f.write(f"{tag:<45} {f'{size_mb:.0f} MB' if size_mb is not None else 'not built'}\n")
+
+    return {'models': rows, 'images': images}
+
+
+if __name__ == "__main__":
+    serving_report()
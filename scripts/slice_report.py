@@ -0,0 +1,115 @@
+import os
+import pickle
+import time
+
+import numpy as np
+import pandas as pd
+from PIL import Image
+
+from serving.image_io import decode_image
+from serving.inference import predict_images
+
+RESOLUTION_BINS = [0, 0.25, 1, 4, 12, np.inf]
+RESOLUTION_LABELS = ['<0.25MP', '0.25-1MP', '1-4MP', '4-12MP', '>12MP']
+
+
+def image_characteristics(image_path):
+    """Original size, format and file size, read from the header only."""
+    with Image.open(image_path) as image:
+        width, height = image.size
+        image_format = image.format
+    return width, height, image_format, os.path.getsize(image_path)
+
+
+def predict_files_timed(predictor, image_paths, batch_size, target_size, max_pixels):
+    """`predict_files` with per-image latency and input characteristics.
+
+    An image's latency is its own decode time plus an equal share of its
+    batch's forward pass, which is what it costs in batched serving.
+    Returns (probabilities, per-image DataFrame).
+    """
+    image_paths = list(image_paths)
+    batches = []
+    latencies = np.zeros(len(image_paths))
+    for batch_start in range(0, len(image_paths), batch_size):
+        images = []
+        for offset, image_path in enumerate(image_paths[batch_start:batch_start + batch_size]):
+            start_time = time.perf_counter()
+            images.append(decode_image(image_path, target_size, max_pixels))
+            latencies[batch_start + offset] = time.perf_counter() - start_time
+        start_time = time.perf_counter()
+        batches.append(predict_images(predictor, images))
+        latencies[batch_start:batch_start + len(images)] += (time.perf_counter() - start_time) / len(images)
+
+    per_image = pd.DataFrame([image_characteristics(image_path) for image_path in image_paths],
+                             columns=['width', 'height', 'format', 'file_size'])
+    per_image.insert(0, 'image', image_paths)
+    per_image.insert(1, 'latency', latencies)
+    per_image['format'] = per_image['format'].fillna('unknown')
+    per_image['file_size_kb'] = per_image.pop('file_size') / 1024
+    per_image['resolution'] = pd.cut(per_image['width'] * per_image['height'] / 1e6,
+                                     RESOLUTION_BINS, labels=RESOLUTION_LABELS).astype(str)
+    return pd.concat(batches, ignore_index=True), per_image
+
+
+SLICE_DIMENSIONS = {'breed': 'label', 'resolution': 'resolution', 'format': 'format'}
+
+
+def slice_breakdown(per_image, dimensions=SLICE_DIMENSIONS):
+    """Accuracy and latency per value of each slicing dimension, in one table."""
+    tables = []
+    for dimension, column in dimensions.items():
+        grouped = per_image.groupby(column, observed=True)
+        table = pd.DataFrame({
+            'count': grouped.size(),
+            'accuracy': grouped['correct'].mean(),
+            'mean_latency': grouped['latency'].mean(),
+            'p95_latency': grouped['latency'].quantile(0.95),
+            'mean_file_size_kb': grouped['file_size_kb'].mean()
+        })
+        table.index = table.index.astype(str)
+        tables.append(table.rename_axis('value').reset_index().assign(dimension=dimension))
+    columns = ['dimension', 'value', 'count', 'accuracy', 'mean_latency', 'p95_latency', 'mean_file_size_kb']
+    return pd.concat(tables, ignore_index=True)[columns]
+
+
+def rank_slices(slices, min_count=5, top=5):
+    """Slowest slices by p95 latency and least accurate slices, ignoring tiny slices."""
+    eligible = slices[slices['count'] >= min_count]
+    return {
+        'slowest': eligible.sort_values('p95_latency', ascending=False).head(top),
+        'least_accurate': eligible.sort_values('accuracy').head(top)
+    }
+
+
+def write_slice_report(performance_metrics, save_path='outputs/slice_report.txt',
+                       csv_path='outputs/slice_breakdown.csv', label_map_path="data/metadata/label_map.pkl"):
+    """Write the full breakdown as CSV and a ranked text summary of the worst slices."""
+    slices = performance_metrics['slices'].copy()
+    if os.path.exists(label_map_path):
+        with open(label_map_path, "rb") as f:
+            label_map = {str(k): v for k, v in pickle.load(f).items()}
+        is_breed = slices['dimension'] == 'breed'
+        slices.loc[is_breed, 'value'] = slices.loc[is_breed, 'value'].map(lambda v: label_map.get(v, v))
+
+    os.makedirs(os.path.dirname(save_path), exist_ok=True)
+    slices.to_csv(csv_path, index=False)
+
+    overall = performance_metrics['per_image']['latency']
+    ranked = rank_slices(slices)
+    with open(save_path, 'w') as f:
+        f.write("SLICE BREAKDOWN\n")
+        f.write("=" * 25 + "\n")
+        f.write(f"Overall: accuracy {performance_metrics['accuracy']:.4f}, "
+                f"p50 {overall.quantile(0.5):.4f}s, p95 {overall.quantile(0.95):.4f}s\n")
+        for title, table in (("SLOWEST SLICES (p95 latency)", ranked['slowest']),
+                             ("LEAST ACCURATE SLICES", ranked['least_accurate'])):
+            f.write(f"\n{title}\n")
+            f.write("-" * 25 + "\n")
+            for _, row in table.iterrows():
+                f.write(f"{row['dimension']:<11} {str(row['value']):<28} n={int(row['count']):<6} "
+                        f"acc {row['accuracy']:.3f}  p95 {row['p95_latency']:.4f}s  "
+                        f"size {row['mean_file_size_kb']:.0f} KB\n")
+        f.write(f"\nFull breakdown: {csv_path}\n")
+
+    return ranked
@@ -0,0 +1,98 @@
+import argparse
+import json
+import os
+from collections import defaultdict
+
+from pipeline_config import parameters
+
+
+def load_trace(path):
+    """Span records from a JSONL trace file."""
+    records = []
+    with open(path) as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue  # a line cut short by a crash
+    return records
+
+
+def summarize_trace(records):
+    """Wall time per span path: {path: (calls, total seconds, self seconds)}.
+
+    Self time is a span's duration minus that of its direct children, so it
+    shows where time went that no finer span accounts for.
+    """
+    totals = defaultdict(lambda: [0, 0, 0])
+    child_time = defaultdict(int)
+    for record in records:
+        if record['parent_id'] is not None:
+            child_time[record['parent_id']] += record['duration_ns']
+    for record in records:
+        entry = totals[record['path']]
+        entry[0] += 1
+        entry[1] += record['duration_ns']
+        entry[2] += record['duration_ns'] - child_time.get(record['span_id'], 0)
+    return {path: (calls, total / 1e9, max(self_time, 0) / 1e9) for path, (calls, total, self_time) in totals.items()}
+
+
+def format_summary(summary, min_share=0.001):
+    """Indented flame-style table: each path under its parent, children ordered by total time."""
+    roots_total = sum(total for path, (_, total, _) in summary.items() if ';' not in path) or 1.0
+    children = defaultdict(list)
+    for path in summary:
+        children[path.rpartition(';')[0]].append(path)
+
+    lines = [f"{'span':<48} {'calls':>7} {'total s':>10} {'self s':>10} {'share':>7}"]
+
+    def add(parent, depth):
+        for path in sorted(children.get(parent, []), key=lambda p: -summary[p][1]):
+            calls, total, self_time = summary[path]
+            if total / roots_total < min_share:
+                continue
+            name = '  ' * depth + path.rpartition(';')[2]
+            bar = '#' * round(20 * total / roots_total)
+            lines.append(f"{name:<48} {calls:>7} {total:>10.3f} {self_time:>10.3f} {total / roots_total:>6.1%} {bar}")
+            add(path, depth + 1)
+
+    add('', 0)
+    return '\n'.join(lines)
+
+
+def write_folded(summary, save_path):
+    """Self time per path in folded-stack format (`a;b;c <microseconds>`) for flamegraph.pl / speedscope."""
+    with open(save_path, 'w') as f:
+        for path, (_, _, self_time) in sorted(summary.items()):
+            if self_time > 0:
+                f.write(f"{path} {round(self_time * 1e6)}\n")
+    return save_path
+
+
+def write_trace_summary(trace_path, save_path='outputs/trace_summary.txt'):
+    """Flame-style summary of a trace (text table) plus a .folded file next to it for flame graph tools."""
+    records = load_trace(trace_path) if os.path.exists(trace_path) else []
+    if not records:
+        print(f"No spans recorded in {trace_path}")
+        return None
+    summary = summarize_trace(records)
+    os.makedirs(os.path.dirname(save_path) or '.', exist_ok=True)
+    with open(save_path, 'w') as f:
+        f.write("TRACE SUMMARY\n")
+        f.write("=" * 30 + "\n")
+        f.write(f"Trace: {trace_path} ({len(records)} spans)\n\n")
+        f.write(format_summary(summary) + "\n")
+    folded_path = write_folded(summary, os.path.splitext(save_path)[0] + '.folded')
+    print(f"Trace summary saved to: {save_path} (flame graph input: {folded_path})")
+    return summary
+
+
+if __name__ == "__main__":
+    tracing_options = parameters["tracing_options"]
+    parser = argparse.ArgumentParser(description="Summarise a JSONL span trace by where wall time went")
+    parser.add_argument('trace', nargs='?', default=tracing_options["pipeline_trace"])
+    parser.add_argument('--output', default=tracing_options["summary_path"])
+    args = parser.parse_args()
+    if write_trace_summary(args.trace, args.output):
+        with open(args.output) as f:
+            print(f.read())
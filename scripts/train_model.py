@@ -1,44 +1,55 @@
+import hashlib
+import json
 import os
-import shutil
 import pickle
+import shutil
 import yaml
 from autogluon.multimodal import MultiModalPredictor
+from scripts.calibrate_model import calibrate_model
+from scripts.export_model import check_parity, convert_autogluon_model
+from scripts.hpo import data_fingerprint
+from serving.registry import new_version_dir, publish_version, prune_versions
+from serving.tracing import span
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WORK_DIR = os.path.join(BASE_DIR, 'models', 'work')
+RESUME_CHECKPOINT = 'last.ckpt'
+COMPLETE_MARKER = 'training_complete'
+
+
+def training_work_dir(model_options, train_df, val_df):
+    """Working directory for a training run, keyed by the model config and the data splits."""
+    payload = json.dumps({'model_options': model_options, 'data': data_fingerprint(train_df, val_df)},
+                         sort_keys=True, default=str)
+    return os.path.join(WORK_DIR, hashlib.sha1(payload.encode()).hexdigest()[:12])
+
 
 def train_model(train_df, val_df, parameters):
     """
     Trains an AutoGluon MultiModalPredictor model for image classification.
-    """
-    BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    models_dir = os.path.join(BASE_DIR, 'models')
-    model_output_path = os.path.join(models_dir, 'autogluon_model')
 
+    Training runs in models/work/<config hash>, where AutoGluon keeps a
+    resumable last.ckpt; rerunning with the same configuration and data picks
+    up from it. The finished model is copied to a fresh registry version and
+    only then published as models/autogluon_model, so a running app keeps
+    serving the previous version throughout training.
+    """
     model_options = parameters["model_options"]
+    registry_options = parameters["registry_options"]
 
-    # Ensure model directory exists
-    os.makedirs(models_dir, exist_ok=True)
-
-    if os.path.exists(model_output_path):
-        shutil.rmtree(model_output_path)
+    work_dir = training_work_dir(model_options, train_df, val_df)
 
     print(f"Starting model training with configuration:")
     print(f"   - Time limit: {model_options['time_limit']} seconds ({model_options['time_limit']/3600:.1f} hours)")
     print(f"   - Preset: {model_options['presets']}")
     print(f"   - Classes: {train_df['label'].nunique()}")
+    print(f"   - Working directory: {work_dir}")
     
     # Print model architecture info
     if 'hyperparameters' in model_options:
         arch = model_options['hyperparameters'].get('model.timm_image.checkpoint_name', 'auto')
         print(f"   - Model architecture: {arch}")
 
-    # Create and train the model
-    predictor = MultiModalPredictor(
-        label="label",
-        path=model_output_path,
-        eval_metric="accuracy",
-        verbosity=2,
-        problem_type="multiclass"
-    )
-
     # Prepare fit arguments
     fit_kwargs = {
         'train_data': train_df,
@@ -55,21 +66,93 @@ def train_model(train_df, val_df, parameters):
     if 'hyperparameter_tune_kwargs' in model_options:
         fit_kwargs['hyperparameter_tune_kwargs'] = model_options['hyperparameter_tune_kwargs']
 
-    predictor.fit(**fit_kwargs)
+    with span('fit', images=len(train_df)):
+        if os.path.exists(os.path.join(work_dir, COMPLETE_MARKER)):
+            # Interrupted after fitting but before publishing
+            print("Found a finished run for this configuration, skipping training")
+            predictor = MultiModalPredictor.load(work_dir)
+        elif os.path.exists(os.path.join(work_dir, RESUME_CHECKPOINT)):
+            # Lightning keeps weights, optimizer state and epoch in last.ckpt
+            print(f"Resuming interrupted training from {os.path.join(work_dir, RESUME_CHECKPOINT)}")
+            predictor = MultiModalPredictor.load(work_dir, resume=True)
+            predictor.fit(**fit_kwargs)
+        else:
+            if os.path.exists(work_dir):
+                shutil.rmtree(work_dir)  # died before the first checkpoint
+            predictor = MultiModalPredictor(
+                label="label",
+                path=work_dir,
+                eval_metric="accuracy",
+                verbosity=2,
+                problem_type="multiclass"
+            )
+            predictor.fit(**fit_kwargs)
+    open(os.path.join(work_dir, COMPLETE_MARKER), 'w').close()
+
+    # Copy the finished model into a fresh registry version
+    model_output_path = new_version_dir()
+    predictor.save(model_output_path)
 
     print(f"Model training completed successfully!")
     print(f"Model saved to: {model_output_path}")
 
-    # Save the model properly
-    predictor.save(model_output_path)
+    prepare_version(predictor, train_df, val_df, model_output_path, parameters)
+
+    # Switch serving over to the new version and drop old ones
+    publish_version(model_output_path)
+    prune_versions(keep=registry_options["keep_versions"])
+    shutil.rmtree(work_dir, ignore_errors=True)
     
+    return predictor
+
+def prepare_version(predictor, train_df, val_df, model_path, parameters):
+    """Finish a new AutoGluon registry version before it is published.
+
+    Verifies the saved configuration, writes the label map, packs the
+    serving weights and fits probability calibration, so every training path
+    (plain training, HPO) publishes the same thing and serving never sees a
+    half-prepared version.
+    """
     # Verify the saved model configuration
-    verify_saved_model(model_output_path)
-    
+    verify_saved_model(model_path)
+
     # Create label map for inference
-    create_label_map(train_df, model_output_path)
-    
-    return predictor
+    create_label_map(train_df, model_path)
+
+    export_options = parameters["export_options"]
+    if export_options["pack_weights"]:
+        with span('pack_weights'):
+            pack_serving_weights(predictor, model_path, val_df['image'].head(export_options["parity_samples"]),
+                                 export_options["parity_tolerance"])
+
+    # Fitted on the version directory so serving picks it up with the version itself
+    if parameters["calibration_options"]["enabled"]:
+        with span('calibrate'):
+            calibrate_model(val_df, parameters, model_path)
+
+
+def pack_serving_weights(predictor, model_path, sample_paths, tolerance=1e-2):
+    """Add memory-mapped serving weights (timm_model.json + weights.safetensors) to a saved model.
+
+    Serving then loads the version with `TimmPredictor` instead of reading
+    model.ckpt and unpickling AutoGluon's preprocessors; the AutoGluon files
+    stay for continued training. Models that are not timm_image, or whose
+    repacked probabilities differ by more than `tolerance`, are left as is.
+    """
+    try:
+        exported = convert_autogluon_model(model_path, teacher=predictor)
+    except (KeyError, ValueError) as e:
+        print(f"[WARNING] Could not pack serving weights, serving will load the AutoGluon checkpoint: {e}")
+        return None
+    max_diff = check_parity(predictor, exported, list(sample_paths), tolerance)
+    if max_diff > tolerance:
+        print(f"[WARNING] Packed weights disagree with the AutoGluon model (max prob diff {max_diff:.2e}); "
+              f"not saving them, serving will load the AutoGluon checkpoint")
+        return None
+    exported.save(model_path)
+    print(f"Packed serving weights saved to: {model_path}")
+    return model_path
+
 
 def verify_saved_model(model_path):
     """Verify that the saved model has the correct configuration."""
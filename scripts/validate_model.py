@@ -2,13 +2,17 @@ import os
 import pickle
 import time
 import yaml
-import matplotlib.pyplot as plt
-import seaborn as sns
-from sklearn.metrics import (
-    accuracy_score, precision_score, recall_score, f1_score,
-    confusion_matrix, classification_report
+import numpy as np
+from scripts.metrics import (
+    encode_labels, confusion_counts, metrics_from_confusion, expected_calibration_error, label_names,
+    format_classification_report
 )
-from autogluon.multimodal import MultiModalPredictor
+from serving.calibration import apply_temperature, load_calibration
+from serving.image_io import decode_image
+from scripts.slice_report import predict_files_timed, slice_breakdown, rank_slices
+from serving.inference import load_predictor
+from serving.timm_predictor import MODEL_FILE as TIMM_MODEL_FILE, is_timm_model, weights_file
+from serving.tta import predict_tta
 
 def validate_model_loading(model_path='models/autogluon_model'):
     """Validate that the saved model can be loaded correctly."""
@@ -19,7 +23,11 @@ def validate_model_loading(model_path='models/autogluon_model'):
         return False
     
     # Check required files
-    required_files = ['df_preprocessor.pkl', 'config.yaml', 'model.ckpt']
+    timm_format = is_timm_model(model_path)
+    if timm_format:
+        required_files = [TIMM_MODEL_FILE, weights_file(model_path)]
+    else:
+        required_files = ['df_preprocessor.pkl', 'config.yaml', 'model.ckpt']
     missing_files = []
     
     for file in required_files:
@@ -32,16 +40,19 @@ def validate_model_loading(model_path='models/autogluon_model'):
         return False
     
     # Load and validate configuration
-    config_path = os.path.join(model_path, 'config.yaml')
+    config_path = os.path.join(model_path, TIMM_MODEL_FILE if timm_format else 'config.yaml')
     try:
         with open(config_path, 'r') as f:
             config = yaml.safe_load(f)
         
-        model_arch = config.get('model', {}).get('timm_image', {}).get('checkpoint_name', 'unknown')
+        if timm_format:
+            model_arch = config.get('checkpoint_name', 'unknown')
+        else:
+            model_arch = config.get('model', {}).get('timm_image', {}).get('checkpoint_name', 'unknown')
         print(f"Model architecture: {model_arch}")
         
         # Check model size
-        model_ckpt = os.path.join(model_path, 'model.ckpt')
+        model_ckpt = os.path.join(model_path, weights_file(model_path) if timm_format else 'model.ckpt')
         size_mb = os.path.getsize(model_ckpt) / (1024 * 1024)
         print(f"Model checkpoint size: {size_mb:.1f} MB")
         
@@ -52,7 +63,7 @@ def validate_model_loading(model_path='models/autogluon_model'):
     # Try loading the model
     try:
         print("Attempting to load model...")
-        predictor = MultiModalPredictor.load(model_path)
+        predictor = load_predictor(model_path)
         print("SUCCESS: Model loaded successfully!")
         
         # Check model attributes
@@ -68,8 +79,20 @@ def validate_model_loading(model_path='models/autogluon_model'):
         print(f"ERROR: Failed to load model: {e}")
         return False
 
-def evaluate_model(test_df, model_path=None):
-    """Load model and evaluate performance on test set."""
+def evaluate_model(test_df, model_path=None, tta_options=None, decode_options=None):
+    """Load model and evaluate performance on test set.
+
+    Images go through the same decode path as the app (`decode_options`).
+    Per-image latency and input characteristics are kept under "per_image"
+    and broken down per breed, resolution bucket and format under "slices".
+    Metrics use the calibrated probabilities the app serves; "ece" is their
+    expected calibration error and "ece_uncalibrated" the raw model's.
+    If `tta_options` has "evaluate" set, the test set is also scored with
+    test-time augmentation and the results are stored under the "tta" key
+    for `final_model_assessment`.
+    """
+    if decode_options is None:
+        decode_options = {'target_size': 224, 'max_pixels': 40_000_000, 'batch_size': 32}
     if model_path is None:
         BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
         model_path = os.path.join(BASE_DIR, 'models', 'autogluon_model')
@@ -78,54 +101,118 @@ def evaluate_model(test_df, model_path=None):
     if not validate_model_loading(model_path):
         raise ValueError("Model validation failed")
 
-    predictor = MultiModalPredictor.load(model_path)
+    predictor = load_predictor(model_path, calibrate=False)
+    calibration = load_calibration(model_path)
 
     start_time = time.time()
-    predictions = predictor.predict(test_df)
+    probabilities, per_image = predict_files_timed(predictor, test_df['image'], decode_options['batch_size'],
+                                                   decode_options['target_size'], decode_options['max_pixels'])
+    raw_probabilities = probabilities
+    if calibration is not None:
+        probabilities = apply_temperature(probabilities, calibration['temperature'])
+    predictions = probabilities.columns[np.argmax(probabilities.to_numpy(), axis=1)].to_numpy()
     inference_time = time.time() - start_time
+    per_image['label'] = test_df['label'].to_numpy()
+    per_image['prediction'] = predictions
+    per_image['correct'] = predictions == per_image['label'].to_numpy()
 
-    accuracy = accuracy_score(test_df['label'], predictions)
-    precision = precision_score(test_df['label'], predictions, average='weighted')
-    recall = recall_score(test_df['label'], predictions, average='weighted')
-    f1 = f1_score(test_df['label'], predictions, average='weighted')
+    true_idx, pred_idx, classes = encode_labels(test_df['label'].to_numpy(), predictions, predictor.class_labels)
+    cm = confusion_counts(true_idx, pred_idx, len(classes))
 
-    return {
-        'accuracy': accuracy,
-        'precision': precision,
-        'recall': recall,
-        'f1_score': f1,
+    performance_metrics = metrics_from_confusion(cm)
+    performance_metrics.update({
         'inference_time': inference_time,
         'avg_inference_time': inference_time / len(test_df),
         'predictions': predictions,
         'true_labels': test_df['label'].values,
-        'class_labels': predictor.class_labels
+        'class_labels': predictor.class_labels,
+        'classes': classes,
+        'confusion_matrix': cm,
+        'per_image': per_image,
+        'slices': slice_breakdown(per_image),
+        'ece': expected_calibration_error(probabilities.to_numpy(), test_df['label'].to_numpy(), probabilities.columns)
+    })
+    if calibration is not None:
+        performance_metrics['ece_uncalibrated'] = expected_calibration_error(
+            raw_probabilities.to_numpy(), test_df['label'].to_numpy(), raw_probabilities.columns)
+
+    if tta_options and tta_options.get("evaluate"):
+        performance_metrics['tta'] = evaluate_tta(predictor, test_df, tta_options, decode_options)
+
+    return performance_metrics
+
+
+def evaluate_tta(predictor, test_df, tta_options, decode_options):
+    """Score the test set with test-time augmentation, one batch of images per forward pass."""
+    print(f"Evaluating with TTA ({2 + tta_options['num_crops']} views per image)...")
+    batch_size = decode_options['batch_size']
+    predictions = []
+    start_time = time.time()
+    for batch_start in range(0, len(test_df), batch_size):
+        batch_paths = test_df['image'].iloc[batch_start:batch_start + batch_size]
+        images = [decode_image(image_path, decode_options['target_size'], decode_options['max_pixels'])
+                  for image_path in batch_paths]
+        probabilities = predict_tta(predictor, images, tta_options['crop_scale'], tta_options['num_crops'])
+        predictions.extend(probabilities.columns[np.argmax(probabilities.to_numpy(), axis=1)])
+    inference_time = time.time() - start_time
+
+    true_idx, pred_idx, classes = encode_labels(test_df['label'].to_numpy(), np.asarray(predictions),
+                                                predictor.class_labels)
+    metrics = metrics_from_confusion(confusion_counts(true_idx, pred_idx, len(classes)))
+    return {
+        'accuracy': metrics['accuracy'],
+        'f1_score': metrics['f1_score'],
+        'inference_time': inference_time,
+        'avg_inference_time': inference_time / len(test_df),
+        'num_views': 2 + tta_options['num_crops']
     }
 
 
-def generate_confusion_matrix(performance_metrics, save_path='outputs/confusion_matrix.png'):
-    """Generate and save confusion matrix."""
-    true = performance_metrics['true_labels']
-    pred = performance_metrics['predictions']
-    cm = confusion_matrix(true, pred)
+def generate_confusion_matrix(performance_metrics, save_path='outputs/confusion_matrix.png',
+                              annotate_max_classes=40, dpi=120):
+    """Render the precomputed confusion matrix.
 
-    plt.figure(figsize=(12, 10))
-    sns.heatmap(cm, annot=True, fmt='d', cmap='Blues')
-    plt.title('Confusion Matrix - Pet Breed Classification')
-    plt.xlabel('Predicted Label')
-    plt.ylabel('True Label')
-    plt.tight_layout()
+    Cell annotations are only drawn up to `annotate_max_classes` classes and
+    the figure and font sizes scale with the class count, so large label
+    sets render in about the same time as small ones.
+    """
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    cm = performance_metrics['confusion_matrix']
+    num_classes = len(cm)
+    side = min(max(6, num_classes * 0.3), 30)
+
+    fig, ax = plt.subplots(figsize=(side * 1.2, side))
+    image = ax.imshow(cm, cmap='Blues', interpolation='nearest')
+    fig.colorbar(image, ax=ax)
+    if num_classes <= annotate_max_classes:
+        font_size = max(4, min(10, 200 / num_classes))
+        threshold = cm.max() / 2
+        rows, cols = np.nonzero(cm)
+        for row, col in zip(rows, cols):
+            ax.text(col, row, cm[row, col], ha='center', va='center', fontsize=font_size,
+                    color='white' if cm[row, col] > threshold else 'black')
+    tick_step = max(1, num_classes // 50)
+    ticks = np.arange(0, num_classes, tick_step)
+    ax.set_xticks(ticks)
+    ax.set_yticks(ticks)
+    ax.set_xticklabels(performance_metrics['classes'][ticks], rotation=90)
+    ax.set_yticklabels(performance_metrics['classes'][ticks])
+    ax.set_title('Confusion Matrix - Pet Breed Classification')
+    ax.set_xlabel('Predicted Label')
+    ax.set_ylabel('True Label')
+    fig.tight_layout()
 
     os.makedirs(os.path.dirname(save_path), exist_ok=True)
-    plt.savefig(save_path, dpi=300, bbox_inches='tight')
-    plt.close()
+    fig.savefig(save_path, dpi=dpi)
+    plt.close(fig)
 
     return save_path
 
 
 def generate_classification_report(performance_metrics, save_path='outputs/classification_report.txt', label_map_path="data/metadata/label_map.pkl"):
-    true = performance_metrics['true_labels']
-    pred = performance_metrics['predictions']
-
     if os.path.exists(label_map_path):
         with open(label_map_path, "rb") as f:
             label_map = pickle.load(f)
@@ -133,15 +220,8 @@ def generate_classification_report(performance_metrics, save_path='outputs/class
         print("[WARNING] Label map not found, using numeric labels")
         label_map = {}
 
-    true_names = [label_map.get(int(i), str(i)) for i in true]
-    pred_names = [label_map.get(int(i), str(i)) for i in pred]
-
-    if label_map:
-        categories = [label_map[k] for k in sorted(label_map.keys())]
-    else:
-        categories = list(map(str, sorted(set(true))))
-
-    report = classification_report(true_names, pred_names, target_names=categories, digits=3)
+    report = format_classification_report(performance_metrics,
+                                          label_names(performance_metrics['classes'], label_map))
 
     os.makedirs(os.path.dirname(save_path), exist_ok=True)
     try:
@@ -203,13 +283,39 @@ def final_model_assessment(performance_metrics, save_path='outputs/final_assessm
             f.write(f"Recall (weighted):    {recall:.4f}\n")
             f.write(f"F1 Score (weighted):  {f1:.4f}\n")
             f.write(f"Avg Inference Time:   {avg_inference_time:.4f} seconds\n")
+            if 'ece' in performance_metrics:
+                f.write(f"Calibration (ECE):    {performance_metrics['ece']:.4f}")
+                if 'ece_uncalibrated' in performance_metrics:
+                    f.write(f" (uncalibrated {performance_metrics['ece_uncalibrated']:.4f})")
+                f.write("\n")
+
+            if 'tta' in performance_metrics:
+                tta = performance_metrics['tta']
+                f.write(f"\nTEST-TIME AUGMENTATION ({tta['num_views']} views)\n")
+                f.write("-" * 25 + "\n")
+                f.write(f"TTA Accuracy:         {tta['accuracy']:.4f} ({(tta['accuracy'] - accuracy) * 100:+.2f} pp)\n")
+                f.write(f"TTA F1 Score:         {tta['f1_score']:.4f}\n")
+                f.write(f"TTA Avg Inference:    {tta['avg_inference_time']:.4f} seconds "
+                        f"({tta['avg_inference_time'] / avg_inference_time:.1f}x)\n")
+
+            if 'slices' in performance_metrics:
+                ranked = rank_slices(performance_metrics['slices'], top=3)
+                f.write("\nWORST SLICES (see slice_report.txt)\n")
+                f.write("-" * 25 + "\n")
+                for _, row in ranked['slowest'].iterrows():
+                    f.write(f"Slow:     {row['dimension']}={row['value']} p95 {row['p95_latency']:.4f}s (n={int(row['count'])})\n")
+                for _, row in ranked['least_accurate'].iterrows():
+                    f.write(f"Accuracy: {row['dimension']}={row['value']} {row['accuracy']:.4f} (n={int(row['count'])})\n")
     except Exception as e:
         print(f"[ERROR] Could not save final assessment: {e}")
 
-    return {
+    assessment = {
         'accuracy': accuracy,
         'precision': precision,
         'recall': recall,
         'f1_score': f1,
         'avg_inference_time': avg_inference_time
-    }
\ No newline at end of file
+    }
+    if 'tta' in performance_metrics:
+        assessment['tta'] = performance_metrics['tta']
+    return assessment
\ No newline at end of file
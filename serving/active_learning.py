@@ -0,0 +1,170 @@
+import base64
+import fcntl
+import glob
+import hashlib
+import io
+import json
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+from PIL import Image
+
+ACTIVE_FILE = 'predictions.jsonl'
+
+
+def perceptual_hash(image, hash_size=8, highfreq_factor=4):
+    """64-bit DCT perceptual hash (pHash) of a PIL image, as a hex string.
+
+    The image is reduced to 32x32 grayscale, transformed with a 2-D DCT and
+    the lowest 8x8 frequencies are thresholded at their median, so
+    re-encoded, resized or slightly edited copies get nearby hashes.
+    """
+    size = hash_size * highfreq_factor
+    pixels = np.asarray(image.convert('L').resize((size, size)), dtype=np.float64)
+    k = np.arange(size)
+    dct = np.cos(np.pi * (2 * k[None, :] + 1) * k[:, None] / (2 * size))
+    low = (dct @ pixels @ dct.T)[:hash_size, :hash_size]
+    bits = low.ravel() > np.median(low.ravel()[1:])  # median without the DC term
+    return np.packbits(bits).tobytes().hex()
+
+
+def uncertainty(scores):
+    """(confidence, margin between the top two classes, entropy normalised to [0, 1]) of one probability row."""
+    scores = np.asarray(scores, dtype=np.float64)
+    top_two = np.sort(scores)[-2:]
+    entropy = -np.sum(scores * np.log(np.clip(scores, 1e-12, None)))
+    return float(top_two[-1]), float(top_two[-1] - top_two[0]), float(entropy / np.log(max(len(scores), 2)))
+
+
+class ActiveLearningLog:
+    """Append-only log of uncertain production predictions for later labelling.
+
+    `maybe_log` only decides whether a prediction is uncertain (confidence
+    below `confidence_threshold` or normalised entropy above
+    `entropy_threshold`) and hands it to a queue; hashing, encoding and file
+    writes happen on a background thread that writes in batches every
+    `flush_interval` seconds. When the queue is full, records are dropped
+    rather than slowing down requests. The active file is rotated once it
+    exceeds `max_file_bytes`, and only the newest `max_files` rotated files
+    are kept.
+
+    The original upload bytes are logged when the caller passes them, so
+    labelled images go back into training at full resolution; otherwise
+    the decoded, model-sized image is stored as a JPEG.
+    """
+
+    def __init__(self, log_dir, confidence_threshold=0.6, entropy_threshold=0.5, top_k=3,
+                 max_file_bytes=50 * 1024 ** 2, max_files=10, flush_interval=2.0, max_pending=256):
+        self.log_dir = log_dir
+        self.confidence_threshold = confidence_threshold
+        self.entropy_threshold = entropy_threshold
+        self.top_k = top_k
+        self.max_file_bytes = max_file_bytes
+        self.max_files = max_files
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._lock = threading.Lock()
+        self.seen = 0
+        self.queued = 0
+        self.dropped = 0
+        self.written = 0
+        os.makedirs(log_dir, exist_ok=True)
+        threading.Thread(target=self._write_loop, daemon=True, name="active-learning").start()
+
+    def maybe_log(self, image, probabilities, latency, source='interactive', image_bytes=None):
+        """Queue this prediction if it is uncertain. `probabilities` is one row (Series) of class scores.
+
+        `image_bytes` is the uploaded file `image` was decoded from, if still available.
+        """
+        scores = probabilities.to_numpy()
+        confidence, margin, entropy = uncertainty(scores)
+        with self._lock:
+            self.seen += 1
+        if confidence >= self.confidence_threshold and entropy <= self.entropy_threshold:
+            return False
+        top = np.argsort(-scores)[:self.top_k]
+        labels = probabilities.index[top]
+        record = {
+            'timestamp': time.time(),
+            'source': source,
+            'top_k': [[label.item() if hasattr(label, 'item') else label, float(scores[i])]
+                      for label, i in zip(labels, top)],
+            'confidence': confidence,
+            'margin': margin,
+            'entropy': entropy,
+            'latency': latency
+        }
+        try:
+            self._queue.put_nowait((image, image_bytes, record))
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            return False
+        with self._lock:
+            self.queued += 1
+        return True
+
+    def _write_loop(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while time.monotonic() < deadline:
+                try:
+                    batch.append(self._queue.get(timeout=max(0.0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            try:
+                self._write_batch(batch)
+            except Exception as e:
+                print(f"[WARNING] Active-learning log write failed: {e}")
+
+    def _write_batch(self, batch):
+        lines = []
+        for image, image_bytes, record in batch:
+            record['image_hash'] = hashlib.sha1(image.tobytes()).hexdigest()
+            record['phash'] = perceptual_hash(image)
+            if image_bytes is not None:
+                with Image.open(io.BytesIO(image_bytes)) as original:
+                    record['image_format'] = original.format
+                record['image_original'] = base64.b64encode(image_bytes).decode('ascii')
+            else:
+                buffer = io.BytesIO()
+                image.convert('RGB').save(buffer, format='JPEG', quality=90)
+                record['image_jpeg'] = base64.b64encode(buffer.getvalue()).decode('ascii')
+            lines.append(json.dumps(record) + '\n')
+        active_path = os.path.join(self.log_dir, ACTIVE_FILE)
+        with open(active_path, 'a') as f:
+            # Replicas share the log directory; the lock keeps their batches from interleaving
+            fcntl.flock(f, fcntl.LOCK_EX)
+            f.writelines(lines)
+            f.flush()
+            fcntl.flock(f, fcntl.LOCK_UN)
+        with self._lock:
+            self.written += len(lines)
+        if os.path.getsize(active_path) >= self.max_file_bytes:
+            self._rotate(active_path)
+
+    def _rotate(self, active_path):
+        rotated_path = os.path.join(self.log_dir, f"predictions-{time.strftime('%Y%m%d-%H%M%S')}-"
+                                                  f"{time.time_ns() % 1_000_000:06d}.jsonl")
+        try:
+            os.replace(active_path, rotated_path)
+            for old_path in sorted(glob.glob(os.path.join(self.log_dir, 'predictions-*.jsonl')))[:-self.max_files]:
+                os.remove(old_path)
+        except FileNotFoundError:
+            pass  # another replica rotated it first
+
+    def stats(self):
+        with self._lock:
+            return {'seen': self.seen, 'queued': self.queued, 'dropped': self.dropped, 'written': self.written,
+                    'pending': self._queue.qsize()}
+
+
+def log_files(log_dir):
+    """Rotated log files oldest first, then the active one."""
+    rotated = sorted(glob.glob(os.path.join(log_dir, 'predictions-*.jsonl')))
+    active = os.path.join(log_dir, ACTIVE_FILE)
+    return rotated + ([active] if os.path.exists(active) else [])
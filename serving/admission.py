@@ -0,0 +1,111 @@
+import heapq
+import itertools
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+import numpy as np
+
+INTERACTIVE = 0
+BULK = 1
+PRIORITY_NAMES = {INTERACTIVE: 'interactive', BULK: 'bulk'}
+
+
+class Rejected(Exception):
+    """A request was shed: queue full, evicted by a more important request, or past its deadline."""
+
+
+class AdmissionController:
+    """Bounded, prioritised queue in front of the model.
+
+    At most `max_queue` requests wait; `concurrency` dispatcher threads run
+    them, interactive before bulk and FIFO within a class. When the queue is
+    full a new request evicts the newest waiting request of a lower class,
+    or is rejected immediately. Requests still queued past their deadline
+    are dropped without running. Work is called as `work(degraded)`, with
+    `degraded` True once `degrade_depth` or more requests are waiting, so
+    the caller can skip optional passes (TTA) or use a smaller model.
+    """
+
+    def __init__(self, max_queue=16, concurrency=1, degrade_depth=4, history=1000):
+        self.max_queue = max_queue
+        self.degrade_depth = degrade_depth
+        self._heap = []
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._waits = deque(maxlen=history)
+        self._counts = {name: dict.fromkeys(
+            ['admitted', 'completed', 'degraded', 'rejected', 'evicted', 'expired', 'failed'], 0)
+            for name in PRIORITY_NAMES.values()}
+        self.max_depth = 0
+        for i in range(concurrency):
+            threading.Thread(target=self._dispatch, daemon=True, name=f"admission-{i}").start()
+
+    def _count(self, priority, key):
+        self._counts[PRIORITY_NAMES[priority]][key] += 1
+
+    def submit(self, work, priority=INTERACTIVE, deadline=10.0):
+        """Queue `work` and return a Future; it fails with `Rejected` if the request is shed."""
+        future = Future()
+        now = time.monotonic()
+        with self._condition:
+            if len(self._heap) >= self.max_queue:
+                lower = [entry for entry in self._heap if entry[0] > priority]
+                if not lower:
+                    self._count(priority, 'rejected')
+                    future.set_exception(Rejected("Server is busy, please try again in a moment"))
+                    return future
+                victim = max(lower, key=lambda entry: (entry[0], entry[1]))
+                self._heap.remove(victim)
+                heapq.heapify(self._heap)
+                self._count(victim[0], 'evicted')
+                victim[4].set_exception(Rejected("Shed to make room for interactive requests"))
+            heapq.heappush(self._heap, (priority, next(self._sequence), now + deadline, now, future, work))
+            self._count(priority, 'admitted')
+            self.max_depth = max(self.max_depth, len(self._heap))
+            self._condition.notify()
+        return future
+
+    def call(self, work, priority=INTERACTIVE, deadline=10.0):
+        """Submit and wait for the result. Raises `Rejected` when shed."""
+        return self.submit(work, priority, deadline).result()
+
+    def _dispatch(self):
+        while True:
+            with self._condition:
+                while not self._heap:
+                    self._condition.wait()
+                priority, _, deadline_at, queued_at, future, work = heapq.heappop(self._heap)
+                depth = len(self._heap)
+                now = time.monotonic()
+                self._waits.append(now - queued_at)
+                if now > deadline_at:
+                    self._count(priority, 'expired')
+                    future.set_exception(Rejected("Request timed out while waiting in the queue"))
+                    continue
+                degraded = depth >= self.degrade_depth
+                if degraded:
+                    self._count(priority, 'degraded')
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(work(degraded))
+                outcome = 'completed'
+            except Exception as e:
+                future.set_exception(e)
+                outcome = 'failed'
+            with self._condition:
+                self._count(priority, outcome)
+
+    def stats(self):
+        """Queue depth, shed counts per priority class and queue-wait percentiles."""
+        with self._condition:
+            waits = np.array(self._waits) if self._waits else np.zeros(1)
+            return {
+                'depth': len(self._heap),
+                'max_depth': self.max_depth,
+                'wait_p50': float(np.percentile(waits, 50)),
+                'wait_p95': float(np.percentile(waits, 95)),
+                'by_priority': {name: dict(counts) for name, counts in self._counts.items()}
+            }
@@ -0,0 +1,122 @@
+import io
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+from PIL import UnidentifiedImageError
+
+from serving.admission import BULK, Rejected
+from serving.image_io import decode_image
+from serving.inference import predict_images
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+
+
+def expand_uploads(uploaded_files, max_files, max_bytes):
+    """Flatten uploaded images and zip archives into (name, file object, error) entries.
+
+    Zip members are size-checked from the archive directory before they are
+    extracted, so an archive cannot expand into arbitrarily large images.
+    """
+    entries = []
+    for uploaded_file in uploaded_files:
+        if uploaded_file.name.lower().endswith('.zip'):
+            try:
+                with zipfile.ZipFile(uploaded_file) as archive:
+                    for member in archive.infolist():
+                        if member.is_dir() or not member.filename.lower().endswith(IMAGE_EXTENSIONS):
+                            continue
+                        name = f"{uploaded_file.name}/{member.filename}"
+                        if member.file_size > max_bytes:
+                            entries.append((name, None, "File too large"))
+                        else:
+                            entries.append((name, io.BytesIO(archive.read(member)), None))
+                        if len(entries) >= max_files:
+                            break
+            except zipfile.BadZipFile as e:
+                entries.append((uploaded_file.name, None, f"Invalid zip archive: {e}"))
+        elif uploaded_file.size > max_bytes:
+            entries.append((uploaded_file.name, None, "File too large"))
+        else:
+            entries.append((uploaded_file.name, uploaded_file, None))
+        if len(entries) >= max_files:
+            break
+    return entries[:max_files]
+
+
+def decode_entries(entries, target_size, max_pixels, max_workers=4, keep_bytes=False):
+    """Decode entries in parallel into (name, image, error, original bytes) tuples.
+
+    PIL releases the GIL while decoding. The original file bytes are only
+    kept with `keep_bytes` (e.g. for the active-learning log); otherwise the
+    last element is None.
+    """
+    def decode(entry):
+        name, source, error = entry
+        if error is not None:
+            return name, None, error, None
+        try:
+            data = source.getvalue() if keep_bytes else None
+            return name, decode_image(source, target_size, max_pixels), None, data
+        except UnidentifiedImageError:
+            return name, None, "Not a valid image", None
+        except Exception as e:
+            return name, None, str(e), None
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(decode, entries))
+
+
+def classify_batch(predictor, decoded, label_map=None, batch_size=32, top_k=3, progress=None,
+                   admission=None, deadline=60.0, active_learning=None):
+    """Classify decoded images `batch_size` per forward pass and return a results table.
+
+    `progress`, if given, is called with the fraction of images done. With an
+    `AdmissionController`, each forward pass is queued as bulk work behind
+    interactive requests; chunks that get shed are reported as errors.
+    Uncertain predictions are handed to `active_learning`, if given, with
+    the original file bytes when `decode_entries` kept them.
+    """
+    rows = []
+    valid = [(name, image, data) for name, image, error, data in decoded if error is None]
+    for name, _, error, _ in decoded:
+        if error is not None:
+            rows.append({'file': name, 'prediction': None, 'confidence': None, 'top_k': None, 'error': error})
+
+    for batch_start in range(0, len(valid), batch_size):
+        batch = valid[batch_start:batch_start + batch_size]
+        images = [image for _, image, _ in batch]
+        start_time = time.time()
+        if admission is None:
+            probabilities = predict_images(predictor, images)
+        else:
+            try:
+                probabilities = admission.call(lambda degraded: predict_images(predictor, images), BULK, deadline)
+            except Rejected as e:
+                rows.extend({'file': name, 'prediction': None, 'confidence': None, 'top_k': None,
+                             'error': f"Shed under load: {e}"} for name, _, _ in batch)
+                if progress is not None:
+                    progress(min(1.0, (batch_start + len(batch)) / len(valid)))
+                continue
+        if active_learning is not None:
+            latency = (time.time() - start_time) / len(images)
+            for row, (_, image, data) in enumerate(batch):
+                active_learning.maybe_log(image, probabilities.iloc[row], latency, source='batch', image_bytes=data)
+        scores = probabilities.to_numpy()
+        top_indices = np.argsort(-scores, axis=1)[:, :top_k]
+        for (name, _, _), row_scores, indices in zip(batch, scores, top_indices):
+            names = [label_map.get(probabilities.columns[i], probabilities.columns[i]) if label_map
+                     else probabilities.columns[i] for i in indices]
+            rows.append({
+                'file': name,
+                'prediction': names[0],
+                'confidence': float(row_scores[indices[0]]),
+                'top_k': ", ".join(f"{n} ({row_scores[i]:.1%})" for n, i in zip(names, indices)),
+                'error': None
+            })
+        if progress is not None:
+            progress(min(1.0, (batch_start + len(batch)) / len(valid)))
+
+    return pd.DataFrame(rows, columns=['file', 'prediction', 'confidence', 'top_k', 'error'])
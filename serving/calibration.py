@@ -0,0 +1,79 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from serving.inference import predict_images
+from serving.tracing import span
+
+CALIBRATION_FILE = 'calibration.json'
+
+
+def load_calibration(model_path):
+    """Calibration parameters stored with a model, or None if it was never calibrated."""
+    calibration_path = os.path.join(model_path, CALIBRATION_FILE)
+    if not os.path.exists(calibration_path):
+        return None
+    with open(calibration_path) as f:
+        return json.load(f)
+
+
+def save_calibration(calibration, model_path):
+    """Write calibration next to the model weights, atomically so a loading app never sees half a file."""
+    calibration_path = os.path.join(model_path, CALIBRATION_FILE)
+    with open(calibration_path + '.tmp', 'w') as f:
+        json.dump(calibration, f, indent=2)
+    os.replace(calibration_path + '.tmp', calibration_path)
+    return calibration_path
+
+
+def apply_temperature(probabilities, temperature):
+    """Rescale class probabilities by a temperature (scalar, or one per class column).
+
+    Log-probabilities are the logits up to a per-row constant. Centring each
+    row removes that constant, giving the logits minus their row mean, so
+    dividing by a scalar temperature is exactly temperature scaling of the
+    logits, and dividing column j by T_j is per-class scaling of the centred
+    logits (the raw logits themselves are only known up to that constant).
+    Works on a DataFrame or a 2-D array.
+    """
+    values = probabilities.to_numpy(dtype=np.float64) if isinstance(probabilities, pd.DataFrame) else probabilities
+    logits = np.log(np.clip(values, 1e-12, None))
+    logits -= logits.mean(axis=1, keepdims=True)
+    scaled = logits / np.asarray(temperature, dtype=np.float64)
+    scaled = np.exp(scaled - scaled.max(axis=1, keepdims=True))
+    scaled /= scaled.sum(axis=1, keepdims=True)
+    if isinstance(probabilities, pd.DataFrame):
+        return pd.DataFrame(scaled, columns=probabilities.columns, index=probabilities.index)
+    return scaled
+
+
+class CalibratedPredictor:
+    """A predictor whose probabilities are temperature-scaled before they are returned.
+
+    Everything other than the probability methods is passed through to the
+    wrapped predictor.
+    """
+
+    def __init__(self, predictor, calibration):
+        self.predictor = predictor
+        self.calibration = calibration
+        self.temperature = np.asarray(calibration['temperature'], dtype=np.float64)
+
+    def __getattr__(self, name):
+        if name == 'predictor':  # not yet set, e.g. while unpickling
+            raise AttributeError(name)
+        return getattr(self.predictor, name)
+
+    def predict_proba_images(self, images):
+        probabilities = predict_images(self.predictor, images)
+        with span('postprocess', step='temperature'):
+            return apply_temperature(probabilities, self.temperature)
+
+    def predict_proba(self, data):
+        return apply_temperature(self.predictor.predict_proba(data), self.temperature)
+
+    def predict(self, data):
+        probabilities = self.predict_proba(data)
+        return probabilities.columns[np.argmax(probabilities.to_numpy(), axis=1)].to_numpy()
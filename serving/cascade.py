@@ -0,0 +1,92 @@
+import json
+import os
+import threading
+
+import numpy as np
+
+from serving.calibration import CalibratedPredictor
+from serving.inference import load_predictor, predict_images
+from serving.timm_predictor import TimmPredictor
+
+
+def load_fast_predictor(full, fast_model_path=None, fast_image_size=160):
+    """The cheap first stage of a cascade.
+
+    Either a separate (smaller) model from `fast_model_path`, or the full
+    model's own weights run at `fast_image_size`, which needs no extra
+    training but only works for timm-format predictors.
+    """
+    if fast_model_path is not None:
+        return load_predictor(fast_model_path)
+    base = full.predictor if isinstance(full, CalibratedPredictor) else full
+    if not isinstance(base, TimmPredictor):
+        raise ValueError("A reduced-resolution fast stage needs a timm-format model; set fast_model_path")
+    fast = TimmPredictor(base.model, base.class_labels, base.checkpoint_name, fast_image_size,
+                         base.mean.ravel(), base.std.ravel())
+    # Reuse the full model's calibration so confidences are comparable to the threshold
+    return CalibratedPredictor(fast, full.calibration) if isinstance(full, CalibratedPredictor) else fast
+
+
+def load_cascade_calibration(calibration_path):
+    """Threshold and settings written by `scripts/cascade.py`, or None if not calibrated."""
+    if not os.path.exists(calibration_path):
+        return None
+    with open(calibration_path) as f:
+        return json.load(f)
+
+
+def calibration_mismatch(calibration, model_path):
+    """Why the cascade threshold does not apply to the model at `model_path`, or None if it does.
+
+    The threshold is only valid for the full model it was swept against;
+    a retrained model has different confidences.
+    """
+    served = os.path.basename(os.path.realpath(model_path))
+    if calibration.get('model_version') != served:
+        return (f"cascade calibrated for model version {calibration.get('model_version')}, "
+                f"serving {served}; re-run the cascade calibration")
+    return None
+
+
+class CascadeCounts:
+    """Requests answered by the fast stage vs escalated, shared across sessions."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.images = 0
+        self.escalated = 0
+
+    def add(self, images, escalated):
+        with self._lock:
+            self.images += images
+            self.escalated += escalated
+
+    def stats(self):
+        with self._lock:
+            return {'images': self.images, 'escalated': self.escalated,
+                    'escalation_rate': self.escalated / self.images if self.images else 0.0}
+
+
+class CascadePredictor:
+    """Answer with the fast model and re-run only low-confidence images on the full model.
+
+    Images whose top fast-stage probability is below `threshold` get the
+    full model's probabilities instead; the rest keep the fast answer. Works
+    anywhere a predictor is passed to `predict_images`.
+    """
+
+    def __init__(self, fast, full, threshold, counts=None):
+        self.fast = fast
+        self.full = full
+        self.threshold = threshold
+        self.counts = counts if counts is not None else CascadeCounts()
+        self.class_labels = list(full.class_labels)
+
+    def predict_proba_images(self, images):
+        probabilities = predict_images(self.fast, images)[self.class_labels].reset_index(drop=True)
+        escalate = np.flatnonzero(probabilities.to_numpy().max(axis=1) < self.threshold)
+        if len(escalate):
+            full_probabilities = predict_images(self.full, [images[i] for i in escalate])[self.class_labels]
+            probabilities.iloc[escalate] = full_probabilities.to_numpy()
+        self.counts.add(len(images), len(escalate))
+        return probabilities
@@ -0,0 +1,98 @@
+import os
+import tempfile
+import threading
+import time
+
+import pandas as pd
+from PIL import Image
+
+from serving.registry import resolve_current
+
+
+def warmup_predictor(predictor, image_size=224):
+    """Run one throwaway prediction so lazy initialisation happens off the request path."""
+    dummy_image = Image.new('RGB', (image_size, image_size), color='red')
+    with tempfile.NamedTemporaryFile(suffix=".jpg", delete=False) as tmp:
+        dummy_image.save(tmp.name)
+    try:
+        predictor.predict_proba(pd.DataFrame({'image': [tmp.name], 'label': [0]}))
+    finally:
+        os.unlink(tmp.name)
+
+
+class HotSwapModel:
+    """Serve the model behind the registry "current" pointer and follow it.
+
+    A background thread polls the pointer. When it moves to a new version the
+    new predictor is loaded and warmed up off the request path and then
+    swapped in with a single reference assignment. Callers take the predictor
+    once per request via `get()`, so in-flight requests finish on whichever
+    version they started with. A replaced predictor that has a `close()`
+    method (e.g. a worker pool) is closed after `drain_timeout` seconds.
+    """
+
+    def __init__(self, model_path, loader, poll_interval=5.0, warmup=warmup_predictor, drain_timeout=30.0):
+        self.model_path = model_path
+        self.loader = loader
+        self.poll_interval = poll_interval
+        self.warmup = warmup
+        self.drain_timeout = drain_timeout
+        self.version = None
+        self._predictor = None
+        self._failed_version = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Load the current version synchronously, then start watching the pointer."""
+        version = resolve_current(self.model_path)
+        if version is None:
+            raise FileNotFoundError(f"Model path does not exist: {self.model_path}")
+        self._swap_to(version)
+        if self.poll_interval and self._thread is None:
+            self._thread = threading.Thread(target=self._watch, name="model-hot-swap", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def get(self):
+        return self._predictor
+
+    def current(self):
+        """The predictor and the version directory it was loaded from, read together."""
+        with self._lock:
+            return self._predictor, self.version
+
+    def _swap_to(self, version):
+        # Load from the resolved version directory, not the pointer, so a later
+        # publish cannot change files underneath an already loaded predictor.
+        start_time = time.time()
+        predictor = self.loader(version)
+        if self.warmup is not None:
+            self.warmup(predictor)
+        with self._lock:
+            previous = self._predictor
+            self._predictor = predictor
+            self.version = version
+        if previous is not None and hasattr(previous, 'close'):
+            timer = threading.Timer(self.drain_timeout, previous.close)
+            timer.daemon = True
+            timer.start()
+        print(f"Serving model version {os.path.basename(version)} "
+              f"(loaded and warmed up in {time.time() - start_time:.1f}s)")
+
+    def _watch(self):
+        while not self._stop.wait(self.poll_interval):
+            version = resolve_current(self.model_path)
+            if version is None or version in (self.version, self._failed_version):
+                continue
+            try:
+                self._swap_to(version)
+                self._failed_version = None
+            except Exception as e:
+                # Keep serving the old version; retry only once the pointer moves again.
+                self._failed_version = version
+                print(f"[ERROR] Failed to load model version {version}: {e}")
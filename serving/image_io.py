@@ -0,0 +1,41 @@
+import math
+
+from PIL import Image, ImageOps
+
+from serving.tracing import span
+
+TARGET_SIZE = 224
+MAX_PIXELS = 40_000_000
+
+
+def decode_image(source, target_size=TARGET_SIZE, max_pixels=MAX_PIXELS):
+    """Decode an image file straight to the model's input scale.
+
+    The pixel count is checked from the header before anything is decoded.
+    JPEGs are decoded with DCT-domain downscaling (`draft`), so a 12 MP photo
+    is decoded at 1/2, 1/4 or 1/8 scale instead of full resolution. EXIF
+    orientation is applied, and a single resize then brings the shorter side
+    to `target_size`, matching the model's resize-shorter-side transform.
+    """
+    with span('decode'):
+        image = Image.open(source)
+        width, height = image.size
+        if width * height > max_pixels:
+            image.close()
+            raise ValueError(f"Image too large: {width}x{height} exceeds {max_pixels} pixels")
+
+        scale = target_size / min(width, height)
+        if image.format == 'JPEG' and scale < 1:
+            # draft() picks the smallest DCT scale that still covers the requested size
+            image.draft('RGB', (math.ceil(width * scale), math.ceil(height * scale)))
+
+        image = ImageOps.exif_transpose(image)
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+
+        width, height = image.size
+        scale = target_size / min(width, height)
+        new_size = (max(1, round(width * scale)), max(1, round(height * scale)))
+        if new_size != image.size:
+            image = image.resize(new_size, Image.Resampling.LANCZOS, reducing_gap=3.0)
+        return image
@@ -0,0 +1,79 @@
+import os
+import tempfile
+
+import pandas as pd
+
+from serving.image_io import MAX_PIXELS, TARGET_SIZE, decode_image
+from serving.timm_predictor import TimmPredictor, is_timm_model
+from serving.tracing import span
+
+
+def load_predictor(model_path, verify_weights='lazy', calibrate=True):
+    """Load either one of our timm models or an AutoGluon predictor from `model_path`.
+
+    `verify_weights` controls checksum verification of packed timm weights.
+    If the model has a calibration.json and `calibrate` is set, its
+    probabilities are temperature-scaled (see serving/calibration.py).
+    """
+    if is_timm_model(model_path):
+        predictor = TimmPredictor.load(model_path, verify_weights)
+    else:
+        from autogluon.multimodal import MultiModalPredictor
+        predictor = MultiModalPredictor.load(model_path)
+    if calibrate:
+        from serving.calibration import CalibratedPredictor, load_calibration
+        calibration = load_calibration(model_path)
+        if calibration is not None:
+            return CalibratedPredictor(predictor, calibration)
+    return predictor
+
+
+def predict_images(predictor, images):
+    """Classify PIL images in a single batched forward pass.
+
+    Returns the class-probability DataFrame (one row per image, one column
+    per class label). Predictions are taken as the arg-max of these
+    probabilities, so callers never need a separate `predict` call.
+    Predictors that accept images directly skip the temporary files.
+    """
+    with span('predict', images=len(images)):
+        if hasattr(predictor, 'predict_proba_images'):
+            return predictor.predict_proba_images(images)
+        image_paths = []
+        try:
+            with span('preprocess', images=len(images)):
+                for image in images:
+                    with tempfile.NamedTemporaryFile(suffix=".jpg", delete=False) as tmp:
+                        image.save(tmp.name)
+                        image_paths.append(tmp.name)
+                batch_df = pd.DataFrame({'image': image_paths, 'label': [0] * len(image_paths)})
+            with span('forward', images=len(images)):
+                probabilities = predictor.predict_proba(batch_df)
+        finally:
+            for image_path in image_paths:
+                os.unlink(image_path)
+        return probabilities.reset_index(drop=True)
+
+
+def top_prediction(probabilities, row=0, label_map=None):
+    """Return (class label, display name, confidence) for one row of `predict_images` output."""
+    scores = probabilities.iloc[row]
+    predicted_class = scores.idxmax()
+    confidence = float(scores.max())
+    display_class = label_map.get(predicted_class, predicted_class) if label_map else predicted_class
+    return predicted_class, display_class, confidence
+
+
+def predict_files(predictor, image_paths, batch_size=32, target_size=TARGET_SIZE, max_pixels=MAX_PIXELS):
+    """Decode image files with `decode_image` and classify them `batch_size` at a time.
+
+    Uses the same decode and prediction path as the app, so evaluation and
+    benchmarks measure what serving actually does.
+    """
+    image_paths = list(image_paths)
+    batches = []
+    for batch_start in range(0, len(image_paths), batch_size):
+        images = [decode_image(image_path, target_size, max_pixels)
+                  for image_path in image_paths[batch_start:batch_start + batch_size]]
+        batches.append(predict_images(predictor, images))
+    return pd.concat(batches, ignore_index=True)
@@ -0,0 +1,398 @@
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+
+MANIFEST_FILE = 'manifest.json'
+REFS_DIR = 'refs'
+CHUNK_SIZE = 8 * 1024 ** 2
+
+
+def file_sha256(path, block_size=1024 ** 2):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def build_manifest(model_dir, name, version):
+    """Manifest of a model bundle: every file under `model_dir` with its size and sha256."""
+    files = []
+    for dirpath, _, filenames in os.walk(model_dir):
+        for filename in sorted(filenames):
+            path = os.path.join(dirpath, filename)
+            files.append({
+                'path': os.path.relpath(path, model_dir).replace(os.sep, '/'),
+                'size': os.path.getsize(path),
+                'sha256': file_sha256(path)
+            })
+    return {'name': name, 'version': version, 'created': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'files': sorted(files, key=lambda entry: entry['path'])}
+
+
+# --- Remote access: http(s):// and file:// URLs, or a plain directory path ---
+
+def remote_join(remote_url, *parts):
+    if urllib.parse.urlparse(remote_url).scheme in ('http', 'https', 'file'):
+        return '/'.join([remote_url.rstrip('/')] + [urllib.parse.quote(part) for part in parts])
+    return os.path.join(remote_url, *parts)
+
+
+def _local_path(url):
+    """Filesystem path of a file:// URL or plain path; None for HTTP."""
+    parsed = urllib.parse.urlparse(url)
+    if parsed.scheme == 'file':
+        return urllib.request.url2pathname(parsed.path)
+    if parsed.scheme in ('http', 'https'):
+        return None
+    return url
+
+
+def _open(url, timeout, headers=None):
+    request = urllib.request.Request(url, headers=headers or {})
+    token = os.environ.get('MODEL_REMOTE_TOKEN')
+    if token:
+        request.add_header('Authorization', f"Bearer {token}")
+    return urllib.request.urlopen(request, timeout=timeout)
+
+
+def _read(url, timeout):
+    path = _local_path(url)
+    if path is not None:
+        with open(path, 'rb') as f:
+            return f.read()
+    with _open(url, timeout) as response:
+        return response.read()
+
+
+def _read_range(url, start, length, timeout):
+    path = _local_path(url)
+    if path is not None:
+        with open(path, 'rb') as f:
+            f.seek(start)
+            return f.read(length)
+    with _open(url, timeout, {'Range': f"bytes={start}-{start + length - 1}"}) as response:
+        if response.status == 206 or (start == 0 and response.length == length):
+            return response.read()  # a server without Range support is fine when the chunk is the whole file
+        raise OSError(f"Server ignored the Range request for {url}")
+
+
+def _supports_ranges(url, timeout):
+    if _local_path(url) is not None:
+        return True
+    with _open(url, timeout, {'Range': 'bytes=0-0'}) as response:
+        return response.status == 206
+
+
+def resolve_version(remote_url, name, ref, timeout=30):
+    """Version a ref (e.g. "latest") points to on the remote; a ref with no ref file is taken as a version."""
+    try:
+        return _read(remote_join(remote_url, name, REFS_DIR, ref), timeout).decode().strip()
+    except (FileNotFoundError, urllib.error.HTTPError) as e:
+        if isinstance(e, urllib.error.HTTPError) and e.code != 404:
+            raise
+        return ref
+
+
+# --- Resumable, chunked downloads into the blob store ---
+
+class PartialDownload:
+    """A blob being downloaded in fixed-size chunks, resumable after a crash.
+
+    Chunks are written in place into a preallocated `<blob>.incomplete`
+    file; each finished chunk index is appended to `<blob>.incomplete.progress`,
+    so a restarted fetch only requests the chunks that are missing.
+    """
+
+    def __init__(self, blob_path, size, chunk_size):
+        self.path = blob_path + '.incomplete'
+        self.progress_path = self.path + '.progress'
+        self.size = size
+        self.chunk_size = chunk_size
+        self.done = self._load_progress()
+        self.resumed = bool(self.done)
+        if not self.done:
+            with open(self.path, 'wb') as f:
+                f.truncate(size)
+            with open(self.progress_path, 'w') as f:
+                f.write(json.dumps({'size': size, 'chunk_size': chunk_size}) + '\n')
+        self._fd = os.open(self.path, os.O_WRONLY)
+        self._lock = threading.Lock()
+
+    def _load_progress(self):
+        if not (os.path.exists(self.path) and os.path.exists(self.progress_path)):
+            return set()
+        with open(self.progress_path) as f:
+            lines = f.read().splitlines()
+        try:
+            header = json.loads(lines[0])
+        except (IndexError, json.JSONDecodeError):
+            return set()
+        if header != {'size': self.size, 'chunk_size': self.chunk_size}:
+            return set()
+        return {int(line) for line in lines[1:] if line.isdigit()}
+
+    def pending_chunks(self):
+        """(index, offset, length) of every chunk still to download."""
+        count = -(-self.size // self.chunk_size)
+        return [(index, index * self.chunk_size, min(self.chunk_size, self.size - index * self.chunk_size))
+                for index in range(count) if index not in self.done]
+
+    def write(self, index, offset, data):
+        os.pwrite(self._fd, data, offset)
+        with self._lock:
+            self.done.add(index)
+            with open(self.progress_path, 'a') as f:
+                f.write(f"{index}\n")
+
+    def write_stream(self, response, block_size=1024 ** 2):
+        """Whole-file fallback for servers without Range support (not resumable)."""
+        offset = 0
+        for block in iter(lambda: response.read(block_size), b''):
+            os.pwrite(self._fd, block, offset)
+            offset += len(block)
+        if offset != self.size:
+            raise OSError(f"Expected {self.size} bytes, got {offset}")
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def finish(self, blob_path, sha256):
+        """Verify the downloaded bytes and move them into place; a bad download is discarded."""
+        self.close()
+        actual = file_sha256(self.path)
+        if actual != sha256:
+            self.discard()
+            raise ValueError(f"Checksum mismatch for blob {sha256[:12]}: got {actual[:12]}"
+                             + (" (resumed download discarded)" if self.resumed else ""))
+        os.replace(self.path, blob_path)
+        os.remove(self.progress_path)
+
+    def discard(self):
+        for path in (self.path, self.progress_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def _with_retries(function, retries, *args):
+    for attempt in range(retries + 1):
+        try:
+            return function(*args)
+        except OSError as e:
+            # A 4xx (e.g. 404) will not go away by retrying; 5xx and network errors might
+            permanent = isinstance(e, urllib.error.HTTPError) and e.code < 500
+            if permanent or attempt == retries:
+                raise
+            time.sleep(min(2 ** attempt, 10))
+
+
+def download_blobs(entries, urls, blobs_dir, workers=8, chunk_size=CHUNK_SIZE, timeout=30, retries=3):
+    """Download manifest entries that are not yet in the blob store.
+
+    Chunks of all files share one pool of `workers` threads, so a bundle of
+    one large weights file and many small ones downloads in parallel either
+    way. Every blob is checked against its sha256 before it becomes visible.
+    Returns the number of bytes downloaded.
+    """
+    partials = {}
+    tasks = []
+    for entry in entries:
+        blob_path = os.path.join(blobs_dir, entry['sha256'])
+        if os.path.exists(blob_path) or entry['sha256'] in partials:
+            continue
+        partial = PartialDownload(blob_path, entry['size'], chunk_size)
+        partials[entry['sha256']] = partial
+        url = urls[entry['path']]
+        if entry['size'] > chunk_size and not _with_retries(_supports_ranges, retries, url, timeout):
+            tasks.append((partial, url, None, 0, entry['size']))
+        else:
+            tasks.extend((partial, url, index, offset, length) for index, offset, length in partial.pending_chunks())
+
+    def fetch_chunk(partial, url, index, offset, length):
+        if index is None:
+            with _open(url, timeout) as response:
+                partial.write_stream(response)
+        else:
+            partial.write(index, offset, _read_range(url, offset, length, timeout))
+        return length
+
+    downloaded = 0
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_with_retries, fetch_chunk, retries, *task) for task in tasks]
+            for future in as_completed(futures):
+                downloaded += future.result()
+        for sha256, partial in partials.items():
+            partial.finish(os.path.join(blobs_dir, sha256), sha256)
+    finally:
+        # After a failure, chunks already written stay on disk for the next attempt
+        for partial in partials.values():
+            partial.close()
+    return downloaded
+
+
+# --- The local cache: blobs/<sha256>, snapshots/<name>/<version>/..., refs/<name>/<ref> ---
+
+@contextmanager
+def cache_lock(cache_dir):
+    """Replicas sharing a cache volume download and evict one at a time."""
+    os.makedirs(cache_dir, exist_ok=True)
+    with open(os.path.join(cache_dir, '.lock'), 'w') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _link_snapshot(manifest, snapshot_dir, blobs_dir):
+    """Build the snapshot as relative symlinks into the blob store, then move it into place."""
+    tmp_dir = f"{snapshot_dir}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    for entry in manifest['files']:
+        link_path = os.path.join(tmp_dir, *entry['path'].split('/'))
+        os.makedirs(os.path.dirname(link_path), exist_ok=True)
+        os.symlink(os.path.relpath(os.path.join(blobs_dir, entry['sha256']), os.path.dirname(link_path)), link_path)
+    with open(os.path.join(tmp_dir, MANIFEST_FILE), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    if os.path.exists(snapshot_dir):
+        shutil.rmtree(snapshot_dir)
+    os.replace(tmp_dir, snapshot_dir)
+
+
+def _point_ref(ref_path, snapshot_dir):
+    """Atomically point a ref symlink at a snapshot (same pattern as the model registry)."""
+    os.makedirs(os.path.dirname(ref_path), exist_ok=True)
+    tmp_link = f"{ref_path}.tmp-{os.getpid()}"
+    if os.path.lexists(tmp_link):
+        os.remove(tmp_link)
+    os.symlink(os.path.relpath(snapshot_dir, os.path.dirname(ref_path)), tmp_link)
+    os.replace(tmp_link, ref_path)
+
+
+def cached_model(cache_dir, name, ref='latest'):
+    """Path of the cached snapshot a ref points to, or None if it was never fetched."""
+    ref_path = os.path.join(cache_dir, REFS_DIR, name, ref)
+    return ref_path if os.path.exists(ref_path) else None
+
+
+def fetch_model(remote_url, name, ref='latest', cache_dir='.cache/models', workers=8, chunk_size=CHUNK_SIZE,
+                max_cache_bytes=None, timeout=30, retries=3):
+    """Make a model bundle from the remote available locally and return its path.
+
+    The remote holds `<name>/<version>/` bundles with a manifest.json and
+    `<name>/refs/<ref>` files naming a version. Files are stored once per
+    content hash, so versions sharing files share the bytes. The returned
+    path is a ref symlink into the cache, which `HotSwapModel` can follow
+    when a later fetch moves it. If the remote cannot be reached, the last
+    fetched snapshot of the ref is used instead.
+    """
+    blobs_dir = os.path.join(cache_dir, 'blobs')
+    os.makedirs(blobs_dir, exist_ok=True)
+    ref_path = os.path.join(cache_dir, REFS_DIR, name, ref)
+    with cache_lock(cache_dir):
+        try:
+            version = resolve_version(remote_url, name, ref, timeout)
+            snapshot_dir = os.path.join(cache_dir, 'snapshots', name, version)
+            if not _snapshot_complete(snapshot_dir, blobs_dir):
+                manifest = json.loads(_read(remote_join(remote_url, name, version, MANIFEST_FILE), timeout))
+                urls = {entry['path']: remote_join(remote_url, name, version, *entry['path'].split('/'))
+                        for entry in manifest['files']}
+                start_time = time.time()
+                downloaded = download_blobs(manifest['files'], urls, blobs_dir, workers, chunk_size, timeout, retries)
+                _link_snapshot(manifest, snapshot_dir, blobs_dir)
+                print(f"Fetched {name}:{version} ({downloaded / 1024 ** 2:.1f} MB downloaded in "
+                      f"{time.time() - start_time:.1f}s, {len(manifest['files'])} files)")
+            _point_ref(ref_path, snapshot_dir)
+        except (OSError, ValueError) as e:
+            if not os.path.exists(ref_path):
+                raise
+            print(f"[WARNING] Could not fetch {name}:{ref} from {remote_url} ({e}); using the cached copy")
+        os.utime(os.path.realpath(ref_path))  # last use, for eviction
+        if max_cache_bytes is not None:
+            evict_cache(cache_dir, max_cache_bytes, keep=[os.path.realpath(ref_path)])
+    return ref_path
+
+
+def _snapshot_complete(snapshot_dir, blobs_dir):
+    manifest_path = os.path.join(snapshot_dir, MANIFEST_FILE)
+    if not os.path.exists(manifest_path):
+        return False
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+    return all(os.path.exists(os.path.join(blobs_dir, entry['sha256'])) for entry in manifest['files'])
+
+
+def cache_usage(cache_dir):
+    """Bytes held by the blob store, including partial downloads."""
+    blobs_dir = os.path.join(cache_dir, 'blobs')
+    if not os.path.isdir(blobs_dir):
+        return 0
+    return sum(entry.stat().st_size for entry in os.scandir(blobs_dir) if entry.is_file())
+
+
+def evict_cache(cache_dir, max_bytes, keep=()):
+    """Drop least recently used snapshots until the cache fits in `max_bytes`.
+
+    Snapshots that a ref points to or that are listed in `keep` are never
+    evicted; blobs no remaining snapshot uses are deleted. A model that is
+    already loaded keeps working, since its mapped files stay readable until
+    closed. Returns the number of bytes freed.
+    """
+    snapshots_root = os.path.join(cache_dir, 'snapshots')
+    blobs_dir = os.path.join(cache_dir, 'blobs')
+    if not os.path.isdir(snapshots_root):
+        return 0
+    protected = {os.path.realpath(path) for path in keep}
+    # Refs are symlinks to snapshot directories: refs/<name>/<ref>
+    refs_root = os.path.join(cache_dir, REFS_DIR)
+    if os.path.isdir(refs_root):
+        for name in os.listdir(refs_root):
+            for entry in os.scandir(os.path.join(refs_root, name)):
+                if entry.is_symlink():
+                    protected.add(os.path.realpath(entry.path))
+
+    snapshots = []
+    for name in os.listdir(snapshots_root):
+        for version in os.listdir(os.path.join(snapshots_root, name)):
+            snapshot_dir = os.path.realpath(os.path.join(snapshots_root, name, version))
+            manifest_path = os.path.join(snapshot_dir, MANIFEST_FILE)
+            if os.path.exists(manifest_path):
+                with open(manifest_path) as f:
+                    blobs = {entry['sha256'] for entry in json.load(f)['files']}
+                snapshots.append((os.stat(snapshot_dir).st_mtime, snapshot_dir, blobs))
+    snapshots.sort()
+
+    def remove_unused_blobs():
+        in_use = set().union(*(blobs for _, _, blobs in snapshots))
+        removed = 0
+        for entry in os.scandir(blobs_dir):
+            # Partial downloads have a suffix and are left alone
+            if entry.is_file() and '.' not in entry.name and entry.name not in in_use:
+                removed += entry.stat().st_size
+                os.remove(entry.path)
+        return removed
+
+    usage = cache_usage(cache_dir)
+    freed = remove_unused_blobs()
+    for _, snapshot_dir, _ in list(snapshots):
+        if usage - freed <= max_bytes:
+            break
+        if snapshot_dir in protected:
+            continue
+        shutil.rmtree(snapshot_dir)
+        snapshots = [snapshot for snapshot in snapshots if snapshot[1] != snapshot_dir]
+        freed += remove_unused_blobs()
+        print(f"Evicted {os.path.relpath(snapshot_dir, snapshots_root)} from the model cache")
+    return freed
@@ -0,0 +1,113 @@
+import hashlib
+import json
+import mmap
+import struct
+import threading
+
+# safetensors layout: 8-byte little-endian header length, JSON header with
+# dtype/shape/data_offsets per tensor, then the raw tensor bytes back to back.
+DTYPES = {
+    'F64': 'float64', 'F32': 'float32', 'F16': 'float16', 'BF16': 'bfloat16',
+    'I64': 'int64', 'I32': 'int32', 'I16': 'int16', 'I8': 'int8', 'U8': 'uint8', 'BOOL': 'bool'
+}
+CHECKSUM_KEY = 'sha256'
+
+
+def _dtype_code(dtype):
+    name = str(dtype).replace('torch.', '')
+    return next(code for code, torch_name in DTYPES.items() if torch_name == name)
+
+
+def pack_state_dict(state_dict, path):
+    """Write a state dict as one flat, mmap-able file with a SHA-256 per tensor.
+
+    Tensors are ordered by element size (largest first) so every tensor
+    starts aligned for its dtype; the header is padded to 8 bytes. The file
+    can also be read with the `safetensors` library.
+    """
+    tensors = sorted(((name, tensor.detach().cpu().contiguous()) for name, tensor in state_dict.items()),
+                     key=lambda item: (-item[1].element_size(), item[0]))
+    header, checksums, offset = {}, {}, 0
+    for name, tensor in tensors:
+        size = tensor.numel() * tensor.element_size()
+        header[name] = {'dtype': _dtype_code(tensor.dtype), 'shape': list(tensor.shape),
+                        'data_offsets': [offset, offset + size]}
+        checksums[name] = hashlib.sha256(_tensor_bytes(tensor)).hexdigest()
+        offset += size
+    header['__metadata__'] = {'format': 'pt', CHECKSUM_KEY: json.dumps(checksums)}
+
+    header_bytes = json.dumps(header, separators=(',', ':')).encode()
+    header_bytes += b' ' * (-len(header_bytes) % 8)
+    with open(path, 'wb') as f:
+        f.write(struct.pack('<Q', len(header_bytes)))
+        f.write(header_bytes)
+        for _, tensor in tensors:
+            f.write(_tensor_bytes(tensor))
+    return path
+
+
+def _tensor_bytes(tensor):
+    import torch
+    # Reinterpret as bytes so dtypes numpy lacks (bfloat16) are written unchanged
+    return tensor.reshape(-1).view(torch.uint8).numpy().tobytes() if tensor.numel() else b''
+
+
+def read_header(path):
+    """(header, offset of the first tensor byte) without touching the tensor data."""
+    with open(path, 'rb') as f:
+        (header_size,) = struct.unpack('<Q', f.read(8))
+        header = json.loads(f.read(header_size))
+    return header, 8 + header_size
+
+
+def load_packed(path, verify='lazy', on_mismatch=None):
+    """Map a packed weights file and return a state dict backed by the mapping.
+
+    Nothing is read up front: the OS pages weights in on first use, and
+    processes loading the same file share those pages through the page
+    cache. The mapping is copy-on-write, so the tensors are writable without
+    touching the file. `verify` checks the stored checksums: True before
+    returning (raises ValueError on a mismatch), 'lazy' in a background
+    thread that logs a warning and calls `on_mismatch` with the error
+    message, False not at all.
+    """
+    import torch
+    header, data_start = read_header(path)
+    metadata = header.pop('__metadata__', {})
+    with open(path, 'rb') as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+
+    state_dict = {}
+    for name, info in header.items():
+        begin, end = info['data_offsets']
+        dtype = getattr(torch, DTYPES[info['dtype']])
+        if end == begin:
+            state_dict[name] = torch.empty(info['shape'], dtype=dtype)
+            continue
+        tensor = torch.frombuffer(buffer, dtype=torch.uint8, count=end - begin, offset=data_start + begin)
+        state_dict[name] = tensor.view(dtype).reshape(info['shape'])
+
+    if verify and CHECKSUM_KEY in metadata:
+        checksums = json.loads(metadata[CHECKSUM_KEY])
+        if verify == 'lazy':
+            threading.Thread(target=_verify_in_background, args=(path, state_dict, checksums, on_mismatch),
+                             daemon=True, name="verify-weights").start()
+        else:
+            corrupted = verify_state_dict(state_dict, checksums)
+            if corrupted:
+                raise ValueError(f"Checksum mismatch in {path}: {corrupted[:5]}")
+    return state_dict
+
+
+def verify_state_dict(state_dict, checksums):
+    """Names of tensors whose contents do not match their stored SHA-256."""
+    return [name for name, digest in checksums.items()
+            if name not in state_dict or hashlib.sha256(_tensor_bytes(state_dict[name])).hexdigest() != digest]
+
+
+def _verify_in_background(path, state_dict, checksums, on_mismatch):
+    corrupted = verify_state_dict(state_dict, checksums)
+    if corrupted:
+        print(f"[WARNING] Checksum mismatch in {path}: {corrupted[:5]} - retrain or re-export the model")
+        if on_mismatch is not None:
+            on_mismatch(f"Checksum mismatch in {path}: {corrupted[:5]}")
@@ -0,0 +1,98 @@
+import os
+import shutil
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REGISTRY_DIR = os.path.join(BASE_DIR, 'models', 'registry')
+CURRENT_LINK = os.path.join(BASE_DIR, 'models', 'autogluon_model')
+
+
+def new_version_dir(registry_dir=REGISTRY_DIR):
+    """Create and return an empty, uniquely named version directory in the registry."""
+    os.makedirs(registry_dir, exist_ok=True)
+    stamp = time.strftime('%Y%m%d-%H%M%S')
+    version_dir = os.path.join(registry_dir, f"v{stamp}")
+    suffix = 1
+    while os.path.exists(version_dir):
+        version_dir = os.path.join(registry_dir, f"v{stamp}-{suffix}")
+        suffix += 1
+    os.makedirs(version_dir)
+    return version_dir
+
+
+def resolve_current(current_link=CURRENT_LINK):
+    """Return the real path of the version the "current" pointer refers to, or None."""
+    if not os.path.exists(current_link):
+        return None
+    return os.path.realpath(current_link)
+
+
+def list_versions(registry_dir=REGISTRY_DIR):
+    """List registry version directories, oldest first (names are timestamps)."""
+    if not os.path.isdir(registry_dir):
+        return []
+    versions = [
+        os.path.join(registry_dir, name) for name in os.listdir(registry_dir)
+        if name.startswith('v') and os.path.isdir(os.path.join(registry_dir, name))
+    ]
+    return sorted(versions)
+
+
+def _adopt_legacy_model(current_link, registry_dir):
+    """Move a plain model directory at the pointer location into the registry.
+
+    Older checkouts keep the model directly in models/autogluon_model. The
+    directory is moved into the registry once so the pointer can become a
+    symlink; there is a short window where the pointer is missing. It is
+    named after its modification time so it sorts (and is pruned) among the
+    other versions by age.
+    """
+    if os.path.islink(current_link) or not os.path.isdir(current_link):
+        return None
+    os.makedirs(registry_dir, exist_ok=True)
+    stamp = time.strftime('%Y%m%d-%H%M%S', time.localtime(os.path.getmtime(current_link)))
+    legacy_dir = os.path.join(registry_dir, f"v{stamp}-legacy")
+    if os.path.exists(legacy_dir):
+        shutil.rmtree(legacy_dir)
+    os.replace(current_link, legacy_dir)
+    print(f"Moved existing model into registry: {legacy_dir}")
+    return legacy_dir
+
+
+def publish_version(version_dir, current_link=CURRENT_LINK, registry_dir=REGISTRY_DIR):
+    """Atomically point the "current" symlink at `version_dir`.
+
+    A temporary symlink is created next to the pointer and renamed over it,
+    so readers always see either the old or the new version, never a gap.
+    """
+    _adopt_legacy_model(current_link, registry_dir)
+
+    link_dir = os.path.dirname(current_link)
+    target = os.path.relpath(os.path.realpath(version_dir), link_dir)
+    tmp_link = f"{current_link}.tmp-{os.getpid()}"
+    if os.path.lexists(tmp_link):
+        os.unlink(tmp_link)
+    os.symlink(target, tmp_link)
+    os.replace(tmp_link, current_link)
+
+    print(f"Published model version: {os.path.basename(version_dir)}")
+    return current_link
+
+
+def prune_versions(keep=3, current_link=CURRENT_LINK, registry_dir=REGISTRY_DIR):
+    """Delete all but the `keep` newest versions, never touching the current one.
+
+    Serving processes may still be finishing requests on the previous
+    version, so `keep` should be at least 2.
+    """
+    current = resolve_current(current_link)
+    versions = list_versions(registry_dir)
+    removed = []
+    for version_dir in versions[:-keep] if keep > 0 else versions:
+        if os.path.realpath(version_dir) == current:
+            continue
+        shutil.rmtree(version_dir, ignore_errors=True)
+        removed.append(version_dir)
+    if removed:
+        print(f"Pruned {len(removed)} old model version(s)")
+    return removed
@@ -0,0 +1,71 @@
+import os
+
+
+def available_cpus():
+    """CPUs this process may run on (respects container cpusets)."""
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def replica_cpu_sets(replicas, cpus=None):
+    """Split the available CPUs into `replicas` contiguous, non-overlapping sets."""
+    cpus = available_cpus() if cpus is None else list(cpus)
+    replicas = max(1, min(replicas, len(cpus)))
+    per_replica = len(cpus) // replicas
+    return [cpus[i * per_replica:(i + 1) * per_replica] for i in range(replicas)]
+
+
+def pin_to_cpus(cpus):
+    """Restrict the current process to `cpus`. Returns False where affinity is unsupported."""
+    if not hasattr(os, 'sched_setaffinity'):
+        print("[WARNING] CPU affinity is not supported on this platform")
+        return False
+    os.sched_setaffinity(0, set(cpus))
+    return True
+
+
+def configure_threads(intra_op_threads, inter_op_threads=None):
+    """Set torch intra-op and inter-op thread pools for this process.
+
+    The OpenMP/MKL environment variables are set too so that libraries
+    initialised later pick up the same limit. torch only accepts an inter-op
+    setting before any parallel work has run, so call this at startup.
+    """
+    os.environ['OMP_NUM_THREADS'] = str(intra_op_threads)
+    os.environ['MKL_NUM_THREADS'] = str(intra_op_threads)
+
+    import torch
+    torch.set_num_threads(intra_op_threads)
+    if inter_op_threads is not None:
+        try:
+            torch.set_num_interop_threads(inter_op_threads)
+        except RuntimeError as e:
+            print(f"[WARNING] Could not set inter-op threads: {e}")
+
+
+def replica_cpus(replicas, replica_index, cpus=None):
+    """The share of `cpus` (default: the available CPUs) that replica `replica_index` owns."""
+    cpu_sets = replica_cpu_sets(replicas, cpus)
+    return cpu_sets[replica_index % len(cpu_sets)]
+
+
+def apply_serving_options(serving_options, replica_index=0, cpus=None):
+    """Apply thread and affinity settings for one serving replica.
+
+    With `pin_cpus`, replica `replica_index` is pinned to its share of
+    `cpus` (default: the host CPUs). Intra-op threads default to the number
+    of CPUs the replica owns, so replicas never oversubscribe each other.
+    Worker processes of one replica pass the replica's own CPUs as `cpus`.
+    """
+    cpu_sets = replica_cpu_sets(serving_options["replicas"], cpus)
+    cpus = cpu_sets[replica_index % len(cpu_sets)]
+    if serving_options["pin_cpus"]:
+        pin_to_cpus(cpus)
+
+    intra_op_threads = serving_options["intra_op_threads"] or len(cpus)
+    configure_threads(intra_op_threads, serving_options["inter_op_threads"])
+    print(f"Replica {replica_index}: {intra_op_threads} intra-op / "
+          f"{serving_options['inter_op_threads']} inter-op threads"
+          f"{f', pinned to CPUs {cpus}' if serving_options['pin_cpus'] else ''}")
+    return cpus
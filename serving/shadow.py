@@ -0,0 +1,107 @@
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from serving.inference import predict_images
+
+
+class ShadowEvaluator:
+    """Run a candidate model in shadow on a sample of live requests.
+
+    Shadow predictions run on a small background executor and never block the
+    caller. At most `max_pending` shadow jobs may be queued or running; when
+    that limit is reached new samples are dropped (and counted) rather than
+    queued, so a slow candidate cannot build up an unbounded backlog.
+    """
+
+    def __init__(self, candidate, sample_rate=0.1, max_workers=1, max_pending=4,
+                 log_path=None, history=1000):
+        self.candidate = candidate
+        self.sample_rate = sample_rate
+        self.log_path = log_path
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="shadow")
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._primary_latencies = deque(maxlen=history)
+        self._candidate_latencies = deque(maxlen=history)
+        self.submitted = 0
+        self.dropped = 0
+        self.completed = 0
+        self.failed = 0
+        self.agreements = 0
+        if log_path:
+            os.makedirs(os.path.dirname(log_path), exist_ok=True)
+
+    def maybe_submit(self, image, primary_class, primary_latency):
+        """Sample this request for shadow evaluation. Returns True if it was queued."""
+        if random.random() >= self.sample_rate:
+            return False
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.dropped += 1
+            return False
+        with self._lock:
+            self.submitted += 1
+        future = self._executor.submit(self._run, image.copy(), primary_class, primary_latency)
+        future.add_done_callback(lambda _: self._slots.release())
+        return True
+
+    def _run(self, image, primary_class, primary_latency):
+        try:
+            start_time = time.time()
+            probabilities = predict_images(self.candidate, [image])
+            candidate_latency = time.time() - start_time
+            candidate_class = probabilities.iloc[0].idxmax()
+        except Exception as e:
+            with self._lock:
+                self.failed += 1
+            print(f"[WARNING] Shadow prediction failed: {e}")
+            return
+
+        agreed = bool(candidate_class == primary_class)
+        with self._lock:
+            self.completed += 1
+            self.agreements += int(agreed)
+            self._primary_latencies.append(primary_latency)
+            self._candidate_latencies.append(candidate_latency)
+            if self.log_path:
+                with open(self.log_path, 'a') as f:
+                    f.write(json.dumps({
+                        'timestamp': time.time(),
+                        'primary_class': str(primary_class),
+                        'candidate_class': str(candidate_class),
+                        'agreed': agreed,
+                        'primary_latency': primary_latency,
+                        'candidate_latency': candidate_latency
+                    }) + "\n")
+
+    def summary(self):
+        """Agreement rate since start and latency comparison over the recent history."""
+        with self._lock:
+            primary = np.array(self._primary_latencies)
+            candidate = np.array(self._candidate_latencies)
+            summary = {
+                'submitted': self.submitted,
+                'dropped': self.dropped,
+                'completed': self.completed,
+                'failed': self.failed,
+                'agreement_rate': self.agreements / self.completed if self.completed else None
+            }
+        if len(primary):
+            summary.update({
+                'primary_p50_latency': float(np.percentile(primary, 50)),
+                'primary_p95_latency': float(np.percentile(primary, 95)),
+                'candidate_p50_latency': float(np.percentile(candidate, 50)),
+                'candidate_p95_latency': float(np.percentile(candidate, 95)),
+                'mean_latency_delta': float(np.mean(candidate - primary))
+            })
+        return summary
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,149 @@
+import itertools
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from serving.image_io import MAX_PIXELS, decode_image
+from serving.packed_weights import load_packed, pack_state_dict
+from serving.tracing import span
+
+MODEL_FILE = 'timm_model.json'
+WEIGHTS_FILE = 'weights.safetensors'
+LEGACY_WEIGHTS_FILE = 'weights.pt'  # torch.save state dict, written before packed weights
+IMAGENET_MEAN = (0.485, 0.456, 0.406)
+IMAGENET_STD = (0.229, 0.224, 0.225)
+
+
+def is_timm_model(model_path):
+    return os.path.exists(os.path.join(model_path, MODEL_FILE))
+
+
+def weights_file(model_path):
+    """Name of the weights file in a timm model directory (packed if present, else legacy)."""
+    if os.path.exists(os.path.join(model_path, LEGACY_WEIGHTS_FILE)) and \
+            not os.path.exists(os.path.join(model_path, WEIGHTS_FILE)):
+        return LEGACY_WEIGHTS_FILE
+    return WEIGHTS_FILE
+
+
+class TimmPredictor:
+    """A plain timm classifier with the subset of the MultiModalPredictor API we use.
+
+    Used for models we train ourselves (distilled students, linear-probe
+    heads). Preprocessing matches AutoGluon's validation transforms: resize
+    the shorter side, centre crop, ImageNet normalisation.
+    """
+
+    def __init__(self, model, class_labels, checkpoint_name, image_size=224,
+                 mean=IMAGENET_MEAN, std=IMAGENET_STD):
+        self.model = model.eval()
+        self.class_labels = list(class_labels)
+        self.checkpoint_name = checkpoint_name
+        self.image_size = image_size
+        self.mean = np.array(mean, dtype=np.float32).reshape(3, 1, 1)
+        self.std = np.array(std, dtype=np.float32).reshape(3, 1, 1)
+        # Filled by a lazy checksum verification that found corrupted weights
+        self.weights_errors = []
+
+    @classmethod
+    def create(cls, checkpoint_name, class_labels, pretrained=True, image_size=224):
+        import timm
+        model = timm.create_model(checkpoint_name, pretrained=pretrained, num_classes=len(class_labels))
+        return cls(model, class_labels, checkpoint_name, image_size)
+
+    @classmethod
+    def load(cls, model_path, verify_weights='lazy'):
+        """Load a saved model; packed weights are memory-mapped rather than read.
+
+        The module is built on the meta device (no random init) and the
+        mapped tensors are assigned as its parameters, so startup cost does
+        not grow with model size. `verify_weights` is passed to `load_packed`;
+        with 'lazy', a checksum mismatch found after loading makes every later
+        prediction raise instead of serving the corrupted weights.
+        """
+        import timm
+        import torch
+        with open(os.path.join(model_path, MODEL_FILE)) as f:
+            meta = json.load(f)
+        num_classes = len(meta['class_labels'])
+        weights_errors = []
+        if weights_file(model_path) == LEGACY_WEIGHTS_FILE:
+            model = timm.create_model(meta['checkpoint_name'], pretrained=False, num_classes=num_classes)
+            state_dict = torch.load(os.path.join(model_path, LEGACY_WEIGHTS_FILE), map_location='cpu',
+                                    weights_only=True)
+            model.load_state_dict(state_dict)
+        else:
+            state_dict = load_packed(os.path.join(model_path, WEIGHTS_FILE), verify=verify_weights,
+                                     on_mismatch=weights_errors.append)
+            with torch.device('meta'):
+                model = timm.create_model(meta['checkpoint_name'], pretrained=False, num_classes=num_classes)
+            model.load_state_dict(state_dict, assign=True)
+            if any(tensor.is_meta for tensor in itertools.chain(model.parameters(), model.buffers())):
+                # Non-persistent buffers are not in the state dict; build those for real
+                model = timm.create_model(meta['checkpoint_name'], pretrained=False, num_classes=num_classes)
+                model.load_state_dict(state_dict, assign=True)
+        predictor = cls(model, meta['class_labels'], meta['checkpoint_name'], meta['image_size'],
+                        meta['mean'], meta['std'])
+        predictor.weights_errors = weights_errors
+        return predictor
+
+    def save(self, model_path):
+        os.makedirs(model_path, exist_ok=True)
+        pack_state_dict(self.model.state_dict(), os.path.join(model_path, WEIGHTS_FILE))
+        legacy_path = os.path.join(model_path, LEGACY_WEIGHTS_FILE)
+        if os.path.exists(legacy_path):
+            os.remove(legacy_path)
+        with open(os.path.join(model_path, MODEL_FILE), 'w') as f:
+            json.dump({
+                'checkpoint_name': self.checkpoint_name,
+                'class_labels': [label.item() if hasattr(label, 'item') else label for label in self.class_labels],
+                'image_size': self.image_size,
+                'mean': self.mean.ravel().tolist(),
+                'std': self.std.ravel().tolist()
+            }, f, indent=2)
+        return model_path
+
+    def preprocess(self, image):
+        """PIL image -> normalised CHW float32 array at `image_size`."""
+        width, height = image.size
+        if min(width, height) != self.image_size:
+            scale = self.image_size / min(width, height)
+            image = image.resize((max(self.image_size, round(width * scale)),
+                                  max(self.image_size, round(height * scale))))
+            width, height = image.size
+        left = (width - self.image_size) // 2
+        top = (height - self.image_size) // 2
+        image = image.crop((left, top, left + self.image_size, top + self.image_size))
+        pixels = np.asarray(image.convert('RGB'), dtype=np.float32).transpose(2, 0, 1) / 255.0
+        return (pixels - self.mean) / self.std
+
+    def check_weights(self):
+        """Raise if the weights were found corrupted after loading."""
+        if self.weights_errors:
+            raise RuntimeError(f"Model weights are corrupted, refusing to predict: {self.weights_errors[0]}")
+
+    def predict_logits(self, images):
+        import torch
+        self.check_weights()
+        with span('preprocess', images=len(images)):
+            batch = torch.from_numpy(np.stack([self.preprocess(image) for image in images]))
+        with span('forward', images=len(images)), torch.inference_mode():
+            return self.model(batch).float().numpy()
+
+    def predict_proba_images(self, images):
+        logits = self.predict_logits(images)
+        with span('postprocess'):
+            logits -= logits.max(axis=1, keepdims=True)
+            probabilities = np.exp(logits)
+            probabilities /= probabilities.sum(axis=1, keepdims=True)
+            return pd.DataFrame(probabilities, columns=self.class_labels)
+
+    def predict_proba(self, data):
+        images = [decode_image(image_path, self.image_size, MAX_PIXELS) for image_path in data['image']]
+        return self.predict_proba_images(images)
+
+    def predict(self, data):
+        probabilities = self.predict_proba(data)
+        return probabilities.columns[np.argmax(probabilities.to_numpy(), axis=1)].to_numpy()
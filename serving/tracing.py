@@ -0,0 +1,183 @@
+import atexit
+import json
+import os
+import threading
+import time
+from multiprocessing import util
+
+_tracer = None
+
+
+class _NoSpan:
+    """Returned by `span` while tracing is off: one shared object, nothing recorded."""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set(self, **attributes):
+        pass
+
+
+_NO_SPAN = _NoSpan()
+
+
+class _Span:
+    __slots__ = ('tracer', 'name', 'attributes', 'span_id', 'parent_id', 'start')
+
+    def __init__(self, tracer, name, attributes):
+        self.tracer = tracer
+        self.name = name
+        self.attributes = attributes
+
+    def __enter__(self):
+        stack = self.tracer.stack()
+        self.parent_id = stack[-1].span_id if stack else None
+        self.span_id = self.tracer.next_id()
+        stack.append(self)
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.perf_counter_ns()
+        stack = self.tracer.stack()
+        path = ';'.join(span.name for span in stack)
+        stack.pop()
+        record = {
+            'name': self.name,
+            'path': path,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'start_ns': self.start,
+            'duration_ns': end - self.start,
+            'pid': os.getpid(),
+            'thread': threading.current_thread().name
+        }
+        if self.attributes:
+            record['attributes'] = self.attributes
+        if exc_type is not None:
+            record['error'] = exc_type.__name__
+        self.tracer.record(record)
+        return False
+
+    def set(self, **attributes):
+        """Attach attributes known only once the span is running (e.g. a batch size)."""
+        self.attributes = {**(self.attributes or {}), **attributes}
+
+
+class Tracer:
+    """Collects finished spans and appends them to a JSONL file in batches.
+
+    Spans nest per thread: a span opened inside another one on the same
+    thread becomes its child, and its `path` is the ';'-joined chain of
+    names from the root (the folded-stack format flame graph tools read).
+    Records are buffered and written `flush_every` at a time; each batch is
+    one `write` on an O_APPEND file so processes sharing the file do not
+    interleave lines.
+    """
+
+    def __init__(self, path, flush_every=256):
+        self.path = path
+        self.flush_every = flush_every
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._buffer = []
+        self._ids = 0
+        self._token = os.urandom(4).hex()  # keeps span ids unique across processes and restarts
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        # multiprocessing children leave through os._exit, skipping atexit
+        util.register_after_fork(self, lambda tracer: util.Finalize(tracer, tracer.flush, exitpriority=10))
+
+    def stack(self):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def next_id(self):
+        with self._lock:
+            self._ids += 1
+            return f"{self._token}-{self._ids:x}"
+
+    def span(self, name, attributes):
+        return _Span(self, name, attributes)
+
+    def record(self, record):
+        with self._lock:
+            self._buffer.append(record)
+            if len(self._buffer) < self.flush_every:
+                return
+            batch, self._buffer = self._buffer, []
+        self._write(batch)
+
+    def flush(self):
+        with self._lock:
+            batch, self._buffer = self._buffer, []
+        self._write(batch)
+
+    def _write(self, batch):
+        if not batch:
+            return
+        data = ''.join(json.dumps(record) + '\n' for record in batch).encode()
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, data)
+        finally:
+            os.close(fd)
+
+    def _after_fork(self):
+        # The child inherits the parent's unwritten records; the parent will write those
+        self._lock = threading.Lock()
+        self._buffer = []
+        self._local = threading.local()
+        self._token = os.urandom(4).hex()
+
+
+def span(name, **attributes):
+    """Context manager timing one step; a shared no-op while tracing is off.
+
+        with span('forward', batch=len(images)):
+            ...
+    """
+    if _tracer is None:
+        return _NO_SPAN
+    return _tracer.span(name, attributes)
+
+
+def start_tracing(path, flush_every=256):
+    """Record spans to `path` (appended) from now on; returns the tracer."""
+    global _tracer
+    if _tracer is not None:
+        _tracer.flush()
+    _tracer = Tracer(path, flush_every)
+    return _tracer
+
+
+def stop_tracing():
+    """Write any buffered spans and turn tracing off."""
+    global _tracer
+    tracer, _tracer = _tracer, None
+    if tracer is not None:
+        tracer.flush()
+    return tracer
+
+
+def tracing_enabled():
+    return _tracer is not None
+
+
+def _flush_at_exit():
+    if _tracer is not None:
+        _tracer.flush()
+
+
+def _reset_after_fork():
+    if _tracer is not None:
+        _tracer._after_fork()
+
+
+atexit.register(_flush_at_exit)
+os.register_at_fork(after_in_child=_reset_after_fork)
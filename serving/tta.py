@@ -0,0 +1,97 @@
+import threading
+
+import numpy as np
+import pandas as pd
+from PIL import ImageOps
+
+from serving.inference import predict_images
+
+
+def make_tta_views(image, crop_scale=0.875, num_crops=3):
+    """Return the original image, its horizontal flip and up to five crops.
+
+    Crops are taken in the order centre, top-left, bottom-right, top-right,
+    bottom-left; `num_crops` selects how many of them are used.
+    """
+    views = [image, ImageOps.mirror(image)]
+    width, height = image.size
+    crop_w, crop_h = int(width * crop_scale), int(height * crop_scale)
+    offsets = [
+        ((width - crop_w) // 2, (height - crop_h) // 2),
+        (0, 0),
+        (width - crop_w, height - crop_h),
+        (width - crop_w, 0),
+        (0, height - crop_h)
+    ]
+    for left, top in offsets[:num_crops]:
+        views.append(image.crop((left, top, left + crop_w, top + crop_h)))
+    return views
+
+
+def predict_tta(predictor, images, crop_scale=0.875, num_crops=3):
+    """Classify images with test-time augmentation in one batched forward pass.
+
+    All views of all images are stacked into a single `predict_proba` call.
+    Views are combined by averaging log-probabilities and re-normalising,
+    which is the same as a softmax over the averaged logits.
+    """
+    views = []
+    for image in images:
+        views.extend(make_tta_views(image, crop_scale, num_crops))
+    num_views = len(views) // len(images)
+
+    probabilities = predict_images(predictor, views)
+    log_probs = np.log(np.clip(probabilities.to_numpy(dtype=np.float64), 1e-12, None))
+    mean_log_probs = log_probs.reshape(len(images), num_views, -1).mean(axis=1)
+    averaged = np.exp(mean_log_probs - mean_log_probs.max(axis=1, keepdims=True))
+    averaged /= averaged.sum(axis=1, keepdims=True)
+    return pd.DataFrame(averaged, columns=probabilities.columns)
+
+
+class TTAPolicy:
+    """Decide per request whether TTA fits in the latency budget.
+
+    TTA latency is estimated as the recent single-view latency times the
+    observed TTA/single-view cost ratio, so the estimate keeps tracking load
+    even while TTA is switched off. TTA is also refused while more than
+    `max_in_flight` requests are being served.
+    """
+
+    def __init__(self, latency_budget, num_views, max_in_flight=2, smoothing=0.2):
+        self.latency_budget = latency_budget
+        self.max_in_flight = max_in_flight
+        self.smoothing = smoothing
+        self.single_latency = None
+        self.cost_ratio = float(num_views)
+        self.in_flight = 0
+        self._tta_latency = None
+        self._lock = threading.Lock()
+
+    def _smooth(self, current, value):
+        return value if current is None else (1 - self.smoothing) * current + self.smoothing * value
+
+    def estimated_latency(self):
+        if self.single_latency is None:
+            return None
+        return self.single_latency * self.cost_ratio
+
+    def begin(self, requested):
+        """Register a request; return True if it should run with TTA."""
+        with self._lock:
+            self.in_flight += 1
+            if not requested or self.in_flight > self.max_in_flight:
+                return False
+            estimate = self.estimated_latency()
+            return estimate is None or estimate <= self.latency_budget
+
+    def end(self, latency, used_tta):
+        with self._lock:
+            self.in_flight -= 1
+            if latency is None:
+                return
+            if used_tta:
+                self._tta_latency = self._smooth(self._tta_latency, latency)
+                if self.single_latency:
+                    self.cost_ratio = self._tta_latency / self.single_latency
+            else:
+                self.single_latency = self._smooth(self.single_latency, latency)
@@ -0,0 +1,42 @@
+import os
+
+from PIL import Image
+
+ALLOWED_FORMATS = ('JPEG', 'PNG')
+
+
+def inspect_upload(uploaded_file, max_bytes, max_pixels):
+    """Check an upload against byte and pixel limits without decoding it.
+
+    Only the file size and the image header are read. Returns
+    `(info, None)` with format, dimensions and byte count, or `(None, error)`.
+    """
+    uploaded_file.seek(0, os.SEEK_END)
+    num_bytes = uploaded_file.tell()
+    uploaded_file.seek(0)
+    if num_bytes > max_bytes:
+        return None, f"File too large: {num_bytes / 1024 ** 2:.1f} MB (limit {max_bytes / 1024 ** 2:.0f} MB)"
+
+    try:
+        # Image.open is lazy: it parses the header and stops before the pixel data
+        with Image.open(uploaded_file) as img:
+            image_format = img.format
+            width, height = img.size
+    except Exception as e:
+        return None, f"Not a valid image: {e}"
+    finally:
+        uploaded_file.seek(0)
+
+    if image_format not in ALLOWED_FORMATS:
+        return None, f"Unsupported image format: {image_format}"
+    if width * height > max_pixels:
+        return None, f"Image too large: {width}x{height} pixels (limit {max_pixels / 1e6:.0f} MP)"
+
+    return {'format': image_format, 'width': width, 'height': height, 'bytes': num_bytes}, None
+
+
+def make_thumbnail(image, max_size):
+    """Return a small copy of `image` for previews."""
+    thumbnail = image.copy()
+    thumbnail.thumbnail((max_size, max_size))
+    return thumbnail
@@ -0,0 +1,263 @@
+import gc
+import itertools
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future
+from multiprocessing.connection import wait
+
+from serving.runtime import apply_serving_options
+
+# Set in the parent right before forking; children inherit it copy-on-write.
+_SHARED_PREDICTOR = None
+
+
+def _worker_main(worker_index, conn, serving_options, cpus, warmup):
+    apply_serving_options(serving_options, worker_index, cpus)
+    predictor = _SHARED_PREDICTOR
+    if warmup is not None:
+        warmup(predictor)
+    conn.send(None)  # ready
+    while True:
+        try:
+            task = conn.recv()
+        except EOFError:
+            break
+        if task is None:
+            break
+        request_id, data = task
+        try:
+            conn.send((request_id, predictor.predict_proba(data), None))
+        except Exception as e:
+            conn.send((request_id, None, f"{type(e).__name__}: {e}"))
+
+
+def process_memory(pid):
+    """Return RSS, PSS and USS (private) memory of a process in MB, from /proc."""
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[1].isdigit():
+                fields[parts[0].rstrip(':')] = int(parts[1]) / 1024
+    return {
+        'rss_mb': fields.get('Rss', 0.0),
+        'pss_mb': fields.get('Pss', 0.0),
+        'uss_mb': fields.get('Private_Clean', 0.0) + fields.get('Private_Dirty', 0.0)
+    }
+
+
+class WorkerDied(RuntimeError):
+    """A worker process exited while a request was assigned to it."""
+
+
+class _Worker:
+    __slots__ = ('process', 'conn', 'pending', 'send_lock', 'ready')
+
+    def __init__(self, process, conn):
+        self.process = process
+        self.conn = conn
+        self.pending = set()
+        self.ready = False
+        self.send_lock = threading.Lock()
+
+
+class WorkerPool:
+    """Serve one predictor from several forked worker processes.
+
+    The weights are loaded once in the parent and the workers are forked
+    afterwards, so every worker maps the same physical pages copy-on-write
+    and only its activations are private. Each worker has its own pipe and
+    a request goes to the worker with the fewest requests outstanding, so
+    the pool always knows which requests a worker holds.
+
+    A worker that dies (OOM kill, a crash in native code) fails the
+    requests it held with `WorkerDied` and, if it had finished warming up,
+    is replaced by a fresh fork of the loaded predictor. `predict_proba` gives up after `request_timeout`
+    seconds unless told otherwise.
+
+    The pool exposes `predict_proba` and `class_labels` like the predictor
+    it wraps, so it can be used anywhere a predictor is expected. The parent
+    must not run inference before forking: a started OpenMP thread pool does
+    not survive fork.
+    """
+
+    def __init__(self, loader, model_path, workers=2, serving_options=None, warmup=None, request_timeout=60.0,
+                 cpus=None):
+        self.loader = loader
+        self.model_path = model_path
+        self.workers = workers
+        # The workers split `cpus` (this replica's share of the host) among themselves
+        self.serving_options = dict(serving_options or {}, replicas=workers)
+        self.cpus = cpus
+        self.warmup = warmup
+        self.request_timeout = request_timeout
+        self.class_labels = None
+        self._ids = itertools.count()
+        self._futures = {}
+        self._lock = threading.Lock()
+        self._workers = {}
+        self._predictor = None
+        self._closing = False
+
+    def start(self):
+        # Kept (never run) in the parent so a dead worker can be forked again
+        self._predictor = self.loader(self.model_path)
+        self.class_labels = getattr(self._predictor, 'class_labels', None)
+        self._ctx = multiprocessing.get_context('fork')
+        for worker_index in range(self.workers):
+            self._spawn(worker_index)
+
+        self._collector = threading.Thread(target=self._collect, name="worker-pool-results", daemon=True)
+        self._collector.start()
+        print(f"Started {self.workers} inference workers sharing weights from {self.model_path}")
+        return self
+
+    def _spawn(self, worker_index):
+        global _SHARED_PREDICTOR
+        # Move everything loaded so far out of the GC's reach so collections in
+        # the workers do not touch (and thereby copy) the shared pages.
+        gc.collect()
+        gc.freeze()
+        parent_conn, child_conn = self._ctx.Pipe()
+        _SHARED_PREDICTOR = self._predictor
+        try:
+            process = self._ctx.Process(
+                target=_worker_main,
+                args=(worker_index, child_conn, self.serving_options, self.cpus, self.warmup),
+                daemon=True
+            )
+            process.start()
+        finally:
+            _SHARED_PREDICTOR = None
+            gc.unfreeze()
+        child_conn.close()
+        with self._lock:
+            self._workers[worker_index] = _Worker(process, parent_conn)
+
+    def _collect(self):
+        while True:
+            with self._lock:
+                if self._closing and not self._workers:
+                    break
+                workers = dict(self._workers)
+            by_conn = {worker.conn: worker_index for worker_index, worker in workers.items()}
+            by_sentinel = {worker.process.sentinel: worker_index for worker_index, worker in workers.items()}
+            # The timeout picks up workers (re)spawned since the last wait
+            for ready in wait(list(by_conn) + list(by_sentinel), timeout=1.0):
+                if ready in by_conn:
+                    worker_index = by_conn[ready]
+                    try:
+                        message = ready.recv()
+                    except (EOFError, OSError):
+                        message = False
+                    if message is False:
+                        self._retire(worker_index)
+                    elif message is None:
+                        workers[worker_index].ready = True
+                    else:
+                        self._resolve(worker_index, *message)
+                else:
+                    self._retire(by_sentinel[ready])
+
+    def _resolve(self, worker_index, request_id, probabilities, error):
+        with self._lock:
+            worker = self._workers.get(worker_index)
+            if worker is not None:
+                worker.pending.discard(request_id)
+            future = self._futures.pop(request_id, None)
+        if future is None:
+            return
+        if error is not None:
+            future.set_exception(RuntimeError(error))
+        else:
+            future.set_result(probabilities)
+
+    def _retire(self, worker_index):
+        """Drop a worker that has exited: answer what it finished, fail the rest, replace it."""
+        with self._lock:
+            worker = self._workers.pop(worker_index, None)
+        if worker is None:
+            return
+        # Results sent just before the exit are still readable
+        try:
+            while worker.conn.poll():
+                message = worker.conn.recv()
+                if message is None:
+                    worker.ready = True
+                    continue
+                request_id, probabilities, error = message
+                worker.pending.discard(request_id)
+                self._resolve(worker_index, request_id, probabilities, error)
+        except (EOFError, OSError):
+            pass
+        worker.conn.close()
+        worker.process.join()
+        exitcode = worker.process.exitcode
+        with self._lock:
+            failed = [self._futures.pop(request_id, None) for request_id in worker.pending]
+            closing = self._closing
+        for future in failed:
+            if future is not None:
+                future.set_exception(WorkerDied(f"Inference worker {worker_index} exited with code {exitcode}"))
+        if closing:
+            return
+        print(f"Inference worker {worker_index} exited with code {exitcode} "
+              f"({sum(future is not None for future in failed)} requests failed)")
+        # One that never got through loading and warmup would only fail again
+        if worker.ready:
+            self._spawn(worker_index)
+
+    def submit(self, data):
+        """Send a prediction DataFrame to the least busy worker; returns a Future for its probabilities."""
+        # Lazy weight verification runs in the parent; the workers' copies never hear of it
+        check_weights = getattr(self._predictor, 'check_weights', None)
+        if check_weights is not None:
+            check_weights()
+        future = Future()
+        request_id = next(self._ids)
+        with self._lock:
+            if self._closing or not self._workers:
+                raise RuntimeError("Worker pool is not running")
+            worker = min(self._workers.values(), key=lambda candidate: len(candidate.pending))
+            worker.pending.add(request_id)
+            self._futures[request_id] = future
+        try:
+            with worker.send_lock:
+                worker.conn.send((request_id, data))
+        except OSError as e:
+            # The worker is gone; the collector replaces it
+            with self._lock:
+                worker.pending.discard(request_id)
+                self._futures.pop(request_id, None)
+            raise WorkerDied(f"Inference worker exited before accepting the request: {e}") from e
+        return future
+
+    def predict_proba(self, data, timeout=None):
+        """Predict through a worker; raises TimeoutError after `timeout` (default `request_timeout`) seconds."""
+        return self.submit(data).result(timeout=self.request_timeout if timeout is None else timeout)
+
+    def memory_report(self):
+        """Per-process memory; a worker's USS approximates its private (activation) memory."""
+        report = {'parent': process_memory(os.getpid())}
+        with self._lock:
+            workers = sorted(self._workers.items())
+        for worker_index, worker in workers:
+            if worker.process.is_alive():
+                report[f"worker_{worker_index}"] = process_memory(worker.process.pid)
+        return report
+
+    def close(self):
+        """Stop the workers once the requests already sent to them have been served."""
+        with self._lock:
+            self._closing = True
+            workers = list(self._workers.values())
+        for worker in workers:
+            try:
+                with worker.send_lock:
+                    worker.conn.send(None)
+            except OSError:
+                pass
+        # The collector answers the remaining requests and retires each worker as it exits
+        self._collector.join()
+        self._predictor = None
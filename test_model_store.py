@@ -0,0 +1,76 @@
+"""
+Tests for the model fetch layer (serving/model_store.py) against a local
+directory standing in for the remote.
+"""
+
+import os
+import urllib.error
+
+import pytest
+
+from scripts.model_store import publish_model
+from serving import model_store
+
+
+def make_remote(tmp_path, versions):
+    """Publish one small bundle per version into a directory remote; the last one is "latest"."""
+    remote = tmp_path / "remote"
+    for version in versions:
+        model_dir = tmp_path / f"model-{version}"
+        model_dir.mkdir()
+        (model_dir / "weights.bin").write_bytes(os.urandom(4096))
+        (model_dir / "config.json").write_text('{"classes": 3}')
+        publish_model(str(model_dir), str(remote), "pets", version, label_map_path=str(tmp_path / "missing.pkl"))
+    return str(remote)
+
+
+def test_referenced_snapshot_survives_eviction(tmp_path):
+    remote = make_remote(tmp_path, ["v1", "v2"])
+    cache = str(tmp_path / "cache")
+    model_store.fetch_model(remote, "pets", "v1", cache)
+    latest = model_store.fetch_model(remote, "pets", "latest", cache)
+    # v1 is only pinned by its own ref; drop that so it becomes evictable
+    os.remove(os.path.join(cache, "refs", "pets", "v1"))
+
+    model_store.evict_cache(cache, max_bytes=0)
+
+    snapshots = os.listdir(os.path.join(cache, "snapshots", "pets"))
+    assert snapshots == ["v2"]
+    assert os.path.realpath(latest).endswith(os.path.join("snapshots", "pets", "v2"))
+    assert os.path.exists(os.path.join(latest, "weights.bin"))
+    assert model_store.cached_model(cache, "pets") == latest
+
+
+def test_evict_keeps_every_ref_target(tmp_path):
+    remote = make_remote(tmp_path, ["v1", "v2"])
+    cache = str(tmp_path / "cache")
+    model_store.fetch_model(remote, "pets", "v1", cache)
+    model_store.fetch_model(remote, "pets", "latest", cache)
+
+    assert model_store.evict_cache(cache, max_bytes=0) == 0
+    assert sorted(os.listdir(os.path.join(cache, "snapshots", "pets"))) == ["v1", "v2"]
+
+
+def test_server_errors_are_retried_with_backoff(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(model_store.time, "sleep", sleeps.append)
+    calls = []
+
+    def flaky():
+        calls.append(1)
+        if len(calls) < 3:
+            raise urllib.error.HTTPError("http://remote/x", 503, "Service Unavailable", None, None)
+        return "ok"
+
+    assert model_store._with_retries(flaky, 3) == "ok"
+    assert sleeps == [1, 2]
+
+
+def test_client_errors_are_not_retried(monkeypatch):
+    monkeypatch.setattr(model_store.time, "sleep", lambda seconds: pytest.fail("should not back off on a 404"))
+
+    def missing():
+        raise urllib.error.HTTPError("http://remote/x", 404, "Not Found", None, None)
+
+    with pytest.raises(urllib.error.HTTPError):
+        model_store._with_retries(missing, 3)